@@ -1,13 +1,25 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation
+from .models import User, DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation, Job
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     pass
 
-admin.site.register(DailyPhoto)
+@admin.register(DailyPhoto)
+class DailyPhotoAdmin(admin.ModelAdmin):
+    list_display = ('title', 'date_featured', 'author', 'likes_count', 'comments_count', 'saves_count')
+    readonly_fields = ('likes_count', 'comments_count', 'saves_count')
+    list_select_related = ('author',)
+
 admin.site.register(Comment)
 admin.site.register(Like)
 admin.site.register(SavedPhoto)
 admin.site.register(PhotoRecommendation)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('last_error',)
@@ -0,0 +1,137 @@
+import datetime
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .caching import bump, versions
+from .models import Comment, EngagementRollup, Like, SavedPhoto
+from .routers import read_from_replica
+
+# ----------------------------
+# Engagement analytics
+# ----------------------------
+# EngagementRollup holds per photo, per day counts. `manage.py rollup_analytics`
+# recomputes the last WINDOW_DAYS days every few minutes: each run counts the
+# raw rows of those days (on the read replica when there is one, through the
+# created_at/saved_at indexes) and replaces their rollup rows in one
+# transaction, so reruns are idempotent and late unlikes are picked up. Admin
+# reads only ever touch the rollups.
+METRICS = {
+    'likes': (Like, 'created_at'),
+    'comments': (Comment, 'created_at'),
+    'saves': (SavedPhoto, 'saved_at'),
+}
+WINDOW_DAYS = 2
+BACKFILL_CHUNK_DAYS = 31
+MAX_RANGE_DAYS = 366
+SUMMARY_DAYS = 30
+TOP_PHOTOS = 10
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def days(start, end):
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+# ----------------------------
+# Rolling up
+# ----------------------------
+def count_window(start, end):
+    """{(photo_id, day): {metric: count}} from the raw tables, for days start..end inclusive."""
+    counts = defaultdict(dict)
+    since, until = _midnight(start), _midnight(end + datetime.timedelta(days=1))
+    with read_from_replica():
+        for metric, (model, timestamp) in METRICS.items():
+            rows = (model.objects.filter(**{f'{timestamp}__gte': since, f'{timestamp}__lt': until})
+                    .annotate(day=TruncDate(timestamp)).values('post_id', 'day').annotate(n=Count('id')).order_by())
+            for row in rows.iterator():
+                counts[row['post_id'], row['day']][metric] = row['n']
+    return counts
+
+
+def rollup(start, end):
+    """Recompute the rollups of days start..end inclusive. Idempotent. Returns the rows written."""
+    counts = count_window(start, end)
+    rows = [EngagementRollup(photo_id=photo_id, day=day, **metrics) for (photo_id, day), metrics in counts.items()]
+    with transaction.atomic():
+        EngagementRollup.objects.filter(day__gte=start, day__lte=end).delete()
+        EngagementRollup.objects.bulk_create(rows, batch_size=500)
+    bump('analytics')
+    return len(rows)
+
+
+def rollup_recent(window=WINDOW_DAYS):
+    today = timezone.localdate()
+    return rollup(today - datetime.timedelta(days=window - 1), today)
+
+
+def backfill(since, chunk=BACKFILL_CHUNK_DAYS):
+    """Roll up every day from `since` to today, a chunk at a time. Returns the rows written."""
+    today, written = timezone.localdate(), 0
+    while since <= today:
+        end = min(since + datetime.timedelta(days=chunk - 1), today)
+        written += rollup(since, end)
+        since = end + datetime.timedelta(days=1)
+    return written
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+def daily_series(start, end, photo_id=None):
+    """[{'day', 'likes', 'comments', 'saves'}] for every day start..end, zeros included."""
+    rows = EngagementRollup.objects.filter(day__gte=start, day__lte=end)
+    if photo_id is not None:
+        rows = rows.filter(photo_id=photo_id)
+    totals = {row['day']: row for row in rows.values('day').annotate(**{m: Sum(m) for m in METRICS}).order_by()}
+    return [{'day': day, **{m: totals.get(day, {}).get(m) or 0 for m in METRICS}} for day in days(start, end)]
+
+
+def top_photos(start, end, limit=TOP_PHOTOS):
+    """The photos with the most engagement over days start..end, busiest first."""
+    rows = (EngagementRollup.objects.filter(day__gte=start, day__lte=end)
+            .values('photo_id', 'photo__title').annotate(**{m: Sum(m) for m in METRICS})
+            .annotate(total=F('likes') + F('comments') + F('saves')).order_by('-total', 'photo_id')[:limit])
+    return [{'photo_id': row['photo_id'], 'title': row['photo__title'], **{m: row[m] for m in METRICS},
+             'total': row['total']} for row in rows]
+
+
+def _moving_average(values, width=7):
+    averages, window = [], 0
+    for i, value in enumerate(values):
+        window += value - (values[i - width] if i >= width else 0)
+        averages.append(round(window / min(i + 1, width), 2))
+    return averages
+
+
+def summary(today=None):
+    """
+    The dashboard: the last SUMMARY_DAYS days per metric with 7-day moving
+    averages, totals against the previous period, and this week's top photos.
+    Built from the rollups once per rollup run and served from the cache.
+    """
+    today = today or timezone.localdate()
+    key = f"analytics:summary:{versions(['analytics'])}:{today.isoformat()}"
+    data = cache.get(key)
+    if data is None:
+        start = today - datetime.timedelta(days=2 * SUMMARY_DAYS - 1)
+        series = daily_series(start, today)
+        previous, current = series[:SUMMARY_DAYS], series[SUMMARY_DAYS:]
+        week_start = today - datetime.timedelta(days=today.weekday())
+        data = {
+            'days': [row['day'].isoformat() for row in current],
+            'series': {m: [row[m] for row in current] for m in METRICS},
+            'moving_average_7d': {m: _moving_average([row[m] for row in series])[SUMMARY_DAYS:] for m in METRICS},
+            'totals': {m: sum(row[m] for row in current) for m in METRICS},
+            'previous_totals': {m: sum(row[m] for row in previous) for m in METRICS},
+            'top_this_week': top_photos(week_start, today, limit=5),
+        }
+        cache.set(key, data, timeout=24 * 3600)
+    return data
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PictaleAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pictale_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the engagement counter receivers)
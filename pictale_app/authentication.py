@@ -0,0 +1,196 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .models import ApiTokenUsage
+
+
+# ----------------------------
+# Token lookup cache
+# ----------------------------
+class TokenCache:
+    """
+    Bounded in-process LRU of token key -> (user, token, cached_at).
+    With API_TOKEN_CACHE_SHARED (the default) every hit is also checked against
+    a marker in the Django cache, so an invalidation in one process reaches all
+    of them. Without it, other processes keep accepting a revoked token for up
+    to API_TOKEN_CACHE_TTL seconds.
+    """
+    SHARED_PREFIX = 'authtok:'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'API_TOKEN_CACHE_SIZE', 1024)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'API_TOKEN_CACHE_TTL', 300)
+
+    @property
+    def shared(self):
+        return getattr(settings, 'API_TOKEN_CACHE_SHARED', True)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, token, cached_at = entry
+            if time.monotonic() - cached_at > self.ttl:
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+        if self.shared and cache.get(self.SHARED_PREFIX + key) is None:
+            self.invalidate(key)
+            return None
+        return user, token
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (user, token, time.monotonic())
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+        if self.shared:
+            cache.set(self.SHARED_PREFIX + key, user.pk, timeout=self.ttl)
+            # A logout or deactivation that finished while this request looked the
+            # token up has already deleted the marker; do not bring it back
+            if not Token.objects.filter(key=key, user__is_active=True).exists():
+                self.invalidate(key)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._discard(key)
+        if self.shared:
+            cache.delete(self.SHARED_PREFIX + key)
+
+    def invalidate_user(self, user_id, everywhere=True):
+        """
+        Drop every cached token of a user; with `everywhere`, in all processes
+        when the cache is shared.
+        """
+        with self._lock:
+            keys = set(self._keys_by_user.get(user_id, ()))
+            for key in keys:
+                self._discard(key)
+        if self.shared and everywhere:
+            # Other processes may hold a key this one never saw
+            keys.update(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+            if keys:
+                cache.delete_many([self.SHARED_PREFIX + key for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[0].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[0].pk]
+
+
+token_cache = TokenCache()
+
+
+# ----------------------------
+# Last-used tracking
+# ----------------------------
+class TokenUsageRecorder:
+    """
+    Collects last-used times per token key in memory. flush() writes them with
+    one upsert; it runs on request_finished once API_TOKEN_USAGE_FLUSH_INTERVAL
+    seconds have passed, after the response has been produced.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, key):
+        with self._lock:
+            self._pending[key] = timezone.now()
+
+    def due(self):
+        interval = getattr(settings, 'API_TOKEN_USAGE_FLUSH_INTERVAL', 60)
+        return bool(self._pending) and time.monotonic() - self._last_flush >= interval
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        # Tokens deleted since they were used (logout) have nothing to record
+        live = set(Token.objects.filter(key__in=list(pending)).values_list('key', flat=True)) if pending else ()
+        if not live:
+            return 0
+        ApiTokenUsage.objects.bulk_create(
+            [ApiTokenUsage(token_id=key, last_used_at=used_at) for key, used_at in pending.items() if key in live],
+            update_conflicts=True, unique_fields=['token'], update_fields=['last_used_at'],
+        )
+        return len(live)
+
+
+token_usage = TokenUsageRecorder()
+
+
+# ----------------------------
+# Authentication class
+# ----------------------------
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that skips the Token+User query for recently seen keys.
+    Entries are dropped when the token is deleted (logout) and when the user is
+    saved or deleted; password, activation and permission changes reach every
+    process -- see pictale_app.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = cached
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        token_usage.touch(key)
+        # Hand each request its own copy so views cannot mutate the cached user
+        return copy.copy(user), token
+
+
+def cached_credentials(request):
+    """
+    (user, token) for a request whose token is already cached and active,
+    otherwise None. Never touches the database, so async views can call it.
+    """
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+    cached = token_cache.get(key)
+    if cached is None or not cached[0].is_active:
+        return None
+    token_usage.touch(key)
+    return copy.copy(cached[0]), cached[1]
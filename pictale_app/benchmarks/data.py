@@ -0,0 +1,120 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from pictale_app.caching import bump
+from pictale_app.models import User, DailyPhoto, Comment, Like, SavedPhoto
+from pictale_app.search import rebuild_index
+
+# ----------------------------
+# Synthetic data
+# ----------------------------
+# Engagement follows a Zipf-like long tail: a few photos collect most of the
+# likes and comments, most photos get a handful, and users vary just as much in
+# how active they are. The same seed always produces the same rows.
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+BATCH_SIZE = 1000
+
+WORDS = (
+    'morning light harbour quiet street market rain window garden mountain river '
+    'city evening shadow portrait old bridge station winter summer festival market '
+    'coffee lantern alley market boats field clouds sunset tram balcony'
+).split()
+
+
+def _zipf_weights(n, exponent):
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _sample_distinct(rng, population, weights, k):
+    """Up to k distinct items, drawn by weight."""
+    picked = set()
+    for _ in range(k * 3):
+        if len(picked) >= k:
+            break
+        picked.add(rng.choices(population, weights)[0])
+    return picked
+
+
+def clear():
+    """Remove every benchmark user and the photos, comments, likes and saves they own."""
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    DailyPhoto.objects.filter(author__in=users).delete()
+    return users.delete()[0]
+
+
+@transaction.atomic
+def seed(users=200, photos=365, seed=42, likes_per_user=30, comments_per_user=8, saves_per_user=5):
+    """
+    Create `users` benchmark users and `photos` daily photos with long-tail
+    engagement. Photos are featured on consecutive days ending just before the
+    earliest existing photo (or yesterday), so real data is left alone.
+    Returns a dict with the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    now = timezone.now()
+
+    User.objects.bulk_create([
+        User(username=f'{USERNAME_PREFIX}{i}', email=f'{USERNAME_PREFIX}{i}@example.com', password=password)
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+    people = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id'))
+
+    earliest = DailyPhoto.objects.order_by('date_featured').values_list('date_featured', flat=True).first()
+    last_day = (earliest or timezone.localdate()) - datetime.timedelta(days=1)
+    DailyPhoto.objects.bulk_create([
+        DailyPhoto(
+            title=_sentence(rng, rng.randint(2, 5)).rstrip('.'),
+            story=' '.join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(1, 4))),
+            image='daily_photos/benchmark.jpg',
+            date_featured=last_day - datetime.timedelta(days=day),
+            author=rng.choice(people),
+        )
+        for day in range(photos)
+    ], batch_size=BATCH_SIZE)
+    photo_ids = list(DailyPhoto.objects.filter(author__in=people).order_by('id').values_list('id', flat=True))
+    # Popularity is independent of date, so shuffle before ranking
+    rng.shuffle(photo_ids)
+    popularity = _zipf_weights(len(photo_ids), 1.1)
+    activity = _zipf_weights(len(people), 0.8)
+    rng.shuffle(activity)
+
+    likes, comments, saves = [], [], []
+    mean_activity = sum(activity) / len(activity)
+    for person, weight in zip(people, activity):
+        # Scaled so the per-user arguments are the averages across all users
+        scale = weight / mean_activity
+        for photo_id in _sample_distinct(rng, photo_ids, popularity, max(1, round(likes_per_user * scale))):
+            likes.append(Like(user=person, post_id=photo_id))
+        for photo_id in _sample_distinct(rng, photo_ids, popularity, round(saves_per_user * scale)):
+            saves.append(SavedPhoto(user=person, post_id=photo_id))
+        for _ in range(round(comments_per_user * scale)):
+            comments.append(Comment(
+                user=person, post_id=rng.choices(photo_ids, popularity)[0],
+                comment_text=_sentence(rng, rng.randint(3, 12)),
+            ))
+
+    Like.objects.bulk_create(likes, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    SavedPhoto.objects.bulk_create(saves, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+    # Spread comment times over the last year so ordering and cursors are realistic
+    spread = list(Comment.objects.filter(user__in=people).only('id').order_by('id'))
+    for comment in spread:
+        comment.created_at = now - datetime.timedelta(minutes=rng.randint(0, 525600))
+    Comment.objects.bulk_update(spread, ['created_at'], batch_size=BATCH_SIZE)
+
+    # bulk_create skips signals: fix the counters, search index and cached pages by hand
+    DailyPhoto.objects.filter(id__in=photo_ids).recount_engagement()
+    rebuild_index()
+    bump('feed', 'archive')
+    return {'users': len(people), 'photos': len(photo_ids), 'likes': len(likes),
+            'saves': len(saves), 'comments': len(comments)}
@@ -0,0 +1,88 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from pictale_app.models import User, DailyPhoto, SavedPhoto, PhotoRecommendation
+from pictale_app.views.api_views import (
+    DailyPhotoViewSet, CommentViewSet, LikeViewSet, SavedPhotoViewSet, PhotoRecommendationViewSet, TimelineViewSet,
+)
+
+# ----------------------------
+# Query plans
+# ----------------------------
+# EXPLAIN the queryset behind each hot access pattern, as the viewsets and
+# views build it and sliced to one page, and flag plans that read a whole table
+# or sort a whole result. Part of the benchmark gate (see run_benchmarks).
+PAGE = 10
+SAMPLE_ID = 1
+
+# SQLite: "SCAN t" without an index is a full table scan; PostgreSQL: "Seq Scan on t"
+_FULL_SCAN_RE = re.compile(r'\bSCAN (\w+)(?!.*\b(?:USING|VIRTUAL TABLE)\b)|Seq Scan on (\w+)')
+# SQLite: a temporary b-tree for ORDER BY; PostgreSQL: a Sort node
+_SORT_RE = re.compile(r'USE TEMP B-TREE FOR ORDER BY|^\s*(?:->\s*)?Sort\b', re.MULTILINE)
+
+
+def _viewset_queryset(viewset_class, action, params=None, user=None, **kwargs):
+    request = Request(RequestFactory().get('/', params or {}))
+    request.user = user or AnonymousUser()
+    view = viewset_class(request=request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+    return view.filter_queryset(view.get_queryset())
+
+
+def access_patterns():
+    """{name: (queryset, note)}; a note marks a scan that is known and accepted."""
+    photo = DailyPhoto(pk=SAMPLE_ID)
+    return {
+        'dailyphotos.list': (_viewset_queryset(DailyPhotoViewSet, 'list'), None),
+        'dailyphotos.list?author__username': (
+            _viewset_queryset(DailyPhotoViewSet, 'list', {'author__username': 'someone'}), None),
+        'dailyphotos.list?search': (_viewset_queryset(DailyPhotoViewSet, 'list', {'search': 'light'}),
+                                    "only the full-text matches are sorted, by relevance"),
+        'dailyphotos.comments': (photo.comments.select_related('user').order_by('-created_at', '-id'), None),
+        'dailyphotos.likes': (photo.likes.select_related('user').order_by('-created_at', '-id'), None),
+        'comments.list': (_viewset_queryset(CommentViewSet, 'list'), None),
+        'comments.list?post_id': (_viewset_queryset(CommentViewSet, 'list', {'post_id': SAMPLE_ID}), None),
+        'likes.list': (_viewset_queryset(LikeViewSet, 'list'),
+                       "site-wide list of every like; not on a hot path"),
+        'savedphotos.list': (_viewset_queryset(SavedPhotoViewSet, 'list'),
+                             "site-wide list of every save; not on a hot path"),
+        'recommendations.list': (_viewset_queryset(PhotoRecommendationViewSet, 'list', user=User(pk=SAMPLE_ID)),
+                                 "a user's own recommendations, sorted after the user_id lookup"),
+        'recommendations.queue': (
+            PhotoRecommendation.objects.filter(status='pending').order_by('created_at', 'id'), None),
+        'timeline': (_viewset_queryset(TimelineViewSet, 'list', user=User(pk=SAMPLE_ID))
+                     .order_by('-activity_at', '-id'), None),
+        'profile.saved_photos': (
+            SavedPhoto.objects.filter(user_id=SAMPLE_ID).select_related('post').order_by('-saved_at'), None),
+    }
+
+
+def analyze(plan):
+    """(tables read in full, number of full sorts) in an EXPLAIN output."""
+    scans = sorted({a or b for a, b in _FULL_SCAN_RE.findall(plan)})
+    return scans, len(_SORT_RE.findall(plan))
+
+
+def explain_patterns(patterns=None):
+    """
+    {name: {'full_scans': n, 'full_sorts': n, 'tables': [...], 'note': ..., 'plan': ...}}.
+    The counts are lower-is-better metrics, so compare() catches plans that got worse.
+    """
+    results = {}
+    for name, (queryset, note) in (patterns or access_patterns()).items():
+        plan = queryset[:PAGE].explain()
+        scans, sorts = analyze(plan)
+        results[name] = {
+            'full_scans': len(scans), 'full_sorts': sorts, 'tables': scans,
+            'note': note, 'plan': plan, 'vendor': connection.vendor,
+        }
+    return results
+
+
+def problems(results):
+    """Names of patterns with a full scan or sort that is not marked as accepted."""
+    return [name for name, result in results.items()
+            if (result['full_scans'] or result['full_sorts']) and not result['note']]
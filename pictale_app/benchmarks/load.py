@@ -0,0 +1,75 @@
+import http.client
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from . import summarize
+
+# ----------------------------
+# Load driver
+# ----------------------------
+# Sends GETs over HTTP to a running server (runserver, gunicorn, uvicorn ...)
+# from `concurrency` threads, each holding a keep-alive connection, cycling
+# through the paths. Queries per request come from the X-Query-Count header
+# that QueryCountMiddleware adds when QUERY_COUNT_ENABLED is on.
+
+
+def run_load(base_url, paths, requests=1000, concurrency=16, timeout=30, headers=None):
+    target = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+    prefix = target.path.rstrip('/')
+    local = threading.local()
+    headers = dict(headers or {})
+
+    def one(index):
+        path = paths[index % len(paths)]
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = connection_class(target.netloc, timeout=timeout)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', prefix + path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            local.conn = None
+            return path, time.perf_counter() - start, 0, 0, None
+        elapsed = time.perf_counter() - start
+        if response.getheader('Connection', '').lower() == 'close':
+            conn.close()
+            local.conn = None
+        queries = response.getheader('X-Query-Count')
+        return path, elapsed, response.status, len(body), int(queries) if queries else None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    by_path = defaultdict(list)
+    for sample in samples:
+        by_path[sample[0]].append(sample)
+    results = {f'load {path}': _aggregate(rows, wall=None) for path, rows in by_path.items()}
+    results['load total'] = _aggregate(samples, wall=wall)
+    results['load total']['concurrency'] = concurrency
+    return results
+
+
+def _aggregate(samples, wall):
+    latencies = [sample[1] for sample in samples]
+    sizes = [sample[3] for sample in samples]
+    queries = [sample[4] for sample in samples if sample[4] is not None]
+    result = {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not 200 <= sample[2] < 400),
+        **summarize(latencies),
+        'bytes_per_response': round(sum(sizes) / len(sizes)) if sizes else 0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+    if wall:
+        result['wall_s'] = round(wall, 3)
+        result['requests_per_s'] = round(len(samples) / wall, 1)
+    return result
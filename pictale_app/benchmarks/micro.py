@@ -0,0 +1,100 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from pictale_app.models import DailyPhoto, Comment, User
+from pictale_app.serializers import DailyPhotoSerializer, CommentSerializer
+from . import summarize
+
+# ----------------------------
+# Microbenchmarks
+# ----------------------------
+# Serializers are timed on rows already in memory, so they measure Python cost
+# only. Views go through the test client (full middleware stack, no network) and
+# are timed twice: cold with the response cache cleared before every request,
+# and warm.
+PAGE_SIZE = 10
+
+
+def _time(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def serializer_benchmarks(repeat=50, host='localhost'):
+    request = Request(RequestFactory().get('/api/dailyphotos/', HTTP_HOST=host))
+    photos = list(DailyPhoto.objects.order_by('-date_featured')[:PAGE_SIZE])
+    previewed = list(DailyPhoto.objects.order_by('-date_featured').prefetch_related('comments__user')[:PAGE_SIZE])
+    for photo in previewed:
+        photo.latest_comments = list(photo.comments.all())[:3]
+    comments = list(Comment.objects.select_related('user').order_by('-created_at', '-id')[:100])
+
+    cases = {
+        'serializer.dailyphoto_page': lambda: DailyPhotoSerializer(
+            photos, many=True, context={'request': request}).data,
+        'serializer.dailyphoto_page_preview3': lambda: DailyPhotoSerializer(
+            previewed, many=True, context={'request': request, 'comments_preview': 3}).data,
+        'serializer.comments_100': lambda: CommentSerializer(comments, many=True).data,
+    }
+    return {name: summarize(_time(func, repeat)) for name, func in cases.items()}
+
+
+def default_view_paths():
+    photo_id = DailyPhoto.objects.order_by('-date_featured').values_list('id', flat=True).first()
+    paths = ['/', '/api/dailyphotos/', '/api/dailyphotos/?comments_preview=3',
+             '/api/dailyphotos/?search=market', '/api/comments/']
+    if photo_id:
+        paths += [f'/photo/{photo_id}/', f'/api/dailyphotos/{photo_id}/',
+                  f'/api/dailyphotos/{photo_id}/comments/', f'/api/dailyphotos/{photo_id}/likes/']
+    return paths
+
+
+def _view_case(client, path, repeat, cold, headers):
+    latencies, queries, sizes, statuses = [], [], [], set()
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+        statuses.add(response.status_code)
+    return {
+        **summarize(latencies),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'bytes_per_response': round(sum(sizes) / len(sizes)),
+        'status': sorted(statuses),
+    }
+
+
+def view_benchmarks(paths=None, repeat=20, username=None, host='localhost'):
+    """
+    Time each path cold and warm. With `username`, API requests carry that
+    user's token and pages are rendered for them (the uncached, logged-in path).
+    `host` must be in ALLOWED_HOSTS.
+    """
+    client = Client(HTTP_HOST=host)
+    headers = {}
+    if username:
+        user = User.objects.get(username=username)
+        token, _ = Token.objects.get_or_create(user=user)
+        headers['Authorization'] = f'Token {token.key}'
+        client.force_login(user)
+
+    results = {}
+    for path in paths or default_view_paths():
+        client.get(path, headers=headers)  # warm-up: imports, template loading
+        results[f'view.cold {path}'] = _view_case(client, path, repeat, True, headers)
+        results[f'view.warm {path}'] = _view_case(client, path, repeat, False, headers)
+    return results
@@ -0,0 +1,87 @@
+import datetime
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.db import connection
+
+# ----------------------------
+# Machine-readable reports
+# ----------------------------
+# A report is {'meta': {...}, 'results': {case name: {metric: value}}}. compare()
+# checks a report against a saved baseline: latency and size metrics may not
+# grow by more than the tolerance; queries per request and full scans/sorts in
+# query plans may not grow at all.
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms', 'bytes_per_response')
+PLAN_METRICS = ('full_scans', 'full_sorts')
+QUERY_METRIC = 'queries_per_request'
+# Load runs average over cache hits and misses, so allow some query noise there
+QUERY_SLACK = 0.5
+# Ignore latency changes smaller than this; sub-millisecond cases are too noisy
+MIN_DELTA_MS = 0.5
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(suite, results, **params):
+    return {
+        'meta': {
+            'suite': suite,
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            **params,
+        },
+        'results': results,
+    }
+
+
+def load_report(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def write_report(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Regressions of `report` against `baseline` as a list of human-readable
+    strings; empty when nothing got worse. Cases missing from either side are skipped.
+    """
+    regressions = []
+    for case, metrics in sorted(report['results'].items()):
+        before = baseline['results'].get(case)
+        if not before:
+            continue
+        old, new = before.get(QUERY_METRIC), metrics.get(QUERY_METRIC)
+        if old is not None and new is not None and new > old + QUERY_SLACK:
+            regressions.append(f"{case}: {QUERY_METRIC} {old} -> {new}")
+        for metric in PLAN_METRICS:
+            old, new = before.get(metric), metrics.get(metric)
+            if old is not None and new is not None and new > old:
+                regressions.append(f"{case}: {metric} {old} -> {new}")
+        for metric in LOWER_IS_BETTER:
+            old, new = before.get(metric), metrics.get(metric)
+            if old is None or new is None or new <= old * (1 + tolerance):
+                continue
+            if metric.endswith('_ms') and new - old < MIN_DELTA_MS:
+                continue
+            regressions.append(f"{case}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)" if old
+                               else f"{case}: {metric} {old} -> {new}")
+    return regressions
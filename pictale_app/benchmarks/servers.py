@@ -0,0 +1,113 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import RequestFactory
+
+from . import summarize
+
+# ----------------------------
+# WSGI vs ASGI, in process
+# ----------------------------
+# Both drivers call the Django application objects directly, the way a server
+# would, so the numbers compare the handlers and views rather than a web server.
+# WSGI gets one thread per concurrent request (like a threaded server); ASGI runs
+# every request as a task on one event loop (like uvicorn with one worker).
+
+
+def _result(server, latencies, statuses, sizes, wall):
+    return {
+        'server': server,
+        'requests': len(latencies),
+        'concurrency': None,
+        'wall_s': round(wall, 3),
+        'requests_per_s': round(len(latencies) / wall, 1) if wall else None,
+        'errors': sum(1 for status in statuses if status >= 400),
+        'bytes_per_response': round(sum(sizes) / len(sizes)) if sizes else 0,
+        **summarize(latencies),
+    }
+
+
+def run_wsgi(paths, requests, concurrency, host='localhost'):
+    application = get_wsgi_application()
+    factory = RequestFactory()
+
+    def one(index):
+        path = paths[index % len(paths)]
+        environ = factory.get(path, HTTP_HOST=host).environ
+        status = []
+        start = time.perf_counter()
+        body = b''.join(application(environ, lambda s, headers, exc_info=None: status.append(s)))
+        elapsed = time.perf_counter() - start
+        return elapsed, int(status[0].split()[0]), len(body)
+
+    def close_connections(_):
+        connections.close_all()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+        list(pool.map(close_connections, range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies, statuses, sizes = zip(*results) if results else ((), (), ())
+    result = _result('wsgi', latencies, statuses, sizes, wall)
+    result['concurrency'] = concurrency
+    return result
+
+
+async def _asgi_request(application, path, host):
+    parts = urlsplit(path)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(), 'root_path': '',
+        'headers': [(b'host', host.encode())], 'server': (host, 80), 'client': ('127.0.0.1', 0),
+    }
+    disconnected = asyncio.Event()
+    received = []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    response = {'status': 0, 'size': 0}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['size'] += len(message.get('body', b''))
+
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    disconnected.set()
+    return elapsed, response['status'], response['size']
+
+
+def run_asgi(paths, requests, concurrency, host='localhost'):
+    application = get_asgi_application()
+
+    async def drive():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(index):
+            async with semaphore:
+                return await _asgi_request(application, paths[index % len(paths)], host)
+
+        return await asyncio.gather(*(one(index) for index in range(requests)))
+
+    start = time.perf_counter()
+    results = asyncio.run(drive())
+    wall = time.perf_counter() - start
+    latencies, statuses, sizes = zip(*results) if results else ((), (), ())
+    result = _result('asgi', latencies, statuses, sizes, wall)
+    result['concurrency'] = concurrency
+    return result
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections
+
+from pictale_app.engagement import add_engagement
+from pictale_app.models import DailyPhoto, Comment, Like, User
+from . import summarize
+
+# ----------------------------
+# SQLite write concurrency
+# ----------------------------
+# Runs writer (and optional reader) processes against a private copy of the
+# database, once per connection profile, and reports throughput, latency and
+# how many operations failed with "database is locked". Each writer comments
+# on, likes and unlikes random photos through the same code as the views.
+PROFILES = {
+    # Django's SQLite defaults: rollback journal, deferred transactions,
+    # 5 second busy timeout, a new connection per request
+    'django-default': {'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'}, 'CONN_MAX_AGE': 0},
+    # settings.DATABASES['default'] as configured (WAL, pragmas, IMMEDIATE, kept connections)
+    'configured': None,
+}
+
+
+def _profile(name):
+    profile = PROFILES[name]
+    if profile is None:
+        configured = settings.DATABASES['default']
+        profile = {'OPTIONS': dict(configured.get('OPTIONS', {})), 'CONN_MAX_AGE': configured.get('CONN_MAX_AGE', 0)}
+    return profile
+
+
+def _use_database(path, profile):
+    """Point this (forked) process's default connection at `path` with `profile`."""
+    conn = connections['default']
+    conn.close()
+    conn.settings_dict = {**conn.settings_dict, 'NAME': path, **profile}
+
+
+def _writer(path, profile, operations, seed, user_ids, photo_ids):
+    _use_database(path, profile)
+    rng = random.Random(seed)
+    latencies, locked = [], 0
+    for _ in range(operations):
+        user = User(pk=rng.choice(user_ids))
+        photo_id = rng.choice(photo_ids)
+        start = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                Comment.objects.create(user=user, post_id=photo_id, comment_text='benchmark')
+            else:
+                like, created = add_engagement(Like, user, photo_id)
+                if not created:
+                    Like.objects.filter(user=user, post_id=photo_id).delete()
+        except OperationalError:
+            locked += 1
+        latencies.append(time.perf_counter() - start)
+        if not profile['CONN_MAX_AGE']:
+            connection.close()  # as request_finished would
+    connection.close()
+    return latencies, locked
+
+
+def _reader(path, profile, operations, seed):
+    _use_database(path, profile)
+    latencies, locked = [], 0
+    for _ in range(operations):
+        start = time.perf_counter()
+        try:
+            list(DailyPhoto.objects.order_by('-date_featured')[:10])
+        except OperationalError:
+            locked += 1
+        latencies.append(time.perf_counter() - start)
+        if not profile['CONN_MAX_AGE']:
+            connection.close()
+    connection.close()
+    return latencies, locked
+
+
+def _copy_database(directory, name):
+    """Copy the configured database with the backup API (safe while it is in use)."""
+    path = os.path.join(directory, f'{name}.sqlite3')
+    source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+    target = sqlite3.connect(path)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+    return path
+
+
+def run_profile(name, writers=8, readers=0, operations=200, seed=42):
+    if connection.vendor != 'sqlite':
+        raise RuntimeError("The write concurrency benchmark needs the SQLite backend.")
+    user_ids = list(User.objects.values_list('id', flat=True)[:500])
+    photo_ids = list(DailyPhoto.objects.values_list('id', flat=True)[:500])
+    if not user_ids or not photo_ids:
+        raise RuntimeError("Needs users and photos; run seed_benchmark_data first.")
+
+    profile = _profile(name)
+    directory = tempfile.mkdtemp(prefix='pictale-writes-')
+    try:
+        path = _copy_database(directory, name)
+        # Forked workers must not share the parent's open connection
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=writers + readers, mp_context=multiprocessing.get_context('fork'))
+        start = time.perf_counter()
+        with pool:
+            write_jobs = [pool.submit(_writer, path, profile, operations, seed + i, user_ids, photo_ids)
+                          for i in range(writers)]
+            read_jobs = [pool.submit(_reader, path, profile, operations, seed + writers + i)
+                         for i in range(readers)]
+            write_results = [job.result() for job in write_jobs]
+            read_results = [job.result() for job in read_jobs]
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    result = {'profile': name, 'writers': writers, 'readers': readers, 'wall_s': round(wall, 3)}
+    for kind, results in (('write', write_results), ('read', read_results)):
+        if not results:
+            continue
+        latencies = [value for values, _ in results for value in values]
+        result[kind] = {
+            'operations': len(latencies),
+            'per_s': round(len(latencies) / wall, 1),
+            'locked_errors': sum(locked for _, locked in results),
+            **summarize(latencies),
+        }
+    return result
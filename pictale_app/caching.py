@@ -0,0 +1,187 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .publishing import publishing_date
+from .routers import pin_primary
+
+# ----------------------------
+# Versioned response cache
+# ----------------------------
+# Cached responses are keyed on the version of every scope they depend on:
+#   feed        any photo, comment, like or save changed (lists, default home page)
+#   archive     a photo was created, deleted or re-dated (neighbour links)
+#   photo:<id>  that photo or its engagement changed
+# Invalidation bumps the affected versions; stale entries are never read again
+# and simply age out. Use a shared cache backend when running several processes.
+# feed and archive also change at midnight, when the next photo is published
+# without any write, so their keys carry the publishing date as well.
+VERSION_PREFIX = 'respver:'
+ENTRY_PREFIX = 'resp:'
+DATED_SCOPES = ('feed', 'archive')
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600)
+
+
+def versions(scopes):
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    return '.'.join(str(found.get(key, 0)) for key in keys)
+
+
+def bump(*scopes):
+    """
+    Move the versions of `scopes` once the current transaction commits (at once
+    outside one). Bumping earlier would let a concurrent miss cache the old rows
+    under the new version, where they would stay until the next write.
+    """
+    transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def _bump_now(scopes):
+    for scope in scopes:
+        key = VERSION_PREFIX + scope
+        # add() seeds the counter; incr() is atomic on backends that support it
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+    # Responses cached under the new versions must not be built from a lagging
+    # replica. Index rebuilds and rollups (similar, fingerprints, analytics) are
+    # not served from it and leave replica routing alone.
+    if any(scope in DATED_SCOPES or scope.startswith('photo:') for scope in scopes):
+        pin_primary()
+
+
+def invalidate_photo(photo_id, archive=False):
+    scopes = ['feed', f'photo:{photo_id}']
+    if archive:
+        scopes.append('archive')
+    bump(*scopes)
+
+
+def cache_entry_key(name, scopes, params, request=None):
+    """
+    Return (cache key, ETag) for a response that depends on `scopes` and `params`.
+    Payloads carry absolute URLs, so the request's scheme and host are part of the key.
+    """
+    version = versions(scopes)
+    if any(scope in DATED_SCOPES for scope in scopes):
+        version = f"{version}@{publishing_date().isoformat()}"
+    origin = f"{request.scheme}://{request.get_host()}" if request is not None else ''
+    raw = f"{name}|{origin}|{version}|{sorted(params.items())}"
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return ENTRY_PREFIX + digest, f'"{digest}"'
+
+
+def relevant_params(request, names):
+    return {name: request.GET.get(name) for name in names if name in request.GET}
+
+
+def get_entry(key):
+    return cache.get(key)
+
+
+def set_entry(key, entry):
+    cache.set(key, entry, timeout=_timeout())
+
+
+def timestamp(value):
+    """Seconds since the epoch for a datetime (or None), as used by Last-Modified."""
+    return int(value.timestamp()) if value else None
+
+
+# ----------------------------
+# Conditional GET
+# ----------------------------
+def not_modified(request, etag, last_modified=None):
+    """An HttpResponseNotModified if the client's copy is current, otherwise None."""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+# ----------------------------
+# Anonymous page cache
+# ----------------------------
+def cache_anonymous_page(scopes):
+    """
+    Cache a function view's rendered page for anonymous GETs.
+    `scopes(**view_kwargs)` lists the versions the page depends on. A view can
+    set a Last-Modified header, which is kept with the cached copy. Logged-in
+    users and requests carrying flash messages always get a fresh render.
+    Works on both sync and async views.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # Resolve the user here so neither this check nor the template
+                # lazily loads the session and user from the event loop
+                request.user = await request.auser()
+                if not _cacheable(request):
+                    return await view_func(request, *args, **kwargs)
+                key, etag = cache_entry_key(view_func.__name__, scopes(**kwargs), kwargs, request)
+                entry = get_entry(key)
+                response = None
+                if entry is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    entry = _store_page(key, response)
+                return _respond(request, etag, entry, response)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            key, etag = cache_entry_key(view_func.__name__, scopes(**kwargs), kwargs, request)
+            entry = get_entry(key)
+            response = None
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                entry = _store_page(key, response)
+            return _respond(request, etag, entry, response)
+        return wrapper
+    return decorator
+
+
+def _cacheable(request):
+    return (request.method in ('GET', 'HEAD') and 'messages' not in request.COOKIES
+            and not request.user.is_authenticated)
+
+
+def _store_page(key, response):
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'last_modified': parse_http_date_safe(response.get('Last-Modified', '')),
+    }
+    set_entry(key, entry)
+    return entry
+
+
+def _respond(request, etag, entry, response=None):
+    if response is None:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    return not_modified(request, etag, entry['last_modified']) or set_validators(
+        response, etag, entry['last_modified'])
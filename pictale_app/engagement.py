@@ -0,0 +1,111 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
+from django.utils import timezone
+
+from . import timeline
+from .caching import invalidate_photo
+from .likebuffer import like_buffer
+from .models import DailyPhoto, Like, SavedPhoto
+from .publishing import publishing_date
+
+# Likes and saves are (user, post) pairs protected by unique_together, so writes
+# lean on the constraint instead of checking first and inserting second.
+MAX_BATCH = 50
+
+
+# ----------------------------
+# Counters
+# ----------------------------
+def adjust_counter(photo_id, field, delta):
+    """Move one denormalized DailyPhoto counter and invalidate the cached photo."""
+    # updated_at moves with the counters so ETag/Last-Modified see engagement changes
+    DailyPhoto.objects.filter(pk=photo_id).update(**{field: Greatest(F(field) + delta, 0)}, updated_at=Now())
+    invalidate_photo(photo_id)
+
+
+# ----------------------------
+# Single like / save
+# ----------------------------
+def add_engagement(model, user, photo_id):
+    """
+    Like/save one photo in a single INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    The SELECT from DailyPhoto validates the photo and the unique constraint
+    absorbs double-taps, so concurrent requests never race into an IntegrityError.
+
+    Returns (row, created) like get_or_create, except that an existing row is not
+    fetched (row is None). Raises DailyPhoto.DoesNotExist for an unknown photo.
+    """
+    opts = model._meta
+    qn = connection.ops.quote_name
+    timestamp_field = next(f for f in opts.concrete_fields if getattr(f, 'auto_now_add', False))
+    now = timezone.now()
+    sql = (
+        f"INSERT INTO {qn(opts.db_table)} ({qn('user_id')}, {qn('post_id')}, {qn(timestamp_field.column)}) "
+        f"SELECT %s, {qn('id')}, %s FROM {qn(DailyPhoto._meta.db_table)} "
+        f"WHERE {qn('id')} = %s AND {qn('date_featured')} <= %s "
+        f"ON CONFLICT DO NOTHING RETURNING {qn('id')}"
+    )
+    published_by = DailyPhoto._meta.get_field('date_featured').get_db_prep_value(publishing_date(), connection)
+    params = [user.pk, timestamp_field.get_db_prep_value(now, connection), photo_id, published_by]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            inserted = cursor.fetchone()
+        if inserted:
+            adjust_counter(photo_id, model.counter_field, 1)
+            timeline.record(model, user.pk, [photo_id], now)
+
+    if inserted:
+        row = model(id=inserted[0], user=user, post_id=photo_id, **{timestamp_field.attname: now})
+        return row, True
+    if not DailyPhoto.objects.published().filter(pk=photo_id).exists():
+        raise DailyPhoto.DoesNotExist(f"No DailyPhoto with id {photo_id}.")
+    return None, False
+
+
+def engagement_status(user, photo_ids):
+    """{photo_id: {'liked_by_me': bool, 'saved_by_me': bool}} using one query per relation."""
+    liked = set(Like.objects.filter(user=user, post_id__in=photo_ids).values_list('post_id', flat=True))
+    liked |= like_buffer.pending_for(user.pk, photo_ids)  # write-behind likes not flushed yet
+    saved = set(SavedPhoto.objects.filter(user=user, post_id__in=photo_ids).values_list('post_id', flat=True))
+    return {
+        photo_id: {'liked_by_me': photo_id in liked, 'saved_by_me': photo_id in saved}
+        for photo_id in photo_ids
+    }
+
+
+def bulk_add(model, user, photo_ids):
+    """
+    Like/save every photo in photo_ids for user. Returns (created_ids, missing_ids);
+    scheduled photos count as missing.
+    bulk_create skips post_save, so the counters of the touched photos are recounted.
+    """
+    with transaction.atomic():
+        existing = set(DailyPhoto.objects.published().filter(id__in=photo_ids).values_list('id', flat=True))
+        already = set(model.objects.filter(user=user, post_id__in=existing).values_list('post_id', flat=True))
+        created = [photo_id for photo_id in photo_ids if photo_id in existing and photo_id not in already]
+        if created:
+            model.objects.bulk_create(
+                [model(user=user, post_id=photo_id) for photo_id in created], ignore_conflicts=True
+            )
+            DailyPhoto.objects.filter(id__in=created).recount_engagement()
+            timeline.record(model, user.pk, created)
+    for photo_id in created:
+        invalidate_photo(photo_id)
+    return created, [photo_id for photo_id in photo_ids if photo_id not in existing]
+
+
+def bulk_remove(model, user, photo_ids):
+    """
+    Unlike/unsave every photo in photo_ids for user. Returns the ids that changed.
+    Each row's post_delete moves its counter, updates the timeline and
+    invalidates the cached photo. Unliking also drops likes still in the
+    write-behind buffer.
+    """
+    buffered = like_buffer.discard(user.pk, photo_ids) if model is Like else []
+    with transaction.atomic():
+        removed = list(model.objects.filter(user=user, post_id__in=photo_ids).values_list('post_id', flat=True))
+        if removed:
+            model.objects.filter(user=user, post_id__in=removed).delete()
+    return removed + [photo_id for photo_id in buffered if photo_id not in removed]
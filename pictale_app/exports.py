@@ -0,0 +1,200 @@
+import csv
+import datetime
+import itertools
+import json
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import DailyPhoto, Comment, Like, SavedPhoto
+
+# ----------------------------
+# Streaming exports
+# ----------------------------
+# Rows come out of the database in chunks (QuerySet.iterator) as plain tuples
+# and are encoded and sent as they arrive, so memory stays flat however much
+# a user or the archive holds. Each export is {column: lookup}, in order.
+EXPORT_CHUNK_SIZE = 2000  # rows per database fetch
+STREAM_BUFFER_SIZE = 64 * 1024  # bytes per chunk handed to the server
+
+USER_EXPORTS = {
+    'saved': (SavedPhoto, 'saved_at', {
+        'photo_id': 'post_id', 'photo_title': 'post__title',
+        'photo_date_featured': 'post__date_featured', 'saved_at': 'saved_at',
+    }),
+    'comments': (Comment, 'id', {
+        'id': 'id', 'photo_id': 'post_id', 'photo_title': 'post__title',
+        'comment_text': 'comment_text', 'created_at': 'created_at',
+    }),
+    'likes': (Like, 'id', {
+        'photo_id': 'post_id', 'photo_title': 'post__title', 'created_at': 'created_at',
+    }),
+}
+
+ARCHIVE_TABLES = {
+    'photos': (DailyPhoto, 'id', {
+        'id': 'id', 'title': 'title', 'story': 'story', 'image': 'image',
+        'date_taken': 'date_taken', 'date_featured': 'date_featured',
+        'author': 'author__username', 'likes_count': 'likes_count',
+        'comments_count': 'comments_count', 'saves_count': 'saves_count',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    'comments': (Comment, 'id', {
+        'id': 'id', 'photo_id': 'post_id', 'user': 'user__username',
+        'comment_text': 'comment_text', 'created_at': 'created_at',
+    }),
+    'likes': (Like, 'id', {
+        'id': 'id', 'photo_id': 'post_id', 'user': 'user__username', 'created_at': 'created_at',
+    }),
+    'saved_photos': (SavedPhoto, 'id', {
+        'id': 'id', 'photo_id': 'post_id', 'user': 'user__username', 'saved_at': 'saved_at',
+    }),
+}
+
+_encoder = DjangoJSONEncoder()
+
+
+def export_rows(spec, **filters):
+    """(header, rows) for an export spec; rows is a lazy iterator of tuples."""
+    model, ordering, columns = spec
+    rows = (model.objects.filter(**filters).order_by(ordering)
+            .values_list(*columns.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    return list(columns), rows
+
+
+def _cell(value):
+    # Dates as in the JSON API and the NDJSON export
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return _encoder.default(value)
+    return value
+
+
+def ndjson_lines(header, rows, record_type=None):
+    prefix = {'type': record_type} if record_type else {}
+    for row in rows:
+        yield json.dumps({**prefix, **dict(zip(header, row))}, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    """A file-like object for csv.writer that hands back what is written."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def buffered(pieces, size=STREAM_BUFFER_SIZE):
+    """Join small str/bytes pieces into chunks of about `size` bytes."""
+    chunk, length = [], 0
+    for piece in pieces:
+        if isinstance(piece, str):
+            piece = piece.encode()
+        chunk.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield b''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+# ----------------------------
+# Zip archives
+# ----------------------------
+class _ZipSink:
+    """Write-only, unseekable target for ZipFile; drained after every member chunk."""
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts, self.size = [], 0
+        return data
+
+
+def zip_stream(members, size=STREAM_BUFFER_SIZE):
+    """
+    Stream a zip of `members`, (name, iterable of bytes, compress) tuples. ZipFile
+    writes sizes and CRCs after each member's data when it cannot seek back, so
+    nothing has to be held in memory beyond the current chunk.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for name, content, compress in members:
+            info = zipfile.ZipInfo(name, datetime.datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with archive.open(info, 'w', force_zip64=True) as member:
+                for piece in content:
+                    member.write(piece)
+                    if sink.size >= size:
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()  # the central directory
+
+
+def _image_files():
+    names = (DailyPhoto.objects.exclude(image='').order_by('id')
+             .values_list('image', flat=True).iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    for name in names:
+        try:
+            image = default_storage.open(name, 'rb')
+        except FileNotFoundError:
+            continue  # the row is exported; a missing file is left out of the zip
+        yield f'images/{name}', _file_chunks(image), False  # already compressed
+
+
+def _file_chunks(image):
+    with image:
+        yield from image.chunks(STREAM_BUFFER_SIZE)
+
+
+def archive_ndjson():
+    tables = (ndjson_lines(*export_rows(spec), record_type=name) for name, spec in ARCHIVE_TABLES.items())
+    return buffered(itertools.chain.from_iterable(tables))
+
+
+def archive_zip(include_images=True):
+    members = ((f'{name}.ndjson', buffered(ndjson_lines(*export_rows(spec))), True)
+               for name, spec in ARCHIVE_TABLES.items())
+    if include_images:
+        members = itertools.chain(members, _image_files())
+    return zip_stream(members)
+
+
+# ----------------------------
+# Responses
+# ----------------------------
+async def _async_chunks(chunks, batch=16):
+    # Under ASGI, Django reads a sync iterator into a list before sending it;
+    # pull it through the sync thread a few chunks at a time instead.
+    take = sync_to_async(lambda: list(itertools.islice(chunks, batch)))
+    while parts := await take():
+        for part in parts:
+            yield part
+
+
+def streaming_response(request, chunks, content_type, filename):
+    request = getattr(request, '_request', request)  # DRF wraps the HttpRequest
+    if isinstance(request, ASGIRequest):
+        chunks = _async_chunks(iter(chunks))
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
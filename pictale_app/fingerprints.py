@@ -0,0 +1,231 @@
+import logging
+import math
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .caching import bump, versions
+from .models import DailyPhoto, PhotoRecommendation
+from .renditions import source_file
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------
+# Image fingerprints
+# ----------------------------
+# Every DailyPhoto and PhotoRecommendation original gets a 64-bit pHash (DCT of
+# a 32x32 grayscale copy) and dHash (gradient of a 9x8 one), stored as hex in
+# its fingerprint JSON. Copies that were resized, recompressed or lightly
+# edited land within a few bits. A new recommendation is compared with every
+# earlier upload and its near-duplicates are stored on it for the moderation
+# queue. Lookups use a multi-index hash table held in memory (FingerprintIndex).
+HASH_BITS = 64
+PHASH_SAMPLE = 32
+MAX_DISTANCE = 6  # pHash bits
+DHASH_MAX_DISTANCE = 12  # dHash bits; confirms a pHash match
+# The pHash is cut into BANDS 16-bit bands. Two hashes at most 2 * BANDS - 1
+# bits apart agree on some band to within one bit, so probing each band and its
+# 16 one-bit variants finds every match up to MAX_DISTANCE.
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+FINGERPRINTED_MODELS = (DailyPhoto, PhotoRecommendation)
+
+# DCT-II basis for the 8 lowest frequencies of a 32-sample row
+_COSINES = [[math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SAMPLE)) for x in range(PHASH_SAMPLE)]
+            for u in range(8)]
+
+
+# ----------------------------
+# Hashing
+# ----------------------------
+def _bits(flags):
+    value = 0
+    for flag in flags:
+        value = value << 1 | bool(flag)
+    return value
+
+
+def dhash(image):
+    pixels = list(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    return _bits(pixels[row * 9 + col] > pixels[row * 9 + col + 1] for row in range(8) for col in range(8))
+
+
+def phash(image):
+    pixels = list(image.convert('L').resize((PHASH_SAMPLE, PHASH_SAMPLE), Image.Resampling.LANCZOS).getdata())
+    rows = [pixels[y * PHASH_SAMPLE:(y + 1) * PHASH_SAMPLE] for y in range(PHASH_SAMPLE)]
+    # Separable DCT, keeping only the 8 x 8 lowest frequencies
+    row_coefficients = [[sum(p * c for p, c in zip(row, basis)) for basis in _COSINES] for row in rows]
+    low = [sum(row_coefficients[y][u] * basis[y] for y in range(PHASH_SAMPLE))
+           for basis in _COSINES for u in range(8)]
+    median = statistics.median(low[1:])  # the DC term is just overall brightness
+    return _bits(value > median for value in low)
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def fingerprint_image(field_file):
+    """{'source', 'phash', 'dhash'} for an original, or {'source', 'error'} if it can't be read."""
+    result = {'source': field_file.name}
+    try:
+        with field_file.open('rb') as fh, Image.open(fh) as original:
+            original.draft('RGB', (PHASH_SAMPLE * 2, PHASH_SAMPLE * 2))  # JPEG: decode at reduced size
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except (OSError, UnidentifiedImageError) as exc:
+        logger.warning("Could not fingerprint %s: %s", field_file.name, exc)
+        result['error'] = str(exc)
+        return result
+    result['phash'] = f'{phash(image):016x}'
+    result['dhash'] = f'{dhash(image):016x}'
+    return result
+
+
+def hashes(fingerprint):
+    """(phash, dhash) ints from a stored fingerprint, or None."""
+    if not fingerprint or 'phash' not in fingerprint:
+        return None
+    return int(fingerprint['phash'], 16), int(fingerprint['dhash'], 16)
+
+
+# ----------------------------
+# Multi-index hash table
+# ----------------------------
+class FingerprintIndex:
+    """
+    (model name, pk) -> hashes of every fingerprinted upload, with one table per
+    pHash band. Reloaded when the 'fingerprints' version in the cache moves or
+    after FINGERPRINT_INDEX_TTL seconds.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._bands = [defaultdict(set) for _ in range(BANDS)]
+        self._version = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _add(self, key, phash_value, dhash_value):
+        self._discard(key)
+        self._hashes[key] = (phash_value, dhash_value)
+        for band, table in enumerate(self._bands):
+            table[phash_value >> (band * BAND_BITS) & BAND_MASK].add(key)
+
+    def _discard(self, key):
+        old = self._hashes.pop(key, None)
+        if old is not None:
+            for band, table in enumerate(self._bands):
+                table[old[0] >> (band * BAND_BITS) & BAND_MASK].discard(key)
+
+    def stale(self):
+        ttl = getattr(settings, 'FINGERPRINT_INDEX_TTL', 300)
+        return self._version != versions(['fingerprints']) or time.monotonic() - self._loaded_at > ttl
+
+    def load(self):
+        with self._lock:
+            version = versions(['fingerprints'])
+            self._hashes = {}
+            self._bands = [defaultdict(set) for _ in range(BANDS)]
+            for model in FINGERPRINTED_MODELS:
+                for pk, fingerprint in model.objects.values_list('pk', 'fingerprint').iterator():
+                    found = hashes(fingerprint)
+                    if found:
+                        self._add((model._meta.model_name, pk), *found)
+            self._version, self._loaded_at = version, time.monotonic()
+
+    def add(self, key, phash_value, dhash_value):
+        """Record a new upload here and tell the other processes to reload."""
+        with self._lock:
+            current = self._version == versions(['fingerprints'])
+            bump('fingerprints')
+            self._add(key, phash_value, dhash_value)
+            if current:
+                self._version = versions(['fingerprints'])
+
+    def matches(self, phash_value, dhash_value, exclude=()):
+        """[(distance, key)] of the uploads within MAX_DISTANCE, closest first."""
+        if self.stale():
+            self.load()
+        candidates = set()
+        for band, table in enumerate(self._bands):
+            value = phash_value >> (band * BAND_BITS) & BAND_MASK
+            for probe in (value, *(value ^ (1 << bit) for bit in range(BAND_BITS))):
+                candidates.update(table.get(probe, ()))
+        found = []
+        for key in candidates.difference(exclude):
+            other_phash, other_dhash = self._hashes[key]
+            bits = distance(phash_value, other_phash)
+            if bits <= MAX_DISTANCE and distance(dhash_value, other_dhash) <= DHASH_MAX_DISTANCE:
+                found.append((bits, key))
+        return sorted(found)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def clear(self):
+        with self._lock:
+            self._hashes, self._version = {}, None
+            self._bands = [defaultdict(set) for _ in range(BANDS)]
+
+
+fingerprint_index = FingerprintIndex()
+
+
+# ----------------------------
+# Fingerprinting uploads
+# ----------------------------
+def needs_fingerprint(instance):
+    """True when the original changed since it was last fingerprinted."""
+    source = source_file(instance)
+    stored = instance.fingerprint or {}
+    if source is None:
+        return bool(stored)
+    return stored.get('source') != source.name
+
+
+def find_duplicates(instance, found):
+    """Earlier uploads that nearly match a recommendation, for its duplicates field."""
+    key = (instance._meta.model_name, instance.pk)
+    exclude = {key}
+    if instance.promoted_photo_id:
+        exclude.add(('dailyphoto', instance.promoted_photo_id))  # the same file, by design
+    return [{'model': model, 'id': pk, 'distance': bits}
+            for bits, (model, pk) in fingerprint_index.matches(*found, exclude=exclude)]
+
+
+def refresh_fingerprint(instance):
+    """Hash the original, record near-duplicates of a recommendation and add it to the index."""
+    source = source_file(instance)
+    fingerprint = fingerprint_image(source) if source is not None else {}
+    found = hashes(fingerprint)
+    changes = {'fingerprint': fingerprint}
+    if isinstance(instance, PhotoRecommendation):
+        changes['duplicates'] = find_duplicates(instance, found) if found else []
+    type(instance).objects.filter(pk=instance.pk).update(**changes)
+    for field, value in changes.items():
+        setattr(instance, field, value)
+    if found:
+        fingerprint_index.add((instance._meta.model_name, instance.pk), *found)
+    return fingerprint
+
+
+def schedule_fingerprint(instance):
+    source = source_file(instance)
+    if source is None:
+        return refresh_fingerprint(instance)
+    enqueue('fingerprints.compute', model=instance._meta.label, pk=instance.pk, source=source.name)
+
+
+@task('fingerprints.compute')
+def compute_fingerprint(model, pk, source):
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    current = source_file(instance) if instance is not None else None
+    if current is not None and current.name == source:  # not deleted or replaced since
+        refresh_fingerprint(instance)
@@ -0,0 +1,263 @@
+import csv
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils.dateparse import parse_date
+
+from .caching import bump
+from .models import DailyPhoto, User
+from .renditions import generate_renditions
+from .search import index_photos
+
+# ----------------------------
+# Bulk photo import
+# ----------------------------
+# Backfills DailyPhoto from a directory of images or a CSV/JSON manifest. Every
+# row is validated before anything is written; images are copied and their
+# renditions generated in a process pool; rows go in with bulk_create, one
+# transaction per batch. Images land at a name derived from date_featured, so
+# a rerun recognises rows that are already in and carries on after them.
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.tif', '.tiff'}
+IMPORT_DIR = 'daily_photos/imported'
+DATE_QUERY_CHUNK = 500
+
+# Batch jobs that do for imported photos what post_save does for uploads
+FOLLOW_UP_COMMANDS = ['fingerprint_images', 'build_similar_photos', 'rebuild_timelines']
+
+# Directory mode: YYYY-MM-DD.jpg or YYYY-MM-DD_Some_title.jpg, with an optional
+# YYYY-MM-DD....txt next to it holding the story
+_FILENAME_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})(?:[ _-]+(.+))?$')
+
+MANIFEST_FIELDS = ('image', 'date_featured', 'title', 'story', 'date_taken', 'author')
+
+ImportRow = namedtuple('ImportRow', ['source', 'date_featured', 'title', 'story', 'date_taken', 'author'])
+
+
+def target_name(row):
+    return f'{IMPORT_DIR}/{row.date_featured.isoformat()}{row.source.suffix.lower()}'
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+def _directory_entries(directory):
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        match = _FILENAME_RE.match(path.stem)
+        story = path.with_suffix('.txt')
+        yield path.name, {
+            'image': path.name,
+            'date_featured': match.group(1) if match else '',
+            'title': (match.group(2) or '').replace('_', ' ') if match else '',
+            'story': story.read_text().strip() if story.exists() else '',
+        }
+
+
+def _manifest_entries(path):
+    if path.suffix.lower() == '.csv':
+        with open(path, newline='') as fh:
+            for line, entry in enumerate(csv.DictReader(fh), start=2):
+                yield f'line {line}', entry
+    elif path.suffix.lower() in ('.ndjson', '.jsonl'):
+        with open(path) as fh:
+            for line, text in enumerate(fh, start=1):
+                if text.strip():
+                    try:
+                        entry = json.loads(text)
+                    except json.JSONDecodeError as exc:
+                        raise ValueError(f"{path.name} line {line} is not valid JSON: {exc.msg}")
+                    yield f'line {line}', entry
+    else:
+        with open(path) as fh:
+            try:
+                entries = json.load(fh)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{path.name} is not valid JSON: {exc}")
+        if not isinstance(entries, list):
+            raise ValueError(f"{path.name} must hold a JSON list of photos")
+        for index, entry in enumerate(entries):
+            yield f'entry {index}', entry
+
+
+def _parse_date(value):
+    """A date for YYYY-MM-DD, None for anything else (including 2025-02-30)."""
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def read_source(source):
+    """
+    Parse a directory or manifest into (rows, problems). Manifest rows carry
+    image (relative to the manifest), date_featured, title and optionally
+    story, date_taken and author (a username). Raises ValueError for a
+    manifest that cannot be parsed at all.
+    """
+    source = Path(source)
+    base = source if source.is_dir() else source.parent
+    entries = _directory_entries(source) if source.is_dir() else _manifest_entries(source)
+    rows, problems = [], []
+    for label, entry in entries:
+        if not isinstance(entry, dict):
+            problems.append(f"{label}: not a JSON object")
+            continue
+        wrong = [field for field in MANIFEST_FIELDS if not isinstance(entry.get(field) or '', str)]
+        if wrong:
+            problems.append(f"{label}: {', '.join(wrong)} must be text")
+            continue
+        fields = {field: (entry.get(field) or '').strip() for field in MANIFEST_FIELDS}
+        date_featured = _parse_date(fields['date_featured'])
+        if not fields['image']:
+            problems.append(f"{label}: no image")
+            continue
+        if date_featured is None:
+            problems.append(f"{label}: date_featured must be YYYY-MM-DD")
+            continue
+        if fields['date_taken'] and _parse_date(fields['date_taken']) is None:
+            problems.append(f"{label}: date_taken must be YYYY-MM-DD")
+            continue
+        rows.append(ImportRow(
+            source=base / fields['image'],
+            date_featured=date_featured,
+            title=fields['title'] or date_featured.isoformat(),
+            story=fields['story'],
+            date_taken=_parse_date(fields['date_taken']),
+            author=fields['author'] or None,
+        ))
+    return rows, problems
+
+
+# ----------------------------
+# Validation
+# ----------------------------
+def validate(rows):
+    """
+    Check rows against each other and the database before importing any.
+    Returns (rows still to import, number already imported, {username: id}, problems).
+    A date_featured taken by a photo this importer did not write is a problem.
+    """
+    problems = []
+    seen = {}
+    for row in rows:
+        if row.date_featured in seen:
+            problems.append(f"{row.source.name}: date_featured {row.date_featured} also used by {seen[row.date_featured]}")
+        seen[row.date_featured] = row.source.name
+        if not row.source.is_file():
+            problems.append(f"{row.source}: image not found")
+        elif row.source.suffix.lower() not in IMAGE_EXTENSIONS:
+            problems.append(f"{row.source}: not a supported image type")
+
+    usernames = {row.author for row in rows if row.author}
+    authors = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    for username in sorted(usernames - set(authors)):
+        problems.append(f"author {username!r} does not exist")
+
+    dates = sorted(seen)
+    existing = {}
+    for start in range(0, len(dates), DATE_QUERY_CHUNK):
+        existing.update(DailyPhoto.objects.filter(date_featured__in=dates[start:start + DATE_QUERY_CHUNK])
+                        .values_list('date_featured', 'image'))
+    pending, done = [], 0
+    for row in rows:
+        if row.date_featured not in existing:
+            pending.append(row)
+        elif existing[row.date_featured] == target_name(row):
+            done += 1  # imported by an earlier run
+        else:
+            problems.append(f"{row.source.name}: date_featured {row.date_featured} is already taken")
+    return pending, done, authors, problems
+
+
+# ----------------------------
+# Importing
+# ----------------------------
+def process_image(source, target, renditions=True):
+    """
+    Copy one original into storage and build its renditions. Runs in a pool
+    worker; returns (stored name, renditions JSON, error).
+    """
+    try:
+        if default_storage.exists(target):
+            default_storage.delete(target)  # copied by a run that stopped before its insert
+        with open(source, 'rb') as fh:
+            name = default_storage.save(target, File(fh))
+    except OSError as exc:
+        return None, None, str(exc)
+    if not renditions:
+        return name, {}, None  # generate_renditions picks these up later
+    result = generate_renditions(DailyPhoto(image=name, renditions={}))
+    result['status'] = 'failed' if 'error' in result else 'done'
+    return name, result, None
+
+
+def _process(args):
+    return process_image(*args)
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_rows(rows, authors, workers=None, batch_size=500, renditions=True, progress=None):
+    """
+    Import validated rows. workers=0 processes images in this process.
+    progress(imported, failed, elapsed seconds) is called after every batch.
+    Returns {'imported': n, 'failed': [(source, error)], 'seconds': s}.
+    bulk_create skips post_save, so no fingerprint, similar-photo or timeline
+    jobs are queued: run the commands in FOLLOW_UP_COMMANDS afterwards.
+    """
+    start = time.perf_counter()
+    jobs = [(str(row.source), target_name(row), renditions) for row in rows]
+    pool = None
+    if workers == 0:
+        results = map(_process, jobs)
+    else:
+        # Forked workers must not share the parent's open connection
+        connections.close_all()
+        pool = ProcessPoolExecutor(workers or os.cpu_count(), mp_context=multiprocessing.get_context('fork'))
+        results = pool.map(_process, jobs, chunksize=4)
+
+    imported, failed = 0, []
+    try:
+        for batch in _batches(zip(rows, results), batch_size):
+            photos = []
+            for row, (name, result, error) in batch:
+                if error:
+                    failed.append((str(row.source), error))
+                    continue
+                photos.append(DailyPhoto(
+                    title=row.title, story=row.story, image=name, renditions=result,
+                    date_featured=row.date_featured, date_taken=row.date_taken,
+                    author_id=authors.get(row.author),
+                ))
+            # bulk_create skips post_save, so index the batch here
+            with transaction.atomic():
+                DailyPhoto.objects.bulk_create(photos)
+                index_photos(photos)
+            imported += len(photos)
+            if progress:
+                progress(imported, len(failed), time.perf_counter() - start)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if imported:
+        bump('feed', 'archive')
+    return {'imported': imported, 'failed': failed, 'seconds': time.perf_counter() - start}
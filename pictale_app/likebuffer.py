@@ -0,0 +1,353 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import timeline
+from .caching import invalidate_photo
+from .models import DailyPhoto, Like, User
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: LIKE_WRITE_BEHIND can't be used
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------
+# Write-behind likes
+# ----------------------------
+class LikeBuffer:
+    """
+    Pending (user_id, photo_id) likes held in memory with LIKE_WRITE_BEHIND.
+    add() validates the photo with one read and acknowledges (the API's
+    like_photo); flush() inserts
+    the batch with bulk_create(ignore_conflicts=True), recounts the touched
+    photos and updates timelines in one transaction. It runs on request_finished
+    once LIKE_BUFFER_MAX likes or LIKE_BUFFER_INTERVAL seconds have built up,
+    and from a daemon thread every LIKE_BUFFER_INTERVAL seconds, so a process
+    that goes idle still writes its buffer.
+
+    Every add and discard is appended to this process's journal before it is
+    acknowledged, and the journal is rewritten after each flush, so likes
+    survive a crashed process. Each journal has a unique name and its process
+    holds an exclusive lock on it for as long as it runs; flushes in every
+    process look for journals nobody holds at most every
+    LIKE_BUFFER_ORPHAN_SCAN_INTERVAL seconds and replay them. Rows get
+    created_at at flush time.
+
+    Reads by the liker see their pending likes: engagement status merges them
+    in, and views with OwnLikesFlushedMixin flush first. With
+    LIKE_BUFFER_SHARED each pending like also has a marker in the cache:
+    the liker sees it from any process, and an unlike in another process
+    deletes the marker so the flush skips it.
+    """
+    SHARED_PREFIX = 'likebuf:'
+    MARKER_TIMEOUT = 24 * 3600
+
+    def __init__(self):
+        self._pending = set()
+        self._flushing = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # a discard waits for an in-flight flush
+        self._last_flush = time.monotonic()
+        self._journal = None
+        self._journal_path = None
+        self._journal_pid = None
+        self._last_scan = None
+        self._timer = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'LIKE_WRITE_BEHIND', False)
+
+    @property
+    def shared(self):
+        return getattr(settings, 'LIKE_BUFFER_SHARED', False)
+
+    @property
+    def interval(self):
+        return getattr(settings, 'LIKE_BUFFER_INTERVAL', 1.0)
+
+    # ----------------------------
+    # Journal
+    # ----------------------------
+    def journal_dir(self):
+        return Path(getattr(settings, 'LIKE_BUFFER_JOURNAL_DIR'))
+
+    def journal_path(self):
+        """This process's journal, or None before its first like."""
+        return self._journal_path
+
+    def _open_journal(self):
+        if fcntl is None:
+            raise ImproperlyConfigured("LIKE_WRITE_BEHIND needs POSIX file locks (fcntl) for its journal.")
+        if self._journal is not None:
+            os.close(self._journal)  # inherited across a fork: the parent keeps its own
+        self.journal_dir().mkdir(parents=True, exist_ok=True)
+        # PIDs are reused after a restart, so the name only carries one for operators
+        path = self.journal_dir() / f'likes-{os.getpid()}-{uuid.uuid4().hex}.journal'
+        self._journal = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)  # released when the process dies
+        self._journal_path, self._journal_pid = path, os.getpid()
+
+    def _append(self, lines):
+        # One O_APPEND write per call: a crash leaves whole lines behind
+        if self._journal is None or self._journal_pid != os.getpid():
+            self._open_journal()
+        os.write(self._journal, ''.join(lines).encode())
+
+    def _rewrite_journal(self):
+        """Keep only what is still pending (called with _lock held)."""
+        if self._journal is None:
+            return
+        if self._journal_pid != os.getpid():
+            self._open_journal()  # never truncate the journal of the process we forked from
+        os.ftruncate(self._journal, 0)
+        if self._pending:
+            self._append(f'+ {user_id} {photo_id}\n' for user_id, photo_id in self._pending)
+
+    @staticmethod
+    def read_journal(text):
+        """The likes a journal leaves pending: '+' lines add, '-' lines discard."""
+        pending = set()
+        for line in text.splitlines():
+            try:
+                op, user_id, photo_id = line.split()
+                key = (int(user_id), int(photo_id))
+            except ValueError:
+                continue  # a torn last line
+            if op == '+':
+                pending.add(key)
+            else:
+                pending.discard(key)
+        return pending
+
+    def _claim(self, path):
+        """
+        An open, locked fd on an orphaned journal, or None when its process still
+        runs, another process is replaying it, or it is already gone.
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:  # not replayed and unlinked meanwhile
+                return fd
+        except (BlockingIOError, FileNotFoundError):
+            pass
+        os.close(fd)
+        return None
+
+    def replay_orphans(self):
+        """Write the likes left in the journals of processes that stopped. Returns the likes replayed."""
+        if fcntl is None:
+            return 0
+        replayed = 0
+        for path in self.journal_dir().glob('likes-*.journal'):
+            if path == self._journal_path:
+                continue
+            fd = self._claim(path)
+            if fd is None:
+                continue
+            try:
+                with os.fdopen(os.dup(fd)) as fh:
+                    pending = self.read_journal(fh.read())
+                if pending:
+                    self.write(pending)
+                path.unlink()  # only after the write: a failed replay is retried
+                replayed += len(pending)
+            finally:
+                os.close(fd)
+        return replayed
+
+    # ----------------------------
+    # Requests
+    # ----------------------------
+    def _marker(self, user_id, photo_id):
+        return f'{self.SHARED_PREFIX}{user_id}:{photo_id}'
+
+    def pending_for(self, user_id, photo_ids):
+        """The photo_ids this user has liked but that are not written yet."""
+        with self._lock:
+            found = {photo_id for photo_id in photo_ids
+                     if (user_id, photo_id) in self._pending or (user_id, photo_id) in self._flushing}
+        if self.shared:
+            markers = cache.get_many([self._marker(user_id, photo_id) for photo_id in photo_ids])
+            found.update(photo_id for photo_id in photo_ids if self._marker(user_id, photo_id) in markers)
+        return found
+
+    def has_pending(self, user_id=None):
+        """True while this process holds likes (by user_id, if given) that are not written yet."""
+        if not self._pending and not self._flushing:
+            return False
+        if user_id is None:
+            return True
+        with self._lock:
+            return any(key[0] == user_id for keys in (self._pending, self._flushing) for key in keys)
+
+    def flush_for(self, user_id):
+        """Read-your-own-writes: write the buffer before a read by someone with likes in it."""
+        if self.enabled and self.has_pending(user_id):
+            self.flush()
+
+    def add(self, user, photo_id):
+        """
+        Buffer a like. Returns True if it is new, False if the user already likes
+        the photo. Raises DailyPhoto.DoesNotExist for an unknown or scheduled photo.
+        """
+        if self.pending_for(user.pk, [photo_id]):
+            return False
+        liked = (DailyPhoto.objects.published().filter(pk=photo_id)
+                 .annotate(liked=Exists(Like.objects.filter(user=user, post=OuterRef('pk'))))
+                 .values_list('liked', flat=True).first())
+        if liked is None:
+            raise DailyPhoto.DoesNotExist(f"No DailyPhoto with id {photo_id}.")
+        if liked:
+            return False
+        key = (user.pk, photo_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._append([f'+ {user.pk} {photo_id}\n'])
+            self._pending.add(key)
+            self._start_timer()
+        if self.shared:
+            cache.set(self._marker(*key), 1, timeout=self.MARKER_TIMEOUT)
+        return True
+
+    def discard(self, user_id, photo_ids):
+        """Drop pending likes (an unlike). Returns the photo_ids that were pending here."""
+        with self._flush_lock, self._lock:
+            dropped = [photo_id for photo_id in photo_ids if (user_id, photo_id) in self._pending]
+            if dropped:
+                self._pending.difference_update((user_id, photo_id) for photo_id in dropped)
+                self._append(f'- {user_id} {photo_id}\n' for photo_id in dropped)
+        if self.shared:
+            cache.delete_many([self._marker(user_id, photo_id) for photo_id in photo_ids])
+        return dropped
+
+    # ----------------------------
+    # Flushing
+    # ----------------------------
+    def due(self):
+        if not self._pending:
+            return False
+        size = getattr(settings, 'LIKE_BUFFER_MAX', 500)
+        return len(self._pending) >= size or time.monotonic() - self._last_flush >= self.interval
+
+    def write(self, pending):
+        """Insert a batch of likes, skipping photos and users deleted meanwhile. Returns the photos touched."""
+        if self.shared:
+            # A like unliked through another process has lost its marker
+            markers = cache.get_many([self._marker(*key) for key in pending])
+            pending = {key for key in pending if self._marker(*key) in markers}
+        photo_ids = {photo_id for _, photo_id in pending}
+        user_ids = {user_id for user_id, _ in pending}
+        with transaction.atomic():
+            photos = set(DailyPhoto.objects.filter(id__in=photo_ids).values_list('id', flat=True))
+            users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+            pairs = [(user_id, photo_id) for user_id, photo_id in pending if photo_id in photos and user_id in users]
+            if pairs:
+                Like.objects.bulk_create([Like(user_id=user_id, post_id=photo_id) for user_id, photo_id in pairs],
+                                         ignore_conflicts=True, batch_size=500)
+                touched = {photo_id for _, photo_id in pairs}
+                DailyPhoto.objects.filter(id__in=touched).recount_engagement()
+                timeline.record_many(Like, pairs, timezone.now())
+        if self.shared:
+            cache.delete_many([self._marker(*key) for key in pending])  # the rows answer from now on
+        for photo_id in photos:
+            invalidate_photo(photo_id)
+        return photos
+
+    def _scan_orphans(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'LIKE_BUFFER_ORPHAN_SCAN_INTERVAL', 30)
+        if self._last_scan is not None and now - self._last_scan < interval:
+            return
+        self._last_scan = now
+        try:
+            self.replay_orphans()
+        except Exception:
+            logger.exception("Could not replay orphaned like journals; retrying on a later flush")
+
+    def flush(self):
+        """Write everything pending, and any orphaned journals. Returns the likes flushed."""
+        with self._flush_lock:
+            self._scan_orphans()
+            with self._lock:
+                batch, self._pending, self._flushing = self._pending, set(), self._pending
+                self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception("Could not flush %d buffered like(s); keeping them for the next flush", len(batch))
+                with self._lock:
+                    self._pending |= batch
+                    self._flushing = set()
+                return 0
+            with self._lock:
+                self._flushing = set()
+                self._rewrite_journal()
+        return len(batch)
+
+    def _start_timer(self):
+        # Lazily, so only processes that buffer likes run it; threads don't survive a fork
+        if self._timer is None or not self._timer.is_alive() or self._stop.is_set():
+            self._stop = threading.Event()
+            self._timer = threading.Thread(target=self._run, args=(self._stop,), name='like-buffer-flush',
+                                           daemon=True)
+            self._timer.start()
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            if not self.enabled:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Timed flush of buffered likes failed")
+            finally:
+                connection.close()  # this thread's own connection; don't hold it between ticks
+
+    def clear(self):
+        self._stop.set()
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join(timeout=5)
+        with self._lock:
+            self._pending, self._flushing = set(), set()
+            self._last_scan = None
+            if self._journal is not None:
+                os.close(self._journal)
+                self._journal = self._journal_path = self._journal_pid = None
+
+
+like_buffer = LikeBuffer()
+
+
+class OwnLikesFlushedMixin:
+    """
+    Viewset mixin: before a read, write the buffer if the requesting user has
+    likes in it, so the counts, lists and timelines they read include them.
+    Put it after ReplicaReadsMixin, so the flush itself reads the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and request.user.is_authenticated:
+            like_buffer.flush_for(request.user.pk)
@@ -0,0 +1,53 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pictale_app.benchmarks.servers import run_asgi, run_wsgi
+from pictale_app.models import DailyPhoto
+
+DEFAULT_PATHS = ['/', '/api/dailyphotos/', '/api/comments/']
+
+
+class Command(BaseCommand):
+    help = "Compare WSGI and ASGI throughput and latency on the read paths at high concurrency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request (repeatable). Defaults to the home page, photo list/detail and comments.")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per server.")
+        parser.add_argument('--concurrency', type=int, default=64, help="Requests in flight at once.")
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], action='append', dest='servers',
+                            help="Only benchmark this server (repeatable).")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument('--output', help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING("DEBUG is on: query counting and debug pages will skew the numbers."))
+
+        runners = {'wsgi': run_wsgi, 'asgi': run_asgi}
+        results = []
+        for server in options['servers'] or ['wsgi', 'asgi']:
+            # One warm-up pass per path fills caches so both servers start even
+            runners[server](paths, len(paths), 1, options['host'])
+            result = runners[server](paths, options['requests'], options['concurrency'], options['host'])
+            results.append(result)
+            self.stdout.write(
+                f"{server}: {result['requests_per_s']} req/s, p50 {result['p50_ms']}ms, "
+                f"p95 {result['p95_ms']}ms, p99 {result['p99_ms']}ms, {result['errors']} errors"
+            )
+
+        report = {'paths': paths, 'results': results}
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def default_paths(self):
+        paths = list(DEFAULT_PATHS)
+        latest = DailyPhoto.objects.order_by('-date_featured').values_list('id', flat=True).first()
+        if latest:
+            paths.insert(2, f'/api/dailyphotos/{latest}/')
+        return paths
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pictale_app.benchmarks.writes import PROFILES, run_profile
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent write throughput and 'database is locked' errors across SQLite connection profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=list(PROFILES), action='append', dest='profiles',
+                            help="Only benchmark this profile (repeatable). Defaults to all.")
+        parser.add_argument('--writers', type=int, default=8, help="Writer processes.")
+        parser.add_argument('--readers', type=int, default=4, help="Reader processes running alongside.")
+        parser.add_argument('--operations', type=int, default=200, help="Operations per process.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        results = []
+        for name in options['profiles'] or list(PROFILES):
+            try:
+                result = run_profile(name, options['writers'], options['readers'], options['operations'], options['seed'])
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+            results.append(result)
+            for kind in ('write', 'read'):
+                if kind in result:
+                    stats = result[kind]
+                    self.stdout.write(
+                        f"{name} {kind}s: {stats['per_s']}/s, p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, "
+                        f"p99 {stats['p99_ms']}ms, {stats['locked_errors']} locked"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({'results': results}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pictale_app.similar import build
+
+
+class Command(BaseCommand):
+    help = "Recompute the similar-photos index for every DailyPhoto (run nightly and after import_photos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh-colours', action='store_true',
+                            help="Read every image again instead of reusing stored colour histograms.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = build(options['refresh_colours'], options['batch_size'], progress=self.stdout.write)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} photo(s) in {elapsed:.2f}s."))
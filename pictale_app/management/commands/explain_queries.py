@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pictale_app.benchmarks.explain import explain_patterns, problems
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the querysets behind each viewset and hot view, and flag full table scans and sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', action='store_true', help="Print every query plan.")
+        parser.add_argument('--fail', action='store_true',
+                            help="Exit non-zero when a pattern scans or sorts a whole table and is not marked as accepted.")
+
+    def handle(self, *args, **options):
+        results = explain_patterns()
+        for name, result in results.items():
+            if result['full_scans'] or result['full_sorts']:
+                detail = ', '.join(filter(None, [
+                    f"full scan of {', '.join(result['tables'])}" if result['tables'] else '',
+                    'full sort' if result['full_sorts'] else '',
+                ]))
+                if result['note']:
+                    self.stdout.write(f"  {name}: {detail} (accepted: {result['note']})")
+                else:
+                    self.stdout.write(self.style.WARNING(f"! {name}: {detail}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  {name}: ok"))
+            if options['plans']:
+                self.stdout.write('      ' + result['plan'].replace('\n', '\n      '))
+
+        flagged = problems(results)
+        if flagged and options['fail']:
+            raise CommandError(f"{len(flagged)} access pattern(s) scan or sort a whole table: {', '.join(flagged)}")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from pictale_app.fingerprints import FINGERPRINTED_MODELS, needs_fingerprint, refresh_fingerprint
+
+
+class Command(BaseCommand):
+    help = ("Compute missing or stale perceptual hashes for photos and recommendations, "
+            "flagging recommendations that duplicate an earlier upload.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rehash even if fingerprints are up to date.")
+
+    def handle(self, *args, **options):
+        # Photos first, so every recommendation is compared with the whole archive
+        for model in FINGERPRINTED_MODELS:
+            field = model.rendition_field
+            queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).order_by('pk')
+            hashed = flagged = 0
+            for instance in queryset.iterator(chunk_size=200):
+                if options['force'] or needs_fingerprint(instance):
+                    refresh_fingerprint(instance)
+                    hashed += 1
+                    flagged += bool(getattr(instance, 'duplicates', None))
+            self.stdout.write(f"{model.__name__}: fingerprinted {hashed} image(s), {flagged} flagged as duplicates.")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from pictale_app.likebuffer import like_buffer
+
+
+class Command(BaseCommand):
+    help = ("Write the likes left in the journals of stopped or crashed web processes "
+            "(LIKE_WRITE_BEHIND). Run it after a deploy or from cron.")
+
+    def handle(self, *args, **options):
+        replayed = like_buffer.replay_orphans()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} buffered like(s)."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from pictale_app.models import User, DailyPhoto, PhotoRecommendation
+from pictale_app.renditions import needs_renditions, refresh_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate missing or stale image renditions for photos, recommendations and profile pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate even if renditions are up to date.")
+
+    def handle(self, *args, **options):
+        for model in (DailyPhoto, PhotoRecommendation, User):
+            field = model.rendition_field
+            queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            generated = 0
+            for instance in queryset.iterator(chunk_size=200):
+                if options['force'] or needs_renditions(instance):
+                    refresh_renditions(instance)
+                    generated += 1
+            self.stdout.write(f"{model.__name__}: generated renditions for {generated} image(s).")
+        self.stdout.write(self.style.SUCCESS("Done."))
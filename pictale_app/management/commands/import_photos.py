@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pictale_app.imports import FOLLOW_UP_COMMANDS, import_rows, read_source, validate
+
+MAX_PROBLEMS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = ("Bulk import DailyPhotos from a directory of YYYY-MM-DD[_title].jpg images or a CSV/JSON manifest. "
+            "Safe to rerun: photos imported by an earlier run are skipped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Directory of images, or a .csv/.json/.ndjson manifest.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Image processes (default: one per CPU; 0 processes images in this process).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per INSERT transaction.")
+        parser.add_argument('--no-renditions', action='store_true',
+                            help="Only copy the originals; run generate_renditions afterwards.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only.")
+
+    def handle(self, *args, **options):
+        try:
+            rows, problems = read_source(options['source'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {options['source']}: {exc}")
+        pending, done, authors, more = validate(rows)
+        problems += more
+        if problems:
+            for problem in problems[:MAX_PROBLEMS_SHOWN]:
+                self.stderr.write(problem)
+            if len(problems) > MAX_PROBLEMS_SHOWN:
+                self.stderr.write(f"... and {len(problems) - MAX_PROBLEMS_SHOWN} more")
+            raise CommandError(f"{len(problems)} problem(s) found; nothing was imported.")
+
+        self.stdout.write(f"{len(rows)} photo(s) found: {len(pending)} to import, {done} already imported.")
+        if options['dry_run'] or not pending:
+            return
+
+        def progress(imported, failed, elapsed):
+            self.stdout.write(f"  {imported}/{len(pending)} imported, {failed} failed "
+                              f"({imported / elapsed:.1f} photos/s)")
+
+        result = import_rows(pending, authors, options['workers'], options['batch_size'],
+                             renditions=not options['no_renditions'], progress=progress)
+        rate = result['imported'] / result['seconds'] if result['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} photo(s) in {result['seconds']:.1f}s ({rate:.1f} photos/s)."))
+        if result['imported']:
+            follow_up = FOLLOW_UP_COMMANDS + (['generate_renditions'] if options['no_renditions'] else [])
+            self.stdout.write("Imported photos get no background jobs; now run: "
+                              + ', '.join(f'manage.py {name}' for name in follow_up))
+        if result['failed']:
+            for source, error in result['failed'][:MAX_PROBLEMS_SHOWN]:
+                self.stderr.write(f"{source}: {error}")
+            raise CommandError(f"{len(result['failed'])} image(s) could not be copied; rerun to retry them.")
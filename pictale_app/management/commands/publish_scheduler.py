@@ -0,0 +1,59 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pictale_app.scheduler import next_rollover, prepare_renditions, warm
+
+
+class Command(BaseCommand):
+    help = ("Prepare the next photo of the day ahead of midnight (site time zone): generate its renditions "
+            "and pre-render tomorrow's pages and API payloads into the response cache.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Prepare tomorrow now and exit (e.g. from cron shortly before midnight).")
+        parser.add_argument('--lead', type=int, default=10, help="Minutes before midnight to pre-render.")
+        parser.add_argument('--days', type=int, default=1, help="Days ahead to generate renditions for.")
+        parser.add_argument('--poll-interval', type=float, default=30.0, help="Seconds between checks.")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Pre-render this path instead of the defaults (repeatable).")
+
+    def handle(self, *args, **options):
+        if not settings.PUBLIC_HOST:
+            raise CommandError("Set PUBLIC_HOST (and PUBLIC_SCHEME) to the origin visitors use; "
+                               "pages are cached per scheme and host.")
+        lead = datetime.timedelta(minutes=options['lead'])
+        if options['once']:
+            self.prepare(timezone.localdate() + datetime.timedelta(days=1), options)
+            return
+
+        prepared_for = None
+        try:
+            while True:
+                now = timezone.now()
+                rollover = next_rollover(now)
+                day = timezone.localtime(rollover).date()
+                if prepared_for != day and now >= rollover - lead:
+                    self.prepare(day, options)
+                    prepared_for = day
+                elif prepared_for != day:
+                    # Renditions early, so a late upload still makes it
+                    prepare_renditions(options['days'])
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def prepare(self, day, options):
+        start = time.perf_counter()
+        rendered = prepare_renditions(options['days'])
+        statuses = warm(day, settings.PUBLIC_HOST, settings.PUBLIC_SCHEME, options['paths'])
+        failed = {path: code for path, code in statuses.items() if code != 200}
+        self.stdout.write(
+            f"{day}: renditions for {rendered} photo(s), {len(statuses) - len(failed)}/{len(statuses)} "
+            f"page(s) pre-rendered in {time.perf_counter() - start:.2f}s."
+        )
+        for path, code in failed.items():
+            self.stderr.write(f"  {path}: HTTP {code}")
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pictale_app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyPhoto full-text search index from scratch."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_index()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} photo(s) in {elapsed:.2f}s."))
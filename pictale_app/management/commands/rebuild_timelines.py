@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pictale_app.models import User
+from pictale_app.timeline import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute personal timelines from likes, saves and comments (all users, or --user)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help="Only this user (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users per transaction.")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        user_ids = list(users.values_list('id', flat=True))
+
+        start = time.perf_counter()
+        rows = 0
+        size = options['batch_size']
+        for offset in range(0, len(user_ids), size):
+            rows += rebuild(user_ids[offset:offset + size])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(user_ids)} timeline(s), {rows} entries in {time.perf_counter() - start:.1f}s."))
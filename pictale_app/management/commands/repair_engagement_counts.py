@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from pictale_app.models import DailyPhoto, ENGAGEMENT_COUNTERS
+
+
+class Command(BaseCommand):
+    help = "Recount likes, comments and saves on every DailyPhoto and fix counters that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        drift = Q()
+        for field in ENGAGEMENT_COUNTERS:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = DailyPhoto.objects.with_actual_engagement_counts().filter(drift)
+
+        ids = list(drifted.values_list('id', flat=True))
+        if not ids:
+            self.stdout.write(self.style.SUCCESS("All engagement counters are consistent."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(ids)} photo(s) have drifted counters: {ids}"))
+            return
+
+        DailyPhoto.objects.filter(id__in=ids).recount_engagement()
+        self.stdout.write(self.style.SUCCESS(f"Repaired engagement counters on {len(ids)} photo(s)."))
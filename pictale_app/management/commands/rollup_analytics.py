@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from pictale_app.analytics import WINDOW_DAYS, backfill, rollup_recent
+
+
+class Command(BaseCommand):
+    help = ("Maintain the per-day engagement rollups behind /api/analytics/: re-aggregate the last "
+            "--window days every --interval seconds, or backfill from --since.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Roll up once and exit (e.g. from cron).")
+        parser.add_argument('--window', type=int, default=WINDOW_DAYS, help="Days re-aggregated per run.")
+        parser.add_argument('--interval', type=float, default=300.0, help="Seconds between runs.")
+        parser.add_argument('--since', help="Backfill every day from YYYY-MM-DD to today, then exit.")
+
+    def handle(self, *args, **options):
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be YYYY-MM-DD.")
+            self.run(lambda: backfill(since), f"since {since}")
+            return
+
+        try:
+            while True:
+                self.run(lambda: rollup_recent(options['window']), f"last {options['window']} day(s)")
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def run(self, job, label):
+        start = time.perf_counter()
+        rows = job()
+        self.stdout.write(f"Rolled up {label}: {rows} photo-day row(s) in {time.perf_counter() - start:.2f}s.")
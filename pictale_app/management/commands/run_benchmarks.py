@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pictale_app.benchmarks import explain, micro
+from pictale_app.benchmarks.load import run_load
+from pictale_app.benchmarks.report import build_report, compare, load_report, write_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the serializer/view microbenchmarks and query plan checks, or the HTTP load driver, "
+        "and print a JSON report. "
+        "With --baseline, exit non-zero when latency, size or query counts regress."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', choices=['micro', 'load'], default='micro')
+        parser.add_argument('--path', action='append', dest='paths', help="Path to benchmark (repeatable).")
+        parser.add_argument('--repeat', type=int, default=20, help="micro: timed runs per case.")
+        parser.add_argument('--user', help="micro: benchmark views as this logged-in user.")
+        parser.add_argument('--host', default='localhost', help="micro: Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="load: server to drive.")
+        parser.add_argument('--requests', type=int, default=1000, help="load: total requests.")
+        parser.add_argument('--concurrency', type=int, default=16, help="load: requests in flight.")
+        parser.add_argument('--token', help="load: send this API token with every request.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--baseline', help="Report to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed relative growth of latency/size metrics (default 0.25).")
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or micro.default_view_paths()
+        if options['suite'] == 'micro':
+            results = micro.serializer_benchmarks(options['repeat'], options['host'])
+            results.update(micro.view_benchmarks(paths, options['repeat'], options['user'], options['host']))
+            plans = explain.explain_patterns()
+            results.update({f'explain {name}': result for name, result in plans.items()})
+            report = build_report('micro', results, repeat=options['repeat'], user=options['user'])
+        else:
+            headers = {'Authorization': f"Token {options['token']}"} if options['token'] else {}
+            results = run_load(options['base_url'], paths, options['requests'], options['concurrency'],
+                               headers=headers)
+            report = build_report('load', results, base_url=options['base_url'], requests=options['requests'],
+                                  concurrency=options['concurrency'])
+
+        if options['output']:
+            write_report(report, options['output'])
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        if options['baseline']:
+            regressions = compare(report, load_report(options['baseline']), options['tolerance'])
+            if options['suite'] == 'micro':
+                regressions += [f"explain {name}: full scan or sort" for name in explain.problems(plans)]
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stderr.write(self.style.SUCCESS("No regressions against the baseline."))
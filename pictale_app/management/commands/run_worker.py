@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pictale_app.tasks import claim_jobs, release_stale_jobs, run_job
+
+
+def _run_in_child(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (image renditions, ...) from the database-backed queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help="Worker processes. 0 runs jobs in this process.")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help="Seconds after which a 'running' job is assumed orphaned and requeued.")
+        parser.add_argument('--once', action='store_true', help="Drain the due jobs and exit.")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        pool = None
+        if concurrency > 0:
+            # Forked children must not inherit the parent's open SQLite connection
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context('fork'))
+
+        processed = 0
+        try:
+            while True:
+                release_stale_jobs(timedelta(seconds=options['stale_after']))
+                job_ids = claim_jobs(limit=max(concurrency, 1) * 4)
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                if pool is None:
+                    statuses = [run_job(job_id) for job_id in job_ids]
+                else:
+                    connections.close_all()
+                    futures = [pool.submit(_run_in_child, job_id) for job_id in job_ids]
+                    wait(futures)
+                    statuses = [future.result() for future in futures]
+                processed += len(statuses)
+                self.stdout.write(f"Ran {len(statuses)} job(s): {statuses.count('done')} done, "
+                                  f"{statuses.count('pending')} to retry, {statuses.count('failed')} failed.")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Worker stopped after {processed} job(s)."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from pictale_app.benchmarks import data
+
+
+class Command(BaseCommand):
+    help = "Create seeded synthetic users, photos and long-tail engagement for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--photos', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=42, help="Same seed, same data.")
+        parser.add_argument('--likes-per-user', type=int, default=30, help="Average for a typical user.")
+        parser.add_argument('--comments-per-user', type=int, default=8)
+        parser.add_argument('--saves-per-user', type=int, default=5)
+        parser.add_argument('--clear', action='store_true',
+                            help=f"Remove existing '{data.USERNAME_PREFIX}*' users and their photos first.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            data.clear()
+        created = data.seed(
+            users=options['users'], photos=options['photos'], seed=options['seed'],
+            likes_per_user=options['likes_per_user'], comments_per_user=options['comments_per_user'],
+            saves_per_user=options['saves_per_user'],
+        )
+        summary = ', '.join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary}. Password for every user: {data.PASSWORD}"))
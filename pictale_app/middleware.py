@@ -0,0 +1,76 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .querycount import QueryReport, get_view_budget
+
+logger = logging.getLogger('pictale_app.queries')
+
+
+# ----------------------------
+# Query Count Middleware
+# ----------------------------
+class QueryCountMiddleware:
+    """
+    Records SQL count and time for every request when QUERY_COUNT_ENABLED is set.
+    Adds X-Query-Count / X-Query-Time-Ms headers, attaches the report to the
+    response as `response.query_report`, and logs a warning when the view
+    exceeds its declared budget or repeats the same query shape.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'QUERY_COUNT_ENABLED', False):
+            return self.get_response(request)
+
+        report = self.start(request)
+        with connection.execute_wrapper(report):
+            response = self.get_response(request)
+        return self.finish(request, response, report)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'QUERY_COUNT_ENABLED', False):
+            return await self.get_response(request)
+
+        # Connections are per thread and the async ORM runs its queries in the
+        # request's sync worker thread, so the wrapper is installed there
+        report = self.start(request)
+        await sync_to_async(connection.execute_wrappers.append)(report)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(connection.execute_wrappers.remove)(report)
+        return self.finish(request, response, report)
+
+    def start(self, request):
+        report = QueryReport()
+        request.query_report = report
+        return report
+
+    def finish(self, request, response, report):
+        response['X-Query-Count'] = str(report.count)
+        response['X-Query-Time-Ms'] = f"{report.duration * 1000:.1f}"
+        response.query_report = report
+
+        threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 3)
+        if report.over_budget or report.repeated(threshold):
+            logger.warning("%s %s: %s", request.method, request.path, report.summary())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        report = getattr(request, 'query_report', None)
+        if report is not None:
+            report.budget = get_view_budget(view_func, request.method)
+        return None
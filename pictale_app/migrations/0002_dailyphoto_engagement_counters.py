@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:33
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    DailyPhoto = apps.get_model('pictale_app', 'DailyPhoto')
+    counters = {
+        'likes_count': apps.get_model('pictale_app', 'Like'),
+        'comments_count': apps.get_model('pictale_app', 'Comment'),
+        'saves_count': apps.get_model('pictale_app', 'SavedPhoto'),
+    }
+    updates = {}
+    for field, model in counters.items():
+        rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        updates[field] = Coalesce(Subquery(rows.annotate(n=Count('pk')).values('n')), 0)
+    DailyPhoto.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyphoto',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='dailyphoto',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='dailyphoto',
+            name='saves_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0004_alter_tokenproxy_options'),
+        ('pictale_app', '0005_dailyphoto_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiTokenUsage',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='authtoken.token')),
+                ('last_used_at', models.DateTimeField()),
+            ],
+        ),
+    ]
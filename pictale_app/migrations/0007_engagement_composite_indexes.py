@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0006_api_token_usage'),
+    ]
+
+    operations = [
+        # Composite indexes first, then drop the single-column FK indexes they cover
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at', 'id'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyphoto',
+            index=models.Index(fields=['author', 'date_featured'], name='photo_author_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='like_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photorecommendation',
+            index=models.Index(fields=['status', 'created_at'], name='rec_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedphoto',
+            index=models.Index(fields=['user', 'saved_at'], name='saved_user_saved_at_idx'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='pictale_app.dailyphoto'),
+        ),
+        migrations.AlterField(
+            model_name='dailyphoto',
+            name='author',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='photos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='pictale_app.dailyphoto'),
+        ),
+        migrations.AlterField(
+            model_name='savedphoto',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='saved_photos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
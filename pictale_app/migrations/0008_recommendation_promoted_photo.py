@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0007_engagement_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photorecommendation',
+            name='promoted_photo',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recommendation', to='pictale_app.dailyphoto'),
+        ),
+    ]
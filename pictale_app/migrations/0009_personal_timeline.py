@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0008_recommendation_promoted_photo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('liked', models.BooleanField(default=False)),
+                ('saved', models.BooleanField(default=False)),
+                ('commented', models.BooleanField(default=False)),
+                ('by_author', models.BooleanField(default=False, help_text='By an author the user engages with.')),
+                ('activity_at', models.DateTimeField()),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pictale_app.dailyphoto')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'activity_at', 'id'], name='timeline_user_activity_idx')],
+                'unique_together': {('user', 'photo')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0009_personal_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoSimilarity',
+            fields=[
+                ('photo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity', serialize=False, to='pictale_app.dailyphoto')),
+                ('colours', models.BinaryField(blank=True, default=b'')),
+                ('neighbours', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0010_similar_photos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyphoto',
+            name='fingerprint',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='photorecommendation',
+            name='duplicates',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='photorecommendation',
+            name='fingerprint',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pictale_app', '0011_image_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('saves', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['created_at'], name='like_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedphoto',
+            index=models.Index(fields=['saved_at'], name='saved_saved_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='engagementrollup',
+            name='photo',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pictale_app.dailyphoto'),
+        ),
+        migrations.AddIndex(
+            model_name='engagementrollup',
+            index=models.Index(fields=['day', 'photo'], name='rollup_day_photo_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='engagementrollup',
+            unique_together={('photo', 'day')},
+        ),
+    ]
@@ -1,5 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .publishing import publishing_date
 
 # ----------------------------
 # User Model
@@ -23,8 +28,11 @@ class User(AbstractUser):
         null=True,
         help_text="Short description about the user."
     )
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
-    
+    # Derivatives generated from profile_picture (see pictale_app.renditions)
+    rendition_field = 'profile_picture'
+    rendition_names = ('avatar',)
 
     def __str__(self):
         return self.username
@@ -32,6 +40,29 @@ class User(AbstractUser):
 # ----------------------------
 # Daily Photo Model
 # ----------------------------
+class DailyPhotoQuerySet(models.QuerySet):
+    def published(self):
+        """Photos whose date_featured has come (see pictale_app.publishing)."""
+        return self.filter(date_featured__lte=publishing_date())
+
+    def with_actual_engagement_counts(self):
+        """
+        Annotate actual_likes_count / actual_comments_count / actual_saves_count
+        counted live from the engagement tables. Only used to repair the counters.
+        """
+        return self.annotate(**{
+            f'actual_{field}': _engagement_count(model)
+            for field, model in ENGAGEMENT_COUNTERS.items()
+        })
+
+    def recount_engagement(self):
+        """Recompute the denormalized counters in one UPDATE. Returns the rows updated."""
+        return self.update(updated_at=timezone.now(), **{
+            field: _engagement_count(model)
+            for field, model in ENGAGEMENT_COUNTERS.items()
+        })
+
+
 class DailyPhoto(models.Model):
     title = models.CharField(max_length=255)
     image = models.ImageField(upload_to='daily_photos/')
@@ -40,33 +71,96 @@ class DailyPhoto(models.Model):
     date_featured = models.DateField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='photos')
+    # Indexed by photo_author_featured_idx (leading column author)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='photos',
+                               db_index=False)
+
+    # Denormalized engagement counters, maintained by pictale_app.signals
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    saves_count = models.PositiveIntegerField(default=0, editable=False)
+
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Perceptual hashes of image (see pictale_app.fingerprints)
+    fingerprint = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Derivatives generated from image (see pictale_app.renditions)
+    rendition_field = 'image'
+    rendition_names = ('thumb', 'card', 'full')
+
+    objects = DailyPhotoQuerySet.as_manager()
+
+    class Meta:
+        # ?author__username= filtering, newest first
+        indexes = [models.Index(fields=['author', 'date_featured'], name='photo_author_featured_idx')]
 
     def __str__(self):
         return self.title
 
+# ----------------------------
+# Engagement base
+# ----------------------------
+class Engagement(models.Model):
+    """
+    Base for rows that are counted on DailyPhoto (likes, comments, saves).
+    counter_field names the DailyPhoto column kept in sync by pictale_app.signals.
+    """
+    counter_field = None
+    # TimelineEntry flag set while the user has this engagement (see pictale_app.timeline)
+    timeline_flag = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # The counter bump runs in post_save; keep it in the same transaction as the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 # ----------------------------
 # Comment Model
 # ----------------------------
-class Comment(models.Model):
+class Comment(Engagement):
+    counter_field = 'comments_count'
+    timeline_flag = 'commented'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
-    post = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='comments')
+    # Indexed by comment_post_created_idx (leading column post)
+    post = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='comments', db_index=False)
     comment_text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A photo's comments newest first (comment lists, previews, home page)
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+            # The site-wide comment list
+            models.Index(fields=['created_at', 'id'], name='comment_created_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post.title}"
 
 # ----------------------------
 # Like Model
 # ----------------------------
-class Like(models.Model):
+class Like(Engagement):
+    counter_field = 'likes_count'
+    timeline_flag = 'liked'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes')
-    post = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='likes')
+    # Indexed by like_post_created_idx (leading column post)
+    post = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='likes', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('user', 'post')
+        indexes = [
+            # A photo's likes newest first (/dailyphotos/{id}/likes/)
+            models.Index(fields=['post', 'created_at', 'id'], name='like_post_created_idx'),
+            # Analytics rollup windows (pictale_app.analytics)
+            models.Index(fields=['created_at'], name='like_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} likes {self.post.title}"
@@ -74,17 +168,39 @@ class Like(models.Model):
 # ----------------------------
 # Saved Photo Model
 # ----------------------------
-class SavedPhoto(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_photos')
+class SavedPhoto(Engagement):
+    counter_field = 'saves_count'
+    timeline_flag = 'saved'
+
+    # Indexed by unique_together and saved_user_saved_at_idx (leading column user)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_photos', db_index=False)
     post = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='saved_by')
     saved_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('user', 'post')
+        indexes = [
+            # A user's saved photos, most recent first (profile)
+            models.Index(fields=['user', 'saved_at'], name='saved_user_saved_at_idx'),
+            # Analytics rollup windows (pictale_app.analytics)
+            models.Index(fields=['saved_at'], name='saved_saved_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} saved {self.post.title}"
 
+
+def _engagement_count(model):
+    rows = model.objects.filter(post=models.OuterRef('pk')).order_by().values('post')
+    return Coalesce(models.Subquery(rows.annotate(n=models.Count('pk')).values('n')), 0)
+
+
+ENGAGEMENT_COUNTERS = {
+    'likes_count': Like,
+    'comments_count': Comment,
+    'saves_count': SavedPhoto,
+}
+
 # ----------------------------
 # Photo Recommendation Model
 # ----------------------------
@@ -102,6 +218,141 @@ class PhotoRecommendation(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     reviewed_at = models.DateTimeField(blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # The DailyPhoto an approved recommendation was promoted to
+    promoted_photo = models.OneToOneField(
+        DailyPhoto, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='recommendation',
+    )
+    # Perceptual hashes of image_file, and the earlier uploads it nearly matches:
+    # [{"model": "dailyphoto" | "photorecommendation", "id": ..., "distance": ...}], closest first
+    fingerprint = models.JSONField(default=dict, blank=True, editable=False)
+    duplicates = models.JSONField(default=list, blank=True, editable=False)
+
+    # Derivatives generated from image_file (see pictale_app.renditions)
+    rendition_field = 'image_file'
+    rendition_names = ('thumb', 'card')
+
+    class Meta:
+        # The review queue: one status, oldest or newest first
+        indexes = [models.Index(fields=['status', 'created_at'], name='rec_status_created_idx')]
+
+    def __str__(self):
+        return f"Recommendation: {self.title} by {self.user.username}"
+
+
+# ----------------------------
+# Background Job Model
+# ----------------------------
+class Job(models.Model):
+    """
+    A unit of background work in the database-backed queue (see pictale_app.tasks).
+    Claimed and run by `python manage.py run_worker`.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time.")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='job_queue_idx')]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+# ----------------------------
+# API token usage
+# ----------------------------
+class ApiTokenUsage(models.Model):
+    """
+    When each API token was last used. Written in batches by
+    pictale_app.authentication.token_usage rather than on every request.
+    """
+    token = models.OneToOneField(Token, on_delete=models.CASCADE, primary_key=True, related_name='usage')
+    last_used_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.token_id[:8]}… last used {self.last_used_at:%Y-%m-%d %H:%M}"
+
+
+# ----------------------------
+# Personal timeline
+# ----------------------------
+class TimelineEntry(models.Model):
+    """
+    A photo on a user's personal timeline: one they liked, saved or commented on,
+    or one by an author whose photos they engage with. Precomputed and kept up to
+    date by pictale_app.timeline, so a timeline page is one range scan.
+    """
+    # Indexed by unique_together and timeline_user_activity_idx (leading column user)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline', db_index=False)
+    photo = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='+')
+    liked = models.BooleanField(default=False)
+    saved = models.BooleanField(default=False)
+    commented = models.BooleanField(default=False)
+    by_author = models.BooleanField(default=False, help_text="By an author the user engages with.")
+    # The user's latest engagement with the photo, or when it was published
+    activity_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'photo')
+        indexes = [models.Index(fields=['user', 'activity_at', 'id'], name='timeline_user_activity_idx')]
+
+    def __str__(self):
+        return f"{self.photo_id} on {self.user_id}'s timeline"
+
+
+# ----------------------------
+# Similar photos
+# ----------------------------
+class PhotoSimilarity(models.Model):
+    """
+    A photo's image features and precomputed nearest neighbours, built by
+    pictale_app.similar and served from an in-process index.
+    """
+    photo = models.OneToOneField(DailyPhoto, on_delete=models.CASCADE, primary_key=True, related_name='similarity')
+    # Share of the image in each of 64 RGB colour bins, one byte per bin (empty: no readable image)
+    colours = models.BinaryField(blank=True, default=b'')
+    # [[photo_id, score], ...], best match first
+    neighbours = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{len(self.neighbours)} photo(s) like {self.photo_id}"
+
+
+# ----------------------------
+# Engagement analytics
+# ----------------------------
+class EngagementRollup(models.Model):
+    """
+    Likes, comments and saves a photo received on one day (site time zone).
+    Recomputed window by window by pictale_app.analytics; requests never write it.
+    """
+    # Indexed by unique_together (leading column photo)
+    photo = models.ForeignKey(DailyPhoto, on_delete=models.CASCADE, related_name='+', db_index=False)
+    day = models.DateField()
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    saves = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('photo', 'day')
+        # Site-wide series and top photos over a range of days
+        indexes = [models.Index(fields=['day', 'photo'], name='rollup_day_photo_idx')]
 
     def __str__(self):
-        return f"Recommendation: {self.title} by {self.user.username}"
\ No newline at end of file
+        return f"{self.photo_id} on {self.day}"
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import DailyPhoto, PhotoRecommendation
+
+# ----------------------------
+# Recommendation moderation
+# ----------------------------
+# Staff work through pending recommendations in batches and promote approved
+# ones to DailyPhoto. A promoted photo points at the recommendation's upload;
+# the file is never copied, and its fingerprint is reused.
+PROMOTE_ATTEMPTS = 5
+
+
+def review(ids, status):
+    """
+    Approve or reject pending recommendations in one transaction, stamping
+    reviewed_at. Returns (reviewed ids, skipped ids: unknown or not pending).
+    """
+    with transaction.atomic():
+        pending = set(PhotoRecommendation.objects.select_for_update()
+                      .filter(pk__in=ids, status='pending').values_list('id', flat=True))
+        PhotoRecommendation.objects.filter(pk__in=pending).update(status=status, reviewed_at=timezone.now())
+    return [i for i in ids if i in pending], [i for i in ids if i not in pending]
+
+
+def next_free_date(start=None):
+    """The first date from `start` (default today) with no featured photo."""
+    day = start or timezone.localdate()
+    taken = (DailyPhoto.objects.filter(date_featured__gte=day).order_by('date_featured')
+             .values_list('date_featured', flat=True))
+    for taken_day in taken.iterator():
+        if taken_day != day:
+            break
+        day += timedelta(days=1)
+    return day
+
+
+def promote(recommendation):
+    """
+    Feature an approved recommendation on the next free date. Returns the new
+    DailyPhoto, or None if the recommendation is no longer approved or was
+    promoted meanwhile.
+    """
+    for _ in range(PROMOTE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                current = (PhotoRecommendation.objects.select_for_update()
+                           .filter(pk=recommendation.pk, status='approved', promoted_photo__isnull=True).first())
+                if current is None:
+                    return None
+                photo = DailyPhoto.objects.create(
+                    title=current.title, story=current.story, author_id=current.user_id,
+                    image=current.image_file.name, date_featured=next_free_date(),
+                    fingerprint=current.fingerprint,  # same file, so no need to hash it again
+                )
+                PhotoRecommendation.objects.filter(pk=current.pk).update(promoted_photo=photo)
+        except IntegrityError:
+            continue  # a concurrent promotion took the date; look again
+        recommendation.promoted_photo = photo
+        return photo
+    raise IntegrityError(f"No free date_featured after {PROMOTE_ATTEMPTS} attempts.")
@@ -0,0 +1,198 @@
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, PageNumberPagination
+
+
+# ----------------------------
+# Page number / cursor switch
+# ----------------------------
+class CursorOptInPagination(BasePagination):
+    """
+    Page-number pagination by default; clients opt into keyset (cursor) pagination
+    per request with ?pagination=cursor. Cursor pages skip the COUNT(*) and seek
+    on an indexed column instead of using OFFSET, so deep pages cost the same
+    as the first one. The next/previous links carry an opaque ?cursor= token.
+    """
+    page_number_class = PageNumberPagination
+    cursor_class = CursorPagination
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.cursor_class() if self.use_cursor(request) else self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view)
+
+
+# ----------------------------
+# Compound keyset cursor
+# ----------------------------
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a unique compound ordering such as ('-created_at', '-id').
+    DRF's CursorPagination seeks on the first field only and uses an offset for
+    ties, so rows sharing a timestamp can be skipped or repeated when paging back.
+    Here the cursor carries every ordering field and each page seeks past the
+    whole tuple, so no offset is ever needed.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = [self._flip(field) for field in self.ordering] if reverse else list(self.ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            queryset = queryset.filter(self._beyond(ordering, self._decode_position(queryset.model, self.cursor.position)))
+
+        # One extra row tells whether another page follows in this direction
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _position(self, instance):
+        values = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        return json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+
+    def _decode_position(self, model, position):
+        """The cursor's values, each converted by its model field; NotFound for a tampered cursor."""
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(position)
+            converted = []
+            for field, value in zip(self.ordering, values):
+                if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+                    raise ValueError(value)
+                value = model._meta.get_field(field.lstrip('-')).to_python(value)
+                if value is None:
+                    raise ValueError(value)
+                converted.append(value)
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return converted
+
+    @staticmethod
+    def _beyond(ordering, values):
+        """Rows after `values` in `ordering`: (a, b) < (x, y) spelled as a < x OR (a = x AND b < y)."""
+        condition = None
+        for field, value in reversed(list(zip(ordering, values))):
+            name = field.lstrip('-')
+            past = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+            condition = past if condition is None else past | (Q(**{name: value}) & condition)
+        return condition
+
+
+# ----------------------------
+# DailyPhoto
+# ----------------------------
+class DailyPhotoPageNumberPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class DailyPhotoCursorPagination(CursorPagination):
+    ordering = '-date_featured'  # unique, so the cursor never needs a tie-breaker
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class DailyPhotoPagination(CursorOptInPagination):
+    page_number_class = DailyPhotoPageNumberPagination
+    cursor_class = DailyPhotoCursorPagination
+    search_query_param = 'search'
+
+    def use_cursor(self, request):
+        cursor = super().use_cursor(request)
+        # Search results are ordered by rank, which a date cursor would discard
+        if cursor and request.query_params.get(self.search_query_param):
+            raise ValidationError({self.mode_query_param: "Search results use page-number pagination."})
+        return cursor
+
+
+# ----------------------------
+# Comments / Likes
+# ----------------------------
+class CommentCursorPagination(KeysetCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class CommentPagination(CursorOptInPagination):
+    cursor_class = CommentCursorPagination
+
+
+class LikeCursorPagination(KeysetCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class LikePagination(CursorOptInPagination):
+    cursor_class = LikeCursorPagination
+
+
+# ----------------------------
+# Recommendation moderation queue
+# ----------------------------
+class RecommendationQueuePagination(KeysetCursorPagination):
+    ordering = ('created_at', 'id')  # oldest first; served by rec_status_created_idx
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# ----------------------------
+# Personal timeline
+# ----------------------------
+class TimelinePagination(KeysetCursorPagination):
+    ordering = ('-activity_at', '-id')  # served by timeline_user_activity_idx
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.utils import timezone
+
+# ----------------------------
+# Publishing day
+# ----------------------------
+# A DailyPhoto is visible from its date_featured onwards, in the site time zone
+# (TIME_ZONE). Everything that depends on which photos are out -- querysets,
+# cache keys -- asks publishing_date(), so the scheduler can render tomorrow's
+# pages ahead of the rollover inside as_of(tomorrow).
+_as_of = ContextVar('pictale_publishing_date', default=None)
+
+
+def publishing_date():
+    return _as_of.get() or timezone.localdate()
+
+
+@contextmanager
+def as_of(day):
+    token = _as_of.set(day)
+    try:
+        yield
+    finally:
+        _as_of.reset(token)
@@ -0,0 +1,82 @@
+import re
+import time
+from collections import Counter
+
+# ----------------------------
+# Query counting / N+1 detection
+# ----------------------------
+# Literal values are already split out into params by the time SQL reaches the
+# execute wrapper, so only IN-lists of varying length need collapsing.
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+    """Normalise a SQL statement so repeated queries with different params compare equal."""
+    return _IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryReport:
+    """
+    Collects the SQL run during one request.
+    Install it with connection.execute_wrapper(report).
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def repeated(self, threshold=2):
+        """Query shapes run at least `threshold` times -- the usual N+1 signature."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def summary(self):
+        budget = '-' if self.budget is None else self.budget
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f}ms (budget {budget})"]
+        for shape, n in self.repeated():
+            lines.append(f"  x{n}: {shape}")
+        return '\n'.join(lines)
+
+
+# ----------------------------
+# Budgets
+# ----------------------------
+def query_budget(limit):
+    """
+    Declare the maximum number of queries a function view may run.
+    Viewsets declare a `query_budgets` dict keyed by action name instead.
+    """
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def get_view_budget(view_func, method):
+    """Resolve the declared budget for a resolved view function, or None."""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is not None:
+        return budget
+
+    # DRF viewsets: as_view() exposes the class and the method -> action mapping
+    view_cls = getattr(view_func, 'cls', None)
+    budgets = getattr(view_cls, 'query_budgets', None)
+    if not budgets:
+        return None
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower())
+    return budgets.get(action, budgets.get('default'))
@@ -0,0 +1,215 @@
+import logging
+import posixpath
+from collections import namedtuple
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------
+# Rendition specs
+# ----------------------------
+# crop=True renditions are cut to exactly width x height (avatars, grid thumbs);
+# the others are scaled to fit within width (never upscaled) and form the srcset.
+Rendition = namedtuple('Rendition', ['width', 'height', 'crop'])
+
+RENDITIONS = {
+    'thumb': Rendition(320, 320, crop=True),
+    'card': Rendition(640, None, crop=False),
+    'full': Rendition(1600, None, crop=False),
+    'avatar': Rendition(128, 128, crop=True),
+}
+
+# Output formats: (key in the renditions JSON, Pillow format, extension, save options)
+FORMATS = [
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+RENDITIONS_DIR = 'renditions'
+
+# Sent with sender=model class and instance= after renditions are written with
+# a queryset update (which bypasses post_save).
+renditions_updated = Signal()
+
+
+def source_file(instance):
+    """The uploaded original named by the model's rendition_field, or None."""
+    field_file = getattr(instance, instance.rendition_field)
+    return field_file if field_file else None
+
+
+def needs_renditions(instance):
+    """True when the original changed since renditions were last generated."""
+    source = source_file(instance)
+    stored = instance.renditions or {}
+    if source is None:
+        return bool(stored)
+    return stored.get('source') != source.name
+
+
+# ----------------------------
+# Generation
+# ----------------------------
+def _resize(image, spec):
+    if spec.crop:
+        return ImageOps.fit(image, (spec.width, spec.height), Image.Resampling.LANCZOS)
+    if image.width <= spec.width:
+        return image.copy()
+    height = round(image.height * spec.width / image.width)
+    return image.resize((spec.width, height), Image.Resampling.LANCZOS)
+
+
+def _encode(image, pil_format, options):
+    buffer = BytesIO()
+    # No exif/icc arguments are passed, so the output carries no metadata
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def delete_renditions(renditions, storage):
+    for name, entry in (renditions or {}).items():
+        if not isinstance(entry, dict):
+            continue
+        for key, _, _, _ in FORMATS:
+            if entry.get(key):
+                storage.delete(entry[key])
+
+
+def generate_renditions(instance):
+    """
+    Build every rendition listed in instance.rendition_names from the original
+    and return the JSON to store on instance.renditions. Files for the previous
+    original are removed. Unreadable originals are recorded with an error so
+    they are not retried on every save.
+    """
+    source = source_file(instance)
+    storage = getattr(instance, instance.rendition_field).storage
+    delete_renditions(instance.renditions, storage)
+    if source is None:
+        return {}
+
+    result = {'source': source.name}
+    try:
+        with source.open('rb') as fh, Image.open(fh) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except (OSError, UnidentifiedImageError) as exc:
+        logger.warning("Could not generate renditions for %s: %s", source.name, exc)
+        result['error'] = str(exc)
+        return result
+
+    # Per model: a promoted recommendation's photo shares its original (see
+    # pictale_app.moderation) but must not share, or delete, its derivatives
+    stem = posixpath.join(RENDITIONS_DIR, instance._meta.model_name, posixpath.splitext(source.name)[0])
+    for name in instance.rendition_names:
+        resized = _resize(image, RENDITIONS[name])
+        entry = {'width': resized.width, 'height': resized.height}
+        for key, pil_format, extension, options in FORMATS:
+            path = posixpath.join(stem, f'{name}.{extension}')
+            storage.delete(path)
+            entry[key] = storage.save(path, _encode(resized, pil_format, options))
+        result[name] = entry
+    return result
+
+
+def refresh_renditions(instance):
+    """Regenerate and persist renditions without re-saving the whole instance."""
+    renditions = generate_renditions(instance)
+    if renditions:
+        renditions['status'] = 'failed' if 'error' in renditions else 'done'
+    type(instance).objects.filter(pk=instance.pk).update(renditions=renditions)
+    instance.renditions = renditions
+    renditions_updated.send(sender=type(instance), instance=instance)
+    return renditions
+
+
+# ----------------------------
+# Background generation
+# ----------------------------
+def schedule_renditions(instance):
+    """
+    Queue rendition generation for a new or replaced original and return at once.
+    Old derivatives are dropped straight away and renditions.status reads
+    'pending' until the worker finishes; templates fall back to the original.
+    """
+    source = source_file(instance)
+    if source is None:
+        return refresh_renditions(instance)
+
+    delete_renditions(instance.renditions, source.storage)
+    instance.renditions = {'source': source.name, 'status': 'pending'}
+    type(instance).objects.filter(pk=instance.pk).update(renditions=instance.renditions)
+    enqueue('renditions.generate', model=instance._meta.label, pk=instance.pk, source=source.name)
+    return instance.renditions
+
+
+def _current_instance(model, pk, source):
+    """The instance if it still exists and still has this original, otherwise None."""
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if instance is None or (instance.renditions or {}).get('source') != source:
+        return None  # deleted, or replaced and rescheduled by a newer job
+    return instance
+
+
+def _renditions_failed(model, pk, source):
+    instance = _current_instance(model, pk, source)
+    if instance is not None:
+        apps.get_model(model).objects.filter(pk=pk).update(
+            renditions={'source': source, 'status': 'failed'}
+        )
+
+
+@task('renditions.generate', max_attempts=3, on_failure=_renditions_failed)
+def generate_renditions_task(model, pk, source):
+    instance = _current_instance(model, pk, source)
+    if instance is not None:
+        refresh_renditions(instance)
+
+
+# ----------------------------
+# Reading
+# ----------------------------
+def _url(storage, name, request=None):
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def srcset(instance, key, request=None):
+    """`url 640w, url 1600w` over the non-cropped renditions in the given format."""
+    storage = getattr(instance, instance.rendition_field).storage
+    renditions = instance.renditions or {}
+    candidates = sorted(
+        (entry['width'], entry[key]) for name, entry in renditions.items()
+        if name in RENDITIONS and not RENDITIONS[name].crop
+    )
+    seen = set()
+    parts = []
+    for width, path in candidates:
+        if width not in seen:
+            seen.add(width)
+            parts.append(f"{_url(storage, path, request)} {width}w")
+    return ', '.join(parts)
+
+
+def rendition_payload(instance, request=None):
+    """API representation: {status, name: {width, height, webp, jpeg}, 'srcset': {webp, jpeg}}."""
+    renditions = instance.renditions or {}
+    storage = getattr(instance, instance.rendition_field).storage
+    payload = {'status': renditions.get('status')} if renditions else {}
+    for name in instance.rendition_names:
+        entry = renditions.get(name)
+        if not entry:
+            continue
+        payload[name] = {'width': entry['width'], 'height': entry['height']}
+        for key, _, _, _ in FORMATS:
+            payload[name][key] = _url(storage, entry[key], request)
+    sets = {key: srcset(instance, key, request) for key, _, _, _ in FORMATS}
+    if any(sets.values()):
+        payload['srcset'] = sets
+    return payload
@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# ----------------------------
+# Read replica routing
+# ----------------------------
+# With a 'replica' database configured (see settings.DATABASE_REPLICA_PATH),
+# reads made inside read_from_replica() go to it; everything else, including
+# every write and any read a request needs to see its own writes, stays on
+# 'default'. The flag is a context variable, so it follows a request into the
+# async ORM's worker thread and never leaks into another request.
+REPLICA = 'replica'
+
+# The replica lags the primary, and a response built from it right after a write
+# would be cached under the version that write just bumped. So a bump of the
+# feed, archive or a photo scope (see pictale_app.caching) pins reads to the
+# primary for REPLICA_LAG_SECONDS, which must exceed the replication lag. Use a
+# shared cache so the pin reaches every process.
+PIN_KEY = 'replica:pinned'
+
+_use_replica = ContextVar('pictale_use_replica', default=False)
+
+
+def pin_primary():
+    """Send replica reads to the primary until the replica has caught up with a write."""
+    if REPLICA in settings.DATABASES:
+        cache.set(PIN_KEY, True, timeout=getattr(settings, 'REPLICA_LAG_SECONDS', 5))
+
+
+def _replica_allowed():
+    return REPLICA not in settings.DATABASES or not cache.get(PIN_KEY)
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(_replica_allowed())
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReplicaReadsMixin:
+    """
+    Viewset mixin: run the actions listed in `replica_actions` (public,
+    read-only ones) inside read_from_replica().
+    """
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            self._replica_token = _use_replica.set(_replica_allowed())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
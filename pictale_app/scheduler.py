@@ -0,0 +1,73 @@
+import datetime
+
+from django.core.handlers.base import BaseHandler
+from django.test import RequestFactory
+from django.utils import timezone
+
+from .models import DailyPhoto
+from .publishing import as_of, publishing_date
+from .renditions import needs_renditions, refresh_renditions
+
+# ----------------------------
+# Publishing scheduler
+# ----------------------------
+# Runs ahead of midnight (see `manage.py publish_scheduler`): generates the
+# renditions of the photos about to go out, then renders tomorrow's home page,
+# photo pages and API payloads as of tomorrow into the response cache. Their
+# keys carry tomorrow's date, so they are what the first requests after the
+# rollover find. The web processes only see them with a shared cache backend,
+# and only for the scheme and host they were rendered for (PUBLIC_SCHEME, PUBLIC_HOST).
+WARM_ACCEPT = {'/api/': 'application/json'}
+
+
+def upcoming_photos(days=1):
+    today = publishing_date()
+    return DailyPhoto.objects.filter(
+        date_featured__gt=today, date_featured__lte=today + datetime.timedelta(days=days)
+    ).order_by('date_featured')
+
+
+def prepare_renditions(days=1):
+    """Generate renditions that are missing, stale or still queued for the next `days` photos."""
+    prepared = 0
+    for photo in upcoming_photos(days):
+        if needs_renditions(photo) or (photo.renditions or {}).get('status') == 'pending':
+            refresh_renditions(photo)
+            prepared += 1
+    return prepared
+
+
+def warm_paths(day):
+    """The anonymous pages and API reads that change when `day`'s photo is published."""
+    with as_of(day):
+        latest = list(DailyPhoto.objects.published().order_by('-date_featured').values_list('id', flat=True)[:2])
+    paths = ['/', '/api/dailyphotos/', '/api/dailyphotos/?pagination=cursor']
+    # The new photo's own pages, and the previous photo's, whose "next" link appears
+    paths += [f'/photo/{photo_id}/' for photo_id in latest]
+    paths += [f'/api/dailyphotos/{photo_id}/' for photo_id in latest[:1]]
+    return paths
+
+
+def warm(day, host, scheme, paths=None):
+    """
+    Render `paths` (default warm_paths(day)) as of `day` through the full
+    middleware stack, as anonymous requests to scheme://host. Returns {path: status code}.
+    """
+    handler = BaseHandler()
+    handler.load_middleware()
+    factory = RequestFactory(HTTP_HOST=host)
+    statuses = {}
+    with as_of(day):
+        for path in paths or warm_paths(day):
+            accept = next((value for prefix, value in WARM_ACCEPT.items() if path.startswith(prefix)), 'text/html')
+            response = handler.get_response(factory.get(path, secure=scheme == 'https', HTTP_ACCEPT=accept))
+            response.close()
+            statuses[path] = response.status_code
+    return statuses
+
+
+def next_rollover(now=None):
+    """The next midnight in the site time zone, as an aware datetime."""
+    now = timezone.localtime(now)
+    tomorrow = now.date() + datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(tomorrow, datetime.time.min), now.tzinfo)
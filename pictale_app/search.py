@@ -0,0 +1,150 @@
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from rest_framework.filters import BaseFilterBackend
+
+from .models import DailyPhoto
+
+# ----------------------------
+# Full-text search for DailyPhoto
+# ----------------------------
+# SQLite: an FTS5 table keyed by photo id, kept in step by pictale_app.signals.
+# PostgreSQL: a GIN expression index over the weighted title/story tsvector
+# (created in migration 0005), which the database maintains itself.
+FTS_TABLE = 'pictale_app_dailyphoto_fts'
+HIGHLIGHT = ('<mark>', '</mark>')
+# The database wraps matches in these control characters; highlighted() escapes
+# the user text and only then turns them into HIGHLIGHT tags.
+MARKERS = ('\x02', '\x03')
+SNIPPET_TOKENS = 16
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """Words of a free-text query; everything else (operators, quotes) is dropped."""
+    return _TERM_RE.findall(query or '')
+
+
+def highlighted(text):
+    """HTML-safe title/snippet from a search annotation: escaped text, matches in <mark>."""
+    if text is None:
+        return None
+    text = escape(text)
+    for marker, tag in zip(MARKERS, HIGHLIGHT):
+        text = text.replace(marker, tag)
+    return text
+
+
+def uses_fts5():
+    return connection.vendor == 'sqlite'
+
+
+# ----------------------------
+# Index maintenance (SQLite)
+# ----------------------------
+def index_photos(photos):
+    if not uses_fts5():
+        return
+    rows = [(photo.pk, photo.title, photo.story) for photo in photos]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, title, story) VALUES (%s, %s, %s)", rows)
+
+
+def unindex_photo(photo_id):
+    if not uses_fts5():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [photo_id])
+
+
+def rebuild_index():
+    """Rebuild the whole index from DailyPhoto. Returns the number of photos indexed."""
+    if not uses_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX pictale_dailyphoto_search_idx")
+        return DailyPhoto.objects.count()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, story) "
+            f"SELECT id, title, story FROM {DailyPhoto._meta.db_table}"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return DailyPhoto.objects.count()
+
+
+# ----------------------------
+# Querying
+# ----------------------------
+def search(queryset, query):
+    """
+    Restrict a DailyPhoto queryset to photos matching every word of `query`
+    (each as a prefix), ordered by relevance. Adds search_rank, search_title
+    and search_snippet annotations with the matches wrapped in MARKERS (pass
+    them through highlighted() before showing them).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    if uses_fts5():
+        return _search_fts5(queryset, terms)
+    return _search_postgres(queryset, terms)
+
+
+def _search_fts5(queryset, terms):
+    match = ' '.join('"%s"*' % term for term in terms)
+    table = DailyPhoto._meta.db_table
+    correlated = f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id"
+    start, stop = MARKERS
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    ).annotate(
+        # bm25() is lower for better matches; title hits weigh 4x story hits
+        search_rank=RawSQL(f"SELECT -bm25({FTS_TABLE}, 4.0, 1.0) {correlated}", [match], output_field=FloatField()),
+        search_title=RawSQL(
+            f"SELECT highlight({FTS_TABLE}, 0, %s, %s) {correlated}", [start, stop, match], output_field=TextField()
+        ),
+        search_snippet=RawSQL(
+            f"SELECT snippet({FTS_TABLE}, 1, %s, %s, '…', {SNIPPET_TOKENS}) {correlated}",
+            [start, stop, match], output_field=TextField(),
+        ),
+    ).order_by(F('search_rank').desc(), '-date_featured')
+
+
+def _search_postgres(queryset, terms):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+
+    vector = SearchVector('title', weight='A', config='english') + SearchVector('story', weight='B', config='english')
+    query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='english')
+    start, stop = MARKERS
+    return queryset.annotate(search_vector=vector).filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query),
+        search_title=SearchHeadline('title', query, config='english', start_sel=start, stop_sel=stop,
+                                    highlight_all=True),
+        search_snippet=SearchHeadline('story', query, config='english', start_sel=start, stop_sel=stop,
+                                      max_words=SNIPPET_TOKENS, min_words=SNIPPET_TOKENS // 2),
+    ).order_by(F('search_rank').desc(), '-date_featured')
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """DRF filter backend: ?search=<words> ranked full-text search over title and story."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search(queryset, query)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Ranked full-text search over title and story (prefix matching).',
+            'schema': {'type': 'string'},
+        }]
@@ -1,10 +1,29 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation
+from .models import DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation, TimelineEntry
+from .renditions import rendition_payload
+from .engagement import MAX_BATCH
+from .publishing import publishing_date
+from .search import highlighted
 
 User = get_user_model()
 
+# ----------------------------
+# Renditions
+# ----------------------------
+class RenditionsField(serializers.Field):
+    """Read-only rendition URLs with width/height and srcset (see pictale_app.renditions)."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return rendition_payload(instance, self.context.get('request'))
+
+
 # ----------------------------
 # Comment Serializer
 # ----------------------------
@@ -15,6 +34,12 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['id', 'user', 'post', 'comment_text', 'created_at']
 
+    def validate_post(self, post):
+        # Scheduled photos are hidden until their date_featured, so they can't be commented on yet
+        if post.date_featured > publishing_date():
+            raise serializers.ValidationError(f'Invalid pk "{post.pk}" - object does not exist.')
+        return post
+
 
 # ----------------------------
 # Like Serializer
@@ -31,17 +56,44 @@ class LikeSerializer(serializers.ModelSerializer):
 # DailyPhoto Serializer
 # ----------------------------
 class DailyPhotoSerializer(serializers.ModelSerializer):
-    comments = CommentSerializer(many=True, read_only=True)  # show all comments for this photo
-    likes = LikeSerializer(many=True, read_only=True)        # show all likes for this photo
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
+    """
+    Photo payload with aggregate counts only.
+    The full comment and like lists live on /dailyphotos/{id}/comments/ and /likes/.
+    Pass comments_preview=N in the context to include the latest N comments.
+    """
+    latest_comments = serializers.SerializerMethodField()
+    renditions = RenditionsField()
+    search = serializers.SerializerMethodField()
 
     class Meta:
         model = DailyPhoto
         fields = [
-            'id', 'title', 'image', 'story', 'date_taken', 
-            'date_featured', 'comments', 'likes', 'comments_count', 'likes_count'
+            'id', 'title', 'image', 'renditions', 'story', 'date_taken',
+            'date_featured', 'updated_at', 'comments_count', 'likes_count', 'saves_count', 'latest_comments', 'search'
         ]
+        read_only_fields = ['comments_count', 'likes_count', 'saves_count']  # maintained by signals
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('comments_preview'):
+            self.fields.pop('latest_comments')
+        request = self.context.get('request')
+        if request is None or not request.query_params.get('search'):
+            self.fields.pop('search')
+
+    def get_search(self, obj):
+        # Annotated by pictale_app.search.search(); escaped, with the matches wrapped in <mark>
+        if not hasattr(obj, 'search_rank'):
+            return None
+        return {'rank': obj.search_rank, 'title': highlighted(obj.search_title),
+                'snippet': highlighted(obj.search_snippet)}
+
+    def get_latest_comments(self, obj):
+        limit = self.context['comments_preview']
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            comments = obj.comments.select_related('user').order_by('-created_at', '-id')[:limit]
+        return CommentSerializer(comments, many=True, context=self.context).data
 
 
 # ----------------------------
@@ -63,10 +115,11 @@ class SavedPhotoSerializer(serializers.ModelSerializer):
 class PhotoRecommendationSerializer(serializers.ModelSerializer):
     reviewed_at = serializers.DateTimeField(read_only=True)  # set automatically on status change
     user = serializers.StringRelatedField(read_only=True)    # show username instead of ID
+    renditions = RenditionsField()
 
     class Meta:
         model = PhotoRecommendation
-        fields = '__all__'
+        fields = ['id', 'user', 'title', 'story', 'image_file', 'renditions', 'status', 'created_at', 'reviewed_at']
 
     def update(self, instance, validated_data):
         new_status = validated_data.get('status', instance.status)
@@ -75,11 +128,52 @@ class PhotoRecommendationSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
+class RecommendationModerationSerializer(PhotoRecommendationSerializer):
+    """Staff view: adds the promotion and duplicate-detection fields, which name other users' uploads."""
+
+    class Meta(PhotoRecommendationSerializer.Meta):
+        fields = PhotoRecommendationSerializer.Meta.fields + ['promoted_photo', 'fingerprint', 'duplicates']
+        read_only_fields = ['promoted_photo', 'fingerprint', 'duplicates']
+
+
+class RecommendationReviewSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_BATCH)
+    status = serializers.ChoiceField(choices=['approved', 'rejected'])
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+# ----------------------------
+# Timeline Serializer
+# ----------------------------
+class TimelineEntrySerializer(serializers.ModelSerializer):
+    photo = DailyPhotoSerializer(read_only=True)
+
+    class Meta:
+        model = TimelineEntry
+        fields = ['photo', 'liked', 'saved', 'commented', 'by_author', 'activity_at']
+
+
+# ----------------------------
+# Batch engagement Serializer
+# ----------------------------
+class PhotoIdsSerializer(serializers.Serializer):
+    photo_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_BATCH
+    )
+
+    def validate_photo_ids(self, value):
+        return list(dict.fromkeys(value))  # drop duplicates, keep order
+
+
 # ----------------------------
 # Profile Serializer
 # ----------------------------
 class ProfileSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+
     class Meta:
         model = User
-        fields = ["id", "username", "email", "first_name", "last_name"]
+        fields = ["id", "username", "email", "first_name", "last_name", "renditions"]
         read_only_fields = ["id", "username"]  # don’t allow username changes
@@ -0,0 +1,228 @@
+from django.core.signals import request_finished
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache, token_usage
+from .likebuffer import like_buffer
+
+from .caching import bump, invalidate_photo
+from .engagement import adjust_counter
+from .models import User, DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation
+from .search import index_photos, unindex_photo
+from .renditions import delete_renditions, needs_renditions, renditions_updated, schedule_renditions
+from . import fingerprints, similar, timeline
+
+
+# ----------------------------
+# Engagement counters
+# ----------------------------
+# Inserts run inside Engagement.save()'s transaction and deletes inside the
+# deletion collector's, so each counter moves atomically with its row. This
+# covers the API, the frontend views, admin and cascades from User deletion.
+# Bulk operations bypass signals; call DailyPhoto.objects.filter(...).recount_engagement().
+def _bump(instance, delta):
+    adjust_counter(instance.post_id, instance.counter_field, delta)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=SavedPhoto)
+def engagement_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _bump(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=SavedPhoto)
+def engagement_deleted(sender, instance, **kwargs):
+    _bump(instance, -1)
+
+
+# ----------------------------
+# Personal timelines
+# ----------------------------
+# Model saves and deletes (API comments, admin, cascades); add_engagement and
+# the batch endpoints update timelines themselves.
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=SavedPhoto)
+def timeline_engaged(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.record(sender, instance.user_id, [instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=SavedPhoto)
+def timeline_disengaged(sender, instance, **kwargs):
+    # A photo stays "commented" while any of the user's comments on it remain
+    if sender is Comment and Comment.objects.filter(user_id=instance.user_id, post_id=instance.post_id).exists():
+        return
+    timeline.forget(sender, instance.user_id, [instance.post_id])
+
+
+@receiver(post_save, sender=DailyPhoto)
+def photo_fanned_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.author_id:
+        timeline.schedule_fan_out(instance)
+
+
+# ----------------------------
+# Similar photos
+# ----------------------------
+# Edits are picked up by the next `build_similar_photos`.
+@receiver(post_save, sender=DailyPhoto)
+def photo_added_to_similar(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        similar.schedule_add_photo(instance)
+
+
+# ----------------------------
+# Response cache invalidation
+# ----------------------------
+@receiver(post_save, sender=DailyPhoto)
+@receiver(post_delete, sender=DailyPhoto)
+def photo_changed(sender, instance, **kwargs):
+    invalidate_photo(instance.pk, archive=True)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_moving(sender, instance, raw=False, **kwargs):
+    # Remember the photo an edited comment was on, in case the edit moves it
+    if not raw and not instance._state.adding:
+        instance._previous_post_id = (
+            Comment.objects.filter(pk=instance.pk).values_list('post_id', flat=True).first())
+
+
+@receiver(post_save, sender=Comment)
+def comment_edited(sender, instance, created, raw=False, **kwargs):
+    # New comments are covered by the counter update; edits change the previews and pages
+    if created or raw:
+        return
+    previous = getattr(instance, '_previous_post_id', None)
+    if previous is not None and previous != instance.post_id:
+        # Moved to another photo: both counters, both timelines
+        adjust_counter(previous, Comment.counter_field, -1)
+        adjust_counter(instance.post_id, Comment.counter_field, 1)
+        if not Comment.objects.filter(user_id=instance.user_id, post_id=previous).exists():
+            timeline.forget(Comment, instance.user_id, [previous])
+        timeline.record(Comment, instance.user_id, [instance.post_id])
+    else:
+        invalidate_photo(instance.post_id)
+
+
+@receiver(renditions_updated, sender=DailyPhoto)
+def photo_renditions_updated(sender, instance, **kwargs):
+    invalidate_photo(instance.pk)
+
+
+@receiver(renditions_updated, sender=User)
+def avatar_updated(sender, instance, **kwargs):
+    # Avatars appear next to comments on every cached photo page
+    bump('feed', 'archive')
+
+
+# ----------------------------
+# Full-text search index
+# ----------------------------
+@receiver(post_save, sender=DailyPhoto)
+def photo_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_photos([instance])
+
+
+@receiver(post_delete, sender=DailyPhoto)
+def photo_unindexed(sender, instance, **kwargs):
+    unindex_photo(instance.pk)
+
+
+# ----------------------------
+# Image renditions
+# ----------------------------
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=DailyPhoto)
+@receiver(post_save, sender=PhotoRecommendation)
+def image_saved(sender, instance, raw=False, **kwargs):
+    if not raw and needs_renditions(instance):
+        schedule_renditions(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=DailyPhoto)
+@receiver(post_delete, sender=PhotoRecommendation)
+def image_deleted(sender, instance, **kwargs):
+    delete_renditions(instance.renditions, getattr(instance, instance.rendition_field).storage)
+
+
+# ----------------------------
+# Image fingerprints
+# ----------------------------
+@receiver(post_save, sender=DailyPhoto)
+@receiver(post_save, sender=PhotoRecommendation)
+def image_fingerprinted(sender, instance, raw=False, **kwargs):
+    if not raw and fingerprints.needs_fingerprint(instance):
+        fingerprints.schedule_fingerprint(instance)
+
+
+@receiver(post_delete, sender=DailyPhoto)
+@receiver(post_delete, sender=PhotoRecommendation)
+def fingerprint_deleted(sender, instance, **kwargs):
+    if instance.fingerprint:
+        bump('fingerprints')  # every process drops it on its next lookup
+
+
+# ----------------------------
+# API token cache
+# ----------------------------
+# Cached users must never outlive a logout, a password change, deactivation or a
+# change of permissions, so those drop the user's cached tokens in every process.
+# Other saves (profile edits) only drop this process's copy; last_login updates
+# drop nothing.
+AUTH_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _auth_state(instance):
+    # __dict__, so deferred fields are not loaded just to compare them
+    return tuple(instance.__dict__.get(field) for field in AUTH_FIELDS)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._auth_state = _auth_state(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not set(update_fields) & set(AUTH_FIELDS)):
+        return
+    state = _auth_state(instance)
+    token_cache.invalidate_user(instance.pk, everywhere=state != instance._auth_state)
+    instance._auth_state = state
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(request_finished)
+def flush_token_usage(sender, **kwargs):
+    # After the response is produced, so the batched write stays off the request
+    if token_usage.due():
+        token_usage.flush()
+
+
+# ----------------------------
+# Write-behind likes
+# ----------------------------
+@receiver(request_finished)
+def flush_like_buffer(sender, **kwargs):
+    if like_buffer.due():
+        like_buffer.flush()
@@ -0,0 +1,218 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+
+from .caching import bump, versions
+from .models import DailyPhoto, PhotoSimilarity
+from .search import search_terms
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------
+# Similar photos
+# ----------------------------
+# Every photo is a sparse vector: TF-IDF weights of the words in its title and
+# story, and the square roots of its colour-bin shares. Cosine similarity over
+# the concatenation blends the two as TEXT_WEIGHT / COLOUR_WEIGHT. Scores come
+# from an inverted index, so a photo is only compared with photos that share a
+# word or a colour. The best NEIGHBOURS per photo are stored in PhotoSimilarity
+# by `manage.py build_similar_photos` and updated by a job when a photo is
+# added; requests only read them from memory (SimilarIndex).
+NEIGHBOURS = 20
+TEXT_WEIGHT = 0.7
+COLOUR_WEIGHT = 0.3
+TITLE_BOOST = 2  # a title word counts as this many story words
+MAX_DF = 0.5  # words in more photos than this share carry no signal
+COLOUR_LEVELS = 4  # per channel: 4 x 4 x 4 = 64 bins
+COLOUR_SHIFT = 8 - (COLOUR_LEVELS - 1).bit_length()
+COLOUR_BINS = 8  # strongest bins kept per photo
+SAMPLE_SIZE = (64, 64)
+
+STOPWORDS = frozenset("""
+    about after again all also and any are because been before being but can could did does doing down during each
+    few for from had has have her here hers him his how into its just more most not now off once only other our out
+    over own same she should some such than that the their them then there these they this those through too under
+    until very was were what when where which while who whom why will with you your
+""".split())
+
+
+# ----------------------------
+# Features
+# ----------------------------
+def words(text):
+    return [word for word in (w.lower() for w in search_terms(text)) if len(word) > 2 and word not in STOPWORDS]
+
+
+def colour_histogram(field_file):
+    """64 bytes: the share of the image in each RGB bin, scaled to 0-255. b'' if it can't be read."""
+    try:
+        with field_file.open('rb') as fh, Image.open(fh) as image:
+            image.draft('RGB', SAMPLE_SIZE)  # JPEG: decode at reduced size
+            image = image.convert('RGB')
+            image.thumbnail(SAMPLE_SIZE)
+            pixels = image.getdata()
+    except (OSError, UnidentifiedImageError, ValueError) as exc:
+        logger.warning("Could not read colours of %s: %s", field_file.name, exc)
+        return b''
+    levels, shift = COLOUR_LEVELS, COLOUR_SHIFT
+    counts = Counter(((r >> shift) * levels + (g >> shift)) * levels + (b >> shift) for r, g, b in pixels)
+    total = len(pixels)
+    return bytes(min(255, round(255 * counts[i] / total)) for i in range(COLOUR_LEVELS ** 3))
+
+
+def _normalized(weights, scale):
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {key: scale * w / norm for key, w in weights.items()} if norm else {}
+
+
+class Corpus:
+    """Vectors and an inverted index over (id, title, story, colours) rows."""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        terms = {pk: Counter(words(story)) + Counter({w: TITLE_BOOST for w in words(title)})
+                 for pk, title, story, _ in rows}
+        df = Counter(word for counts in terms.values() for word in counts)
+        n = len(rows)
+        common = max(MAX_DF * n, 2)
+        self.idf = {word: math.log((1 + n) / (1 + count)) + 1 for word, count in df.items() if count <= common}
+        self.vectors = {}
+        for pk, _, _, colours in rows:
+            self.vectors[pk] = self.vector(terms[pk], colours)
+        self.postings = defaultdict(list)
+        for pk, vector in self.vectors.items():
+            for feature, weight in vector.items():
+                self.postings[feature].append((pk, weight))
+
+    def vector(self, counts, colours):
+        text = _normalized({w: (1 + math.log(c)) * self.idf[w] for w, c in counts.items() if w in self.idf},
+                           math.sqrt(TEXT_WEIGHT))
+        strongest = heapq.nlargest(COLOUR_BINS, ((share, i) for i, share in enumerate(colours or b'') if share))
+        colour = _normalized({i: math.sqrt(share) for share, i in strongest}, math.sqrt(COLOUR_WEIGHT))
+        return {**text, **colour}  # words are str keys, colour bins int keys
+
+    def scores(self, pk):
+        """{other id: similarity} for every photo sharing a feature with `pk`."""
+        scores = defaultdict(float)
+        for feature, weight in self.vectors[pk].items():
+            for other, other_weight in self.postings[feature]:
+                scores[other] += weight * other_weight
+        scores.pop(pk, None)
+        return scores
+
+
+def best(scores, limit=NEIGHBOURS):
+    return [[pk, round(score, 4)] for pk, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+
+def _rows(photos, colours):
+    return ((photo.pk, photo.title, photo.story, colours.get(photo.pk, b'')) for photo in photos)
+
+
+# ----------------------------
+# Building
+# ----------------------------
+def build(refresh_colours=False, batch_size=500, progress=None):
+    """Recompute every photo's neighbours. Returns the number of photos indexed."""
+    colours = {} if refresh_colours else dict(PhotoSimilarity.objects.values_list('photo_id', 'colours'))
+    colours = {pk: bytes(value) for pk, value in colours.items()}
+    photos = list(DailyPhoto.objects.only('id', 'title', 'story', 'image').order_by('id'))
+    for done, photo in enumerate(photos, 1):
+        if photo.pk not in colours:
+            colours[photo.pk] = colour_histogram(photo.image) if photo.image else b''
+            if progress and done % batch_size == 0:
+                progress(f"colours: {done}/{len(photos)}")
+
+    corpus = Corpus(_rows(photos, colours))
+    rows = [PhotoSimilarity(photo_id=pk, colours=colours[pk], neighbours=best(corpus.scores(pk)))
+            for pk in corpus.vectors]
+    PhotoSimilarity.objects.bulk_create(rows, batch_size=batch_size, update_conflicts=True,
+                                        unique_fields=['photo'], update_fields=['colours', 'neighbours'])
+    bump('similar')
+    return len(rows)
+
+
+@task('similar.add_photo')
+def add_photo(photo_id):
+    """Index a new photo: its own neighbours, and its place in the lists it now belongs to."""
+    photo = DailyPhoto.objects.filter(pk=photo_id).only('id', 'title', 'story', 'image').first()
+    if photo is None:
+        return
+    colours = colour_histogram(photo.image) if photo.image else b''
+    known = {pk: bytes(value) for pk, value in PhotoSimilarity.objects.exclude(photo_id=photo_id)
+             .values_list('photo_id', 'colours')}
+    others = (other for other in DailyPhoto.objects.only('id', 'title', 'story').iterator() if other.pk in known)
+    corpus = Corpus([*_rows(others, known), (photo.pk, photo.title, photo.story, colours)])
+    scores = corpus.scores(photo.pk)
+
+    changed = []
+    for row in PhotoSimilarity.objects.only('photo_id', 'neighbours').iterator():
+        if row.photo_id not in scores:
+            continue
+        neighbours = {pk: score for pk, score in row.neighbours if pk != photo.pk}
+        neighbours[photo.pk] = scores[row.photo_id]
+        updated = best(neighbours)
+        if updated != row.neighbours:
+            row.neighbours = updated
+            changed.append(row)
+    PhotoSimilarity.objects.bulk_update(changed, ['neighbours'], batch_size=500)
+    PhotoSimilarity.objects.update_or_create(photo_id=photo.pk,
+                                             defaults={'colours': colours, 'neighbours': best(scores)})
+    bump('similar')
+
+
+def schedule_add_photo(photo):
+    enqueue('similar.add_photo', photo_id=photo.pk)
+
+
+# ----------------------------
+# Serving
+# ----------------------------
+class SimilarIndex:
+    """
+    photo id -> ids of its neighbours, best first, held in memory. Reloaded from
+    PhotoSimilarity when the 'similar' version in the cache moves (shared cache:
+    in every process) or after SIMILAR_INDEX_TTL seconds.
+    """
+
+    def __init__(self):
+        self._neighbours = {}
+        self._version = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def stale(self):
+        ttl = getattr(settings, 'SIMILAR_INDEX_TTL', 300)
+        return self._version != versions(['similar']) or time.monotonic() - self._loaded_at > ttl
+
+    def load(self):
+        with self._lock:
+            version = versions(['similar'])
+            self._neighbours = {pk: tuple(other for other, _ in neighbours) for pk, neighbours
+                                in PhotoSimilarity.objects.values_list('photo_id', 'neighbours').iterator()}
+            self._version, self._loaded_at = version, time.monotonic()
+
+    def neighbours(self, photo_id):
+        if self.stale():
+            self.load()
+        return self._neighbours.get(photo_id, ())
+
+    async def aneighbours(self, photo_id):
+        if self.stale():
+            await sync_to_async(self.load)()
+        return self._neighbours.get(photo_id, ())
+
+    def clear(self):
+        with self._lock:
+            self._neighbours, self._version = {}, None
+
+
+similar_index = SimilarIndex()
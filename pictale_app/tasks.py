@@ -0,0 +1,110 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------
+# Task registry
+# ----------------------------
+# Tasks are plain functions taking JSON-serialisable keyword arguments.
+# Register them with @task('name') in the module that owns the work.
+TASKS = {}
+
+
+def task(name, max_attempts=3, on_failure=None):
+    """
+    Register a function as a background task.
+    on_failure(**kwargs) runs once the job has used up all its attempts.
+    """
+    def decorator(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.on_failure = on_failure
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, **kwargs):
+    """
+    Queue a task. The job row is written in the caller's transaction, so it
+    only becomes visible to workers once the triggering write commits.
+    With TASKS_ALWAYS_EAGER the job runs inline before returning (tests, local dev).
+    """
+    func = TASKS[name]
+    job = Job.objects.create(task=name, kwargs=kwargs, max_attempts=func.max_attempts)
+    if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        Job.objects.filter(pk=job.pk).update(status='running', locked_at=timezone.now())
+        run_job(job.pk)
+        job.refresh_from_db()
+    return job
+
+
+# ----------------------------
+# Claiming and running
+# ----------------------------
+def claim_jobs(limit):
+    """
+    Claim up to `limit` due jobs. Each claim is a conditional UPDATE on the
+    pending row, so two workers can never run the same job; no row locks needed.
+    """
+    now = timezone.now()
+    claimed = []
+    candidates = (
+        Job.objects.filter(status='pending', run_at__lte=now)
+        .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    for job_id in candidates:
+        if Job.objects.filter(pk=job_id, status='pending').update(status='running', locked_at=now):
+            claimed.append(job_id)
+    return claimed
+
+
+def release_stale_jobs(older_than):
+    """Return jobs left 'running' by a crashed worker to the queue."""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(status='pending', locked_at=None)
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'TASKS_RETRY_BACKOFF', 10)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def run_job(job_id):
+    """Run one claimed job and record the outcome. Safe to call in a worker process."""
+    job = Job.objects.get(pk=job_id)
+    func = TASKS.get(job.task)
+    job.attempts += 1
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {job.task!r}")
+        func(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            job.status = 'pending'
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            if func is not None and func.on_failure:
+                try:
+                    func.on_failure(**job.kwargs)
+                except Exception:
+                    # The job is still recorded as failed below
+                    logger.exception("on_failure of job %s failed", job)
+        logger.warning("Job %s attempt %s failed", job, job.attempts)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+        job.finished_at = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=['attempts', 'status', 'run_at', 'last_error', 'finished_at', 'locked_at'])
+    return job.status
@@ -0,0 +1,41 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from pictale_app.renditions import RENDITIONS, srcset
+
+register = template.Library()
+
+
+# ----------------------------
+# Responsive images
+# ----------------------------
+@register.simple_tag
+def picture(obj, name, sizes=None, **attrs):
+    """
+    Render obj's `name` rendition as <picture> with a WebP source and a JPEG <img>
+    carrying width/height, so the browser never downloads the original. Cropped
+    renditions (thumb, avatar) are single images; the others get a srcset over
+    every responsive size. Falls back to the original upload until renditions exist.
+
+        {% picture daily_photo 'full' sizes="(max-width: 800px) 100vw, 800px" alt=daily_photo.title %}
+    """
+    field_file = getattr(obj, obj.rendition_field)
+    entry = (obj.renditions or {}).get(name)
+    extra = format_html_join(' ', '{}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items()))
+
+    if not entry:
+        return format_html('<img src="{}" {}>', field_file.url, extra)
+
+    storage = field_file.storage
+    responsive = not RENDITIONS[name].crop
+    webp_srcset = srcset(obj, 'webp') if responsive else ''
+    jpeg_srcset = srcset(obj, 'jpeg') if responsive else ''
+    sizes_attr = format_html(' sizes="{}"', sizes) if sizes and webp_srcset else ''
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}"{}>'
+        '<img src="{}"{} width="{}" height="{}"{} {}></picture>',
+        webp_srcset or storage.url(entry['webp']), sizes_attr,
+        storage.url(entry['jpeg']),
+        format_html(' srcset="{}"', jpeg_srcset) if jpeg_srcset else '',
+        entry['width'], entry['height'], sizes_attr, extra,
+    )
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+
+# ----------------------------
+# Query budget test helper
+# ----------------------------
+class QueryBudgetTestMixin:
+    """
+    Mix into a TestCase to fail a test when a view exceeds its declared query budget.
+
+        response = self.client.get('/')
+        self.assertWithinQueryBudget(response)
+    """
+
+    def setUp(self):
+        super().setUp()
+        query_counting = override_settings(QUERY_COUNT_ENABLED=True)
+        query_counting.enable()
+        self.addCleanup(query_counting.disable)
+        cache.clear()  # measure the uncached path
+
+    def assertWithinQueryBudget(self, response):
+        report = getattr(response, 'query_report', None)
+        if report is None:
+            self.fail("No query report on the response; is QueryCountMiddleware installed?")
+        if report.budget is None:
+            self.fail(f"{response.request['PATH_INFO']} has no declared query budget.")
+        if report.over_budget:
+            self.fail(f"{response.request['PATH_INFO']} exceeded its query budget:\n{report.summary()}")
+        return report
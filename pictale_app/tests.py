@@ -1,3 +1,1492 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import fcntl
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import TokenCache, token_cache, token_usage
+from .caching import bump, invalidate_photo, versions
+from .engagement import add_engagement
+from .benchmarks.data import seed as seed_benchmark_data
+from .benchmarks.report import compare as compare_reports
+from .models import (User, DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation, ApiTokenUsage, TimelineEntry,
+                     PhotoSimilarity, EngagementRollup, Job)
+from .publishing import as_of
+from .tasks import claim_jobs, enqueue, release_stale_jobs, run_job, task
+from .similar import similar_index
+from .fingerprints import fingerprint_index
+from .likebuffer import like_buffer
+from .routers import PIN_KEY, REPLICA, ReadReplicaRouter, read_from_replica, _use_replica
+from .testing import QueryBudgetTestMixin
+
+
+# ----------------------------
+# Query budgets
+# ----------------------------
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """
+    Every view renders a page of data with several users and photos, so a query
+    per row shows up as a budget failure instead of passing unnoticed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw-reader-123')
+        cls.token = Token.objects.create(user=cls.user)
+        others = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw') for i in range(3)]
+        start = datetime.date(2025, 1, 1)
+        cls.photos = []
+        for day in range(5):
+            photo = DailyPhoto.objects.create(
+                title=f'Photo {day}', image='daily_photos/photo.jpg', story='A story.',
+                date_featured=start + datetime.timedelta(days=day), author=others[day % 3],
+            )
+            cls.photos.append(photo)
+            for other in others:
+                Comment.objects.create(user=other, post=photo, comment_text='Nice!')
+                Like.objects.create(user=other, post=photo)
+            SavedPhoto.objects.create(user=cls.user, post=photo)
+            PhotoRecommendation.objects.create(user=others[day % 3], title='Rec', story='Story')
+        cls.recommendation = PhotoRecommendation.objects.create(user=cls.user, title='Mine', story='Story')
+        cls.photo = cls.photos[2]
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assertBudgets(self, client, paths):
+        for path in paths:
+            with self.subTest(path=path):
+                response = client.get(path)
+                self.assertLess(response.status_code, 400)
+                self.assertWithinQueryBudget(response)
+
+    def test_api_read_endpoints(self):
+        photo_id = self.photo.id
+        self.assertBudgets(self.api, [
+            '/api/dailyphotos/',
+            '/api/dailyphotos/?comments_preview=3',
+            '/api/dailyphotos/?pagination=cursor',
+            f'/api/dailyphotos/{photo_id}/',
+            f'/api/dailyphotos/{photo_id}/comments/',
+            f'/api/dailyphotos/{photo_id}/likes/',
+            '/api/comments/',
+            f'/api/comments/?post_id={photo_id}',
+            f'/api/comments/?post_id={photo_id}&pagination=cursor',
+            f'/api/comments/{Comment.objects.first().id}/',
+            '/api/likes/',
+            f'/api/likes/{Like.objects.first().id}/',
+            '/api/savedphotos/',
+            f'/api/savedphotos/{SavedPhoto.objects.first().id}/',
+            '/api/recommendations/',
+            f'/api/recommendations/{self.recommendation.id}/',
+        ])
+
+    def test_api_write_actions(self):
+        for path in ['/api/likes/like_photo/', '/api/savedphotos/save_photo/']:
+            with self.subTest(path=path):
+                response = self.api.post(path, {'photo_id': self.photos[0].id})
+                self.assertLess(response.status_code, 400)
+                self.assertWithinQueryBudget(response)
+
+    def test_frontend_pages(self):
+        self.assertBudgets(self.client, ['/', f'/photo/{self.photo.id}/', '/login/', '/register/'])
+
+        self.client.force_login(self.user)
+        self.assertBudgets(self.client, [
+            '/', f'/photo/{self.photo.id}/', '/profile/', '/profile/edit/',
+            '/profile/change-password/', '/recommendations/',
+        ])
+
+    def test_frontend_actions(self):
+        self.client.force_login(self.user)
+        for path, data in [
+            (f'/like/{self.photo.id}/', {}),
+            (f'/save/{self.photo.id}/', {}),
+            (f'/comment/{self.photo.id}/', {'comment_text': 'Lovely'}),
+        ]:
+            with self.subTest(path=path):
+                self.assertWithinQueryBudget(self.client.post(path, data))
+
+
+# ----------------------------
+# Home page navigation
+# ----------------------------
+class HomeNavigationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Created out of date order so ids and date_featured disagree
+        cls.middle = DailyPhoto.objects.create(title='Middle', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 2))
+        cls.newest = DailyPhoto.objects.create(title='Newest', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 3))
+        cls.oldest = DailyPhoto.objects.create(title='Oldest', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 1))
+
+    def test_neighbours_follow_date_featured(self):
+        response = self.client.get(f'/photo/{self.middle.id}/')
+        self.assertEqual(response.context['previous_photo_id'], self.oldest.id)
+        self.assertEqual(response.context['next_photo_id'], self.newest.id)
+
+    def test_default_is_latest_with_no_next(self):
+        response = self.client.get('/')
+        self.assertEqual(response.context['daily_photo'], self.newest)
+        self.assertEqual(response.context['previous_photo_id'], self.middle.id)
+        self.assertIsNone(response.context['next_photo_id'])
+
+
+# ----------------------------
+# Photo payloads
+# ----------------------------
+class PhotoPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photo = DailyPhoto.objects.create(title='Photo', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 1))
+        users = [User.objects.create_user(f'fan{i}', f'fan{i}@example.com', 'pw') for i in range(7)]
+        for i, user in enumerate(users):
+            Comment.objects.create(user=user, post=cls.photo, comment_text=f'Comment {i}')
+            Like.objects.create(user=user, post=cls.photo)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_payload_has_counts_not_lists(self):
+        photo = self.client.get('/api/dailyphotos/').json()['results'][0]
+        self.assertEqual((photo['comments_count'], photo['likes_count'], photo['saves_count']), (7, 7, 0))
+        for nested in ('comments', 'likes', 'latest_comments'):
+            self.assertNotIn(nested, photo)
+        self.assertEqual(self.client.get(f'/api/dailyphotos/{self.photo.id}/likes/').json()['count'], 7)
+        self.assertEqual(self.client.get(f'/api/dailyphotos/{self.photo.id}/comments/').json()['count'], 7)
+
+    def test_comments_preview_is_newest_first_and_capped(self):
+        detail = f'/api/dailyphotos/{self.photo.id}/'
+        preview = self.client.get(detail, {'comments_preview': 2}).json()['latest_comments']
+        self.assertEqual([c['comment_text'] for c in preview], ['Comment 6', 'Comment 5'])
+        self.assertEqual(len(self.client.get(detail, {'comments_preview': 100}).json()['latest_comments']), 5)
+        listed = self.client.get('/api/dailyphotos/', {'comments_preview': 100}).json()['results'][0]
+        self.assertEqual(len(listed['latest_comments']), 5)
+        self.assertNotIn('latest_comments', self.client.get(detail, {'comments_preview': 'x'}).json())
+
+
+# ----------------------------
+# Cursor pagination
+# ----------------------------
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime.date(2025, 1, 1)
+        cls.photos = [
+            DailyPhoto.objects.create(title=f'Photo {day}', image='x.jpg', story='s',
+                                      date_featured=start + datetime.timedelta(days=day))
+            for day in range(25)
+        ]
+        cls.photo = cls.photos[0]
+        for i in range(25):
+            user = User.objects.create_user(f'commenter{i}', f'commenter{i}@example.com', 'pw')
+            Comment.objects.create(user=user, post=cls.photo, comment_text=f'Comment {i}')
+        # Equal timestamps, so only the id tie-breaker orders them
+        Comment.objects.update(created_at=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        """Follow next links to the end, then previous links back; return both id sequences."""
+        pages = []
+        while url:
+            body = self.client.get(url).json()
+            self.assertNotIn('count', body)
+            pages.append([row['id'] for row in body['results']])
+            last, url = body, body['next']
+        back = []
+        url = last['previous']
+        while url:
+            body = self.client.get(url).json()
+            back.insert(0, [row['id'] for row in body['results']])
+            url = body['previous']
+        return pages, back
+
+    def test_photo_cursor_round_trip(self):
+        pages, back = self.walk('/api/dailyphotos/?pagination=cursor')
+        expected = [photo.id for photo in reversed(self.photos)]
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(back, pages[:-1])
+
+    def test_equal_timestamps_keep_a_stable_order(self):
+        pages, back = self.walk(f'/api/comments/?post_id={self.photo.id}&pagination=cursor')
+        expected = list(Comment.objects.order_by('-id').values_list('id', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(back, pages[:-1])
+
+    def test_tampered_cursors_are_404s(self):
+        url = f'/api/comments/?post_id={self.photo.id}&pagination=cursor'
+        for position in (['not-a-date', 1], [{}, 1], ['2025-01-01T00:00:00+00:00', 'x'], [None, 1], [1], 'x'):
+            cursor = base64.b64encode(urlencode({'p': json.dumps(position)}).encode()).decode()
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404, position)
+
+    def test_cursor_pages_skip_the_count(self):
+        for url in ('/api/dailyphotos/?pagination=cursor', f'/api/comments/?post_id={self.photo.id}&pagination=cursor'):
+            with CaptureQueriesContext(connection) as queries:
+                next_url = self.client.get(url).json()['next']
+                self.client.get(next_url)
+            self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()], url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/dailyphotos/').json()['count'], 25)
+        self.assertTrue(any('COUNT(' in q['sql'].upper() for q in queries))
+
+
+# ----------------------------
+# Engagement counters
+# ----------------------------
+class EngagementCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'pw')
+        cls.photo = DailyPhoto.objects.create(title='Photo', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 1))
+
+    def test_counters_follow_creates_and_deletes(self):
+        like = Like.objects.create(user=self.user, post=self.photo)
+        Comment.objects.create(user=self.user, post=self.photo, comment_text='Nice')
+        SavedPhoto.objects.create(user=self.user, post=self.photo)
+        self.photo.refresh_from_db()
+        self.assertEqual((self.photo.likes_count, self.photo.comments_count, self.photo.saves_count), (1, 1, 1))
+
+        like.delete()
+        self.user.delete()  # cascades the comment and the save
+        self.photo.refresh_from_db()
+        self.assertEqual((self.photo.likes_count, self.photo.comments_count, self.photo.saves_count), (0, 0, 0))
+
+    def test_repair_command_fixes_drift(self):
+        Like.objects.create(user=self.user, post=self.photo)
+        DailyPhoto.objects.update(likes_count=7, comments_count=3)
+        call_command('repair_engagement_counts', stdout=StringIO())
+        self.photo.refresh_from_db()
+        self.assertEqual((self.photo.likes_count, self.photo.comments_count), (1, 0))
+
+
+# ----------------------------
+# Image renditions
+# ----------------------------
+class RenditionTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = self.settings(MEDIA_ROOT=media, TASKS_ALWAYS_EAGER=True)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(media, 'daily_photos'))
+        self.media = media
+
+        # A landscape sensor image the camera marks as rotated 90 degrees (orientation 6)
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera Maker'
+        Image.new('RGB', (2000, 1000), 'teal').save(os.path.join(media, 'daily_photos/rotated.jpg'), exif=exif)
+        self.photo = DailyPhoto.objects.create(title='Rotated', image='daily_photos/rotated.jpg', story='s',
+                                               date_featured=datetime.date(2025, 1, 1))
+
+    def open_rendition(self, path):
+        return Image.open(os.path.join(self.media, path))
+
+    def test_renditions_are_upright_and_stripped(self):
+        renditions = DailyPhoto.objects.get(pk=self.photo.pk).renditions
+        self.assertEqual(renditions['status'], 'done')
+        sizes = {name: (renditions[name]['width'], renditions[name]['height']) for name in ('thumb', 'card', 'full')}
+        # Not upscaled past the 1000px wide original
+        self.assertEqual(sizes, {'thumb': (320, 320), 'card': (640, 1280), 'full': (1000, 2000)})
+        for name in sizes:
+            for key, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                with self.open_rendition(renditions[name][key]) as image:
+                    self.assertEqual((image.format, image.size), (pil_format, sizes[name]))
+                    self.assertEqual(dict(image.getexif()), {})
+
+    def test_payload_lists_sizes_and_srcset(self):
+        renditions = self.client.get(f'/api/dailyphotos/{self.photo.id}/').json()['renditions']
+        self.assertEqual(renditions['status'], 'done')
+        self.assertEqual((renditions['card']['width'], renditions['card']['height']), (640, 1280))
+        self.assertTrue(renditions['card']['webp'].startswith('http://testserver/media/renditions/dailyphoto/'))
+        self.assertTrue(renditions['card']['jpeg'].endswith('/card.jpg'))
+        webp = [candidate.split(' ')[1] for candidate in renditions['srcset']['webp'].split(', ')]
+        self.assertEqual(webp, ['640w', '1000w'])  # cropped thumbs are not srcset candidates
+        self.assertIn('/full.jpg 1000w', renditions['srcset']['jpeg'])
+
+    def test_picture_tag(self):
+        template = Template(
+            "{% load pictale_images %}{% picture photo name sizes='100vw' alt=photo.title %}"
+        )
+        photo = DailyPhoto.objects.get(pk=self.photo.pk)
+        html = template.render(Context({'photo': photo, 'name': 'card'}))
+        self.assertIn('<source type="image/webp" srcset="/media/renditions/dailyphoto/daily_photos/rotated/card.webp 640w, '
+                      '/media/renditions/dailyphoto/daily_photos/rotated/full.webp 1000w" sizes="100vw">', html)
+        self.assertIn('src="/media/renditions/dailyphoto/daily_photos/rotated/card.jpg" srcset=', html)
+        self.assertIn('width="640" height="1280" sizes="100vw" alt="Rotated"', html)
+
+        html = template.render(Context({'photo': photo, 'name': 'thumb'}))
+        self.assertIn('srcset="/media/renditions/dailyphoto/daily_photos/rotated/thumb.webp">', html)
+        self.assertNotIn('sizes=', html)
+        self.assertIn('width="320" height="320"', html)
+
+        photo.renditions = {}
+        html = template.render(Context({'photo': photo, 'name': 'card'}))
+        self.assertEqual(html, '<img src="/media/daily_photos/rotated.jpg" alt="Rotated">')
+
+
+# ----------------------------
+# Background jobs
+# ----------------------------
+job_calls = []
+
+
+def _record_failure(**kwargs):
+    job_calls.append(('on_failure', kwargs))
+
+
+@task('tests.record')
+def record_call(**kwargs):
+    job_calls.append(('run', kwargs))
+
+
+def _broken_failure(**kwargs):
+    raise RuntimeError('cleanup failed')
+
+
+@task('tests.broken_cleanup', max_attempts=1, on_failure=_broken_failure)
+def broken_cleanup_task(**kwargs):
+    raise RuntimeError('broken')
+
+
+@task('tests.broken', max_attempts=3, on_failure=_record_failure)
+def broken_task(**kwargs):
+    job_calls.append(('run', kwargs))
+    raise RuntimeError('broken')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        job_calls.clear()
+
+    def make_due(self, job):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now() - datetime.timedelta(seconds=1))
+
+    def test_due_jobs_are_claimed_once_in_order(self):
+        later = enqueue('tests.record', n=3)
+        Job.objects.filter(pk=later.pk).update(run_at=timezone.now() + datetime.timedelta(hours=1))
+        second = enqueue('tests.record', n=2)
+        first = enqueue('tests.record', n=1)
+        Job.objects.filter(pk=first.pk).update(run_at=timezone.now() - datetime.timedelta(minutes=1))
+
+        self.assertEqual(claim_jobs(limit=10), [first.pk, second.pk])
+        self.assertEqual(set(Job.objects.filter(status='running').values_list('pk', flat=True)), {first.pk, second.pk})
+        self.assertEqual(claim_jobs(limit=10), [])  # a second worker finds nothing to take
+
+    def test_worker_runs_each_job_once(self):
+        for n in range(3):
+            enqueue('tests.record', n=n)
+        out = StringIO()
+        call_command('run_worker', '--once', '--concurrency', '0', stdout=out)
+        self.assertIn('Ran 3 job(s): 3 done, 0 to retry, 0 failed.', out.getvalue())
+        self.assertEqual(sorted(kwargs['n'] for _, kwargs in job_calls), [0, 1, 2])
+
+        call_command('run_worker', '--once', '--concurrency', '0', stdout=StringIO())
+        self.assertEqual(len(job_calls), 3)
+        self.assertFalse(Job.objects.exclude(status='done').exists())
+
+    def test_failures_retry_with_backoff_then_call_on_failure(self):
+        job = enqueue('tests.broken', photo=7)
+        with self.settings(TASKS_RETRY_BACKOFF=10), self.assertLogs('pictale_app.tasks', 'WARNING'):
+            for attempt, delay in ((1, 10), (2, 20)):
+                self.assertEqual(claim_jobs(limit=1), [job.pk])
+                before = timezone.now()
+                self.assertEqual(run_job(job.pk), 'pending')
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+                self.assertIn('RuntimeError: broken', job.last_error)
+                self.assertAlmostEqual((job.run_at - before).total_seconds(), delay, delta=1)
+                self.assertEqual(claim_jobs(limit=1), [])  # not due yet
+                self.make_due(job)
+
+            self.assertEqual(claim_jobs(limit=1), [job.pk])
+            self.assertEqual(run_job(job.pk), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.locked_at), (3, None))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job_calls, [('run', {'photo': 7})] * 3 + [('on_failure', {'photo': 7})])
+
+    def test_a_failing_on_failure_hook_still_records_the_failure(self):
+        job = enqueue('tests.broken_cleanup')
+        self.assertEqual(claim_jobs(limit=1), [job.pk])
+        with self.assertLogs('pictale_app.tasks', 'WARNING') as logs:
+            self.assertEqual(run_job(job.pk), 'failed')
+        self.assertIn('cleanup failed', '\n'.join(logs.output))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_at), ('failed', None))
+        self.assertIn('RuntimeError: broken', job.last_error)
+
+    def test_unknown_tasks_fail_without_retrying(self):
+        job = Job.objects.create(task='tests.missing')
+        self.assertEqual(claim_jobs(limit=1), [job.pk])
+        with self.assertLogs('pictale_app.tasks', 'WARNING'):
+            self.assertEqual(run_job(job.pk), 'failed')
+        self.assertIn("Unknown task 'tests.missing'", Job.objects.get(pk=job.pk).last_error)
+
+    def test_stale_claims_are_released(self):
+        crashed = enqueue('tests.record', n=1)
+        working = enqueue('tests.record', n=2)
+        self.assertEqual(claim_jobs(limit=2), [crashed.pk, working.pk])
+        Job.objects.filter(pk=crashed.pk).update(locked_at=timezone.now() - datetime.timedelta(minutes=20))
+
+        self.assertEqual(release_stale_jobs(datetime.timedelta(minutes=10)), 1)
+        self.assertEqual(Job.objects.get(pk=working.pk).status, 'running')
+        self.assertEqual(claim_jobs(limit=2), [crashed.pk])
+
+
+# ----------------------------
+# Response cache
+# ----------------------------
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'pw')
+        cls.photo = DailyPhoto.objects.create(title='Photo', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_conditional_get_returns_304(self):
+        response = self.client.get('/api/dailyphotos/')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        again = self.client.get('/api/dailyphotos/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_cached_list_is_served_without_queries(self):
+        self.client.get('/api/dailyphotos/?page_size=5')
+        with self.assertNumQueries(0):
+            self.client.get('/api/dailyphotos/?page_size=5')
+
+    def test_cached_urls_follow_the_host_and_scheme(self):
+        with self.settings(ALLOWED_HOSTS=['*']):
+            self.client.get('/api/dailyphotos/')
+            image = self.client.get('/api/dailyphotos/', HTTP_HOST='pictale.example.com', secure=True
+                                    ).json()['results'][0]['image']
+        self.assertEqual(image, 'https://pictale.example.com/media/x.jpg')
+
+    def test_engagement_invalidates_list_and_detail(self):
+        detail = f'/api/dailyphotos/{self.photo.id}/'
+        etag = self.client.get(detail)['ETag']
+        self.assertEqual(self.client.get('/api/dailyphotos/').json()['results'][0]['likes_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):  # versions move on commit
+            Like.objects.create(user=self.user, post=self.photo)
+
+        self.assertEqual(self.client.get('/api/dailyphotos/').json()['results'][0]['likes_count'], 1)
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_versions_move_only_when_the_write_commits(self):
+        scopes = ['feed', f'photo:{self.photo.id}']
+        before = versions(scopes)
+        with self.captureOnCommitCallbacks(execute=True):  # stands in for the outer commit
+            with transaction.atomic():
+                add_engagement(Like, self.user, self.photo.id)
+                self.assertEqual(versions(scopes), before)
+            self.assertEqual(versions(scopes), before)
+        self.assertNotEqual(versions(scopes), before)
+
+    def test_anonymous_home_page_is_cached_until_a_comment(self):
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(user=self.user, post=self.photo, comment_text='First!')
+        self.assertContains(self.client.get('/'), 'First!')
+
+    def test_comment_edits_and_moves_invalidate_both_photos(self):
+        other = DailyPhoto.objects.create(title='Other', image='y.jpg', story='s', date_featured=datetime.date(2025, 1, 2))
+        comment = Comment.objects.create(user=self.user, post=self.photo, comment_text='First!')
+        detail = f'/api/dailyphotos/{self.photo.id}/?comments_preview=3'
+        self.assertEqual(self.client.get(detail).json()['latest_comments'][0]['comment_text'], 'First!')
+
+        api = APIClient()
+        api.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            api.patch(f'/api/comments/{comment.id}/', {'comment_text': 'Edited'}, format='json')
+        self.assertEqual(self.client.get(detail).json()['latest_comments'][0]['comment_text'], 'Edited')
+        self.assertContains(self.client.get(f'/photo/{self.photo.id}/'), 'Edited')
+
+        self.client.get(f'/api/dailyphotos/{other.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            api.patch(f'/api/comments/{comment.id}/', {'post': other.id}, format='json')
+        self.assertEqual(self.client.get(detail).json()['latest_comments'], [])
+        moved = self.client.get(f'/api/dailyphotos/{other.id}/').json()
+        self.assertEqual((moved['comments_count'], DailyPhoto.objects.get(pk=self.photo.pk).comments_count),
+                         (1, 0))
+
+
+# ----------------------------
+# Full-text search
+# ----------------------------
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sunset = DailyPhoto.objects.create(title='Golden hour', image='x.jpg', story='Sun over the hills.', date_featured=datetime.date(2025, 1, 1))
+        cls.street = DailyPhoto.objects.create(title='Rainy street', image='x.jpg', story='Golden reflections on asphalt.', date_featured=datetime.date(2025, 1, 2))
+
+    def search(self, query):
+        return self.client.get('/api/dailyphotos/', {'search': query}).data['results']
+
+    def test_ranked_prefix_search_with_highlights(self):
+        results = self.search('gold')
+        self.assertEqual([r['id'] for r in results], [self.sunset.id, self.street.id])  # title match ranks first
+        self.assertEqual(results[0]['search']['title'], '<mark>Golden</mark> hour')
+
+    def test_search_rejects_cursor_pagination(self):
+        response = self.client.get('/api/dailyphotos/', {'search': 'fox', 'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pagination', response.json())
+
+    def test_highlights_escape_user_text(self):
+        DailyPhoto.objects.create(title='<script>alert(1)</script> sunset', image='x.jpg',
+                                  story='Sunset <img src=x onerror=alert(1)> & more',
+                                  date_featured=datetime.date(2025, 1, 3))
+        found = self.search('sunset')[0]['search']
+        self.assertEqual(found['title'], '&lt;script&gt;alert(1)&lt;/script&gt; <mark>sunset</mark>')
+        self.assertNotIn('<img', found['snippet'])
+        self.assertIn('<mark>Sunset</mark> &lt;img', found['snippet'])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.street.story = 'Neon signs in the rain.'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.street.save()
+        self.assertEqual([r['id'] for r in self.search('neon')], [self.street.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.street.delete()
+        self.assertEqual(self.search('neon'), [])
+
+
+# ----------------------------
+# Batch engagement
+# ----------------------------
+class BatchEngagementTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'pw')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.photos = [
+            DailyPhoto.objects.create(title=f'Photo {day}', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, day))
+            for day in range(1, 6)
+        ]
+        cls.ids = [photo.id for photo in cls.photos]
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_batch_like_save_and_status(self):
+        response = self.api.post('/api/engagement/like/', {'photo_ids': self.ids[:3] + [999999]}, format='json')
+        self.assertEqual(response.data, {'changed': self.ids[:3], 'not_found': [999999]})
+        self.assertWithinQueryBudget(response)
+        # Repeating the batch is a no-op rather than an IntegrityError
+        self.assertEqual(self.api.post('/api/engagement/like/', {'photo_ids': self.ids[:3]}, format='json').data['changed'], [])
+        self.api.post('/api/engagement/save/', {'photo_ids': [self.ids[1]]}, format='json')
+
+        response = self.api.get('/api/engagement/status/', {'photo_ids': ','.join(map(str, self.ids[:2]))})
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.data['results'], [
+            {'photo_id': self.ids[0], 'liked_by_me': True, 'saved_by_me': False},
+            {'photo_id': self.ids[1], 'liked_by_me': True, 'saved_by_me': True},
+        ])
+        self.assertEqual(DailyPhoto.objects.get(id=self.ids[0]).likes_count, 1)
+
+    def test_batch_unlike_updates_counters(self):
+        self.api.post('/api/engagement/like/', {'photo_ids': self.ids}, format='json')
+        response = self.api.post('/api/engagement/unlike/', {'photo_ids': self.ids[:2]}, format='json')
+        self.assertEqual(sorted(response.data['changed']), self.ids[:2])
+        self.assertWithinQueryBudget(response)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user, photo_id__in=self.ids[:2]).exists())
+        self.assertEqual(
+            list(DailyPhoto.objects.order_by('date_featured').values_list('likes_count', flat=True)), [0, 0, 1, 1, 1]
+        )
+
+    def test_batch_size_is_capped(self):
+        response = self.api.post('/api/engagement/like/', {'photo_ids': list(range(1, 52))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# ----------------------------
+# Idempotent like / save
+# ----------------------------
+class IdempotentWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'pw')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.photo = DailyPhoto.objects.create(title='Photo', image='x.jpg', story='s', date_featured=datetime.date(2025, 1, 1))
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_double_tap_is_a_200_not_an_error(self):
+        for path in ['/api/likes/like_photo/', '/api/savedphotos/save_photo/']:
+            with self.subTest(path=path):
+                self.assertEqual(self.api.post(path, {'photo_id': self.photo.id}).status_code, 201)
+                self.assertEqual(self.api.post(path, {'photo_id': self.photo.id}).status_code, 200)
+        self.photo.refresh_from_db()
+        self.assertEqual((self.photo.likes_count, self.photo.saves_count), (1, 1))
+
+    def test_unknown_photo_is_a_404(self):
+        self.assertEqual(self.api.post('/api/likes/like_photo/', {'photo_id': 999999}).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post('/like/999999/').status_code, 404)
+        self.assertFalse(Like.objects.exists())
+
+
+# ----------------------------
+# Cached token authentication
+# ----------------------------
+class TokenCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get('/api/auth/profile/').status_code, 200)
+
+    def test_logout_invalidates_immediately(self):
+        self.api.get('/api/auth/profile/')
+        self.assertEqual(self.api.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 401)
+
+    def test_deactivation_and_password_change_invalidate(self):
+        self.api.get('/api/auth/profile/')
+        self.user.set_password('new')
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.api.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.api.get('/api/auth/profile/').status_code, 401)
+
+    def test_logout_reaches_other_processes(self):
+        other_process = TokenCache()
+        self.api.get('/api/auth/profile/')
+        other_process.set(self.token.key, self.user, self.token)
+        self.api.post('/api/auth/logout/')
+        self.assertIsNone(other_process.get(self.token.key))
+
+    def test_a_lookup_racing_a_logout_is_not_cached(self):
+        Token.objects.filter(key=self.token.key).delete()  # the logout finished first
+        token_cache.set(self.token.key, self.user, self.token)  # the racing request caches it
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNone(TokenCache().get(self.token.key))
+
+    def test_only_auth_changes_reach_other_processes(self):
+        self.api.get('/api/auth/profile/')
+        marker = TokenCache.SHARED_PREFIX + self.token.key
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        user.bio = 'New bio'
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertIsNone(token_cache.get(self.token.key))  # this process reloads the profile
+        self.assertIsNotNone(cache.get(marker))
+
+        user.is_active = False
+        user.save()
+        self.assertIsNone(cache.get(marker))
+
+    def test_last_used_is_written_in_batches(self):
+        self.api.get('/api/auth/profile/')
+        self.api.get('/api/auth/profile/')
+        self.assertFalse(ApiTokenUsage.objects.exists())
+        self.assertEqual(token_usage.flush(), 1)
+        self.assertTrue(ApiTokenUsage.objects.filter(token=self.token).exists())
+
+    def test_login_returns_token_without_extra_lookups(self):
+        with self.assertNumQueries(2):
+            response = APIClient().post('/api/auth/login/', {'username': 'reader', 'password': 'pw'})
+        self.assertEqual(response.data, {'token': self.token.key, 'user_id': self.user.pk, 'username': 'reader'})
+
+
+# ----------------------------
+# Async read paths
+# ----------------------------
+class AsyncReadTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pw')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.photos = [
+            DailyPhoto.objects.create(title=f'Photo {day}', image='x.jpg', story='s',
+                                      date_featured=datetime.date(2025, 1, day))
+            for day in range(1, 4)
+        ]
+        for photo in cls.photos:
+            Comment.objects.create(user=cls.user, post=photo, comment_text='Nice!')
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.aclient = AsyncClient()
+
+    async def test_pages_render_on_the_async_path(self):
+        for path in ['/', f'/photo/{self.photos[1].id}/']:
+            response = await self.aclient.get(path)
+            self.assertContains(response, 'Nice!')
+            self.assertWithinQueryBudget(response)
+
+    async def test_api_reads_match_the_drf_views(self):
+        paths = ['/api/dailyphotos/?comments_preview=2', f'/api/dailyphotos/{self.photos[0].id}/',
+                 f'/api/comments/?post_id={self.photos[0].id}']
+        for path in paths:
+            with self.subTest(path=path):
+                response = await self.aclient.get(path)
+                self.assertWithinQueryBudget(response)
+                cache.clear()
+                # A token the cache has not seen yet sends the request through DRF
+                token_cache.clear()
+                drf = await self.aclient.get(path, headers={'Authorization': f'Token {self.token.key}'})
+                self.assertNotIn('Allow', response)  # DRF sets Allow; the async views do not
+                self.assertIn('Allow', drf)
+                self.assertEqual(response.json(), drf.json())
+
+    async def test_writes_still_reach_drf(self):
+        response = await self.aclient.post('/api/dailyphotos/', {})
+        self.assertEqual(response.status_code, 401)
+
+
+# ----------------------------
+# Recommendation moderation
+# ----------------------------
+class ModerationTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='suggester', password='pw')
+        cls.staff = User.objects.create_user(username='moderator', password='pw', is_staff=True)
+        cls.recs = [
+            PhotoRecommendation.objects.create(user=cls.user, title=f'Rec {i}', story='s', image_file=f'recommendations/{i}.jpg')
+            for i in range(3)
+        ]
+        PhotoRecommendation.objects.create(user=cls.staff, title='Not yours', story='s')
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def test_users_only_see_their_own_recommendations(self):
+        user_api = APIClient()
+        user_api.force_authenticate(self.user)
+        self.assertEqual(user_api.get('/api/recommendations/').json()['count'], 3)
+        self.assertEqual(user_api.get('/api/recommendations/queue/').status_code, 403)
+        self.assertEqual(self.api.get('/api/recommendations/', {'status': 'pending'}).json()['count'], 4)
+
+    def test_queue_batch_review_and_promote(self):
+        response = self.api.get('/api/recommendations/queue/', {'page_size': 2})
+        self.assertWithinQueryBudget(response)
+        self.assertEqual([r['title'] for r in response.json()['results']], ['Rec 0', 'Rec 1'])
+        self.assertEqual(len(self.api.get(response.json()['next']).json()['results']), 2)
+
+        ids = [self.recs[0].id, self.recs[1].id]
+        response = self.api.post('/api/recommendations/review/', {'ids': ids + [999], 'status': 'approved'}, format='json')
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.json(), {'reviewed': ids, 'skipped': [999]})
+        self.assertEqual(self.api.post('/api/recommendations/review/', {'ids': ids, 'status': 'rejected'},
+                                       format='json').json()['skipped'], ids)
+        self.recs[0].refresh_from_db()
+        self.assertEqual(self.recs[0].status, 'approved')
+        self.assertIsNotNone(self.recs[0].reviewed_at)
+
+        today = timezone.localdate()
+        DailyPhoto.objects.create(title='Today', image='x.jpg', story='s', date_featured=today)
+        response = self.api.post(f'/api/recommendations/{self.recs[0].id}/promote/')
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.status_code, 201)
+        photo = DailyPhoto.objects.get(pk=response.json()['id'])
+        self.assertEqual((photo.date_featured, photo.image.name, photo.author), (
+            today + datetime.timedelta(days=1), 'recommendations/0.jpg', self.user))
+        self.assertEqual(self.api.post(f'/api/recommendations/{self.recs[0].id}/promote/').status_code, 409)
+        response = self.api.post(f'/api/recommendations/{self.recs[1].id}/promote/')
+        self.assertEqual(response.json()['date_featured'], str(today + datetime.timedelta(days=2)))
+        self.assertEqual(self.api.post(f'/api/recommendations/{self.recs[2].id}/promote/').status_code, 400)
+
+
+# ----------------------------
+# Scheduled publishing
+# ----------------------------
+class ScheduledPublishingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.tomorrow = cls.today + datetime.timedelta(days=1)
+        cls.current = DailyPhoto.objects.create(title='Today', image='x.jpg', story='s', date_featured=cls.today)
+        cls.scheduled = DailyPhoto.objects.create(title='Tomorrow', image='y.jpg', story='s',
+                                                  date_featured=cls.tomorrow)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scheduled_photos_stay_hidden_until_their_date(self):
+        self.assertContains(self.client.get('/'), 'Today')
+        self.assertEqual(self.client.get(f'/photo/{self.scheduled.id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/dailyphotos/{self.scheduled.id}/').status_code, 404)
+        self.assertEqual([p['title'] for p in self.client.get('/api/dailyphotos/').json()['results']], ['Today'])
+
+        staff = User.objects.create_user(username='editor', password='pw', is_staff=True)
+        api = APIClient()
+        api.force_authenticate(staff)
+        self.assertEqual([p['title'] for p in api.get('/api/dailyphotos/scheduled/').json()['results']], ['Tomorrow'])
+        self.assertEqual(api.patch(f'/api/dailyphotos/{self.scheduled.id}/', {'story': 'new'}).status_code, 200)
+
+    def test_scheduled_photos_cannot_be_engaged_with(self):
+        user = User.objects.create_user(username='early', password='pw')
+        Comment.objects.create(user=user, post=self.scheduled, comment_text='Sneak peek')  # e.g. from the admin
+        api = APIClient()
+        api.force_authenticate(user)
+        self.assertEqual(api.post('/api/likes/like_photo/', {'photo_id': self.scheduled.id}).status_code, 404)
+        self.assertEqual(api.post('/api/savedphotos/save_photo/', {'photo_id': self.scheduled.id}).status_code, 404)
+        self.assertEqual(api.post('/api/engagement/like/', {'photo_ids': [self.scheduled.id]}, format='json').json(),
+                         {'changed': [], 'not_found': [self.scheduled.id]})
+        self.assertEqual(api.post('/api/comments/', {'post': self.scheduled.id, 'comment_text': 'Hi'}).status_code, 400)
+        self.assertEqual(api.get('/api/comments/').json()['results'], [])
+        self.client.force_login(user)
+        self.assertEqual(self.client.post(f'/like/{self.scheduled.id}/').status_code, 404)
+        self.assertFalse(Like.objects.exists() or SavedPhoto.objects.exists())
+
+        with as_of(self.tomorrow):
+            self.assertEqual(api.post('/api/likes/like_photo/', {'photo_id': self.scheduled.id}).status_code, 201)
+
+    def test_scheduler_prerenders_tomorrow(self):
+        self.client.get('/')  # today's copy is cached and must not be served tomorrow
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('publish_scheduler', '--once', stdout=out)
+        with (self.settings(PUBLIC_HOST='testserver', PUBLIC_SCHEME='http'),
+              self.assertLogs('pictale_app.renditions', 'WARNING')):  # y.jpg has no file
+            call_command('publish_scheduler', '--once', stdout=out)
+        self.assertIn(f'{self.tomorrow}: renditions for 1 photo(s), 6/6 page(s)', out.getvalue())
+        self.assertEqual(DailyPhoto.objects.get(pk=self.scheduled.pk).renditions['status'], 'failed')
+
+        with as_of(self.tomorrow), self.assertNumQueries(0):
+            home = self.client.get('/')
+            photos = self.client.get('/api/dailyphotos/', HTTP_ACCEPT='application/json')
+        self.assertContains(home, 'Tomorrow')
+        self.assertEqual(photos.json()['results'][0]['title'], 'Tomorrow')
+        self.assertTrue(photos.json()['results'][0]['image'].startswith('http://testserver/'))
+
+
+# ----------------------------
+# Personal timelines
+# ----------------------------
+class TimelineTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', password='pw')
+        cls.author = User.objects.create_user(username='author', password='pw')
+        cls.today = timezone.localdate()
+        cls.photos = [
+            DailyPhoto.objects.create(title=f'Photo {i}', image=f'{i}.jpg', story='s', author=cls.author,
+                                      date_featured=cls.today - datetime.timedelta(days=i))
+            for i in range(3)
+        ]
+        cls.other = DailyPhoto.objects.create(title='Other', image='o.jpg', story='s',
+                                              date_featured=cls.today - datetime.timedelta(days=5))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def timeline(self, **params):
+        return [(row['photo']['title'], {flag for flag in ('liked', 'saved', 'commented', 'by_author') if row[flag]})
+                for row in self.client.get('/api/timeline/', params).json()['results']]
+
+    def test_engagement_updates_the_timeline(self):
+        self.assertEqual(self.client.post('/api/engagement/like/', {'photo_ids': [self.other.id]},
+                                          format='json').status_code, 200)
+        Comment.objects.create(user=self.reader, post=self.other, comment_text='nice')
+        with self.settings(TASKS_ALWAYS_EAGER=True):  # the author's photos are added by a job
+            self.client.post('/api/engagement/save/', {'photo_ids': [self.photos[2].id]}, format='json')
+
+        self.assertEqual(self.timeline(), [
+            ('Photo 2', {'saved', 'by_author'}),
+            ('Other', {'liked', 'commented'}),
+            ('Photo 0', {'by_author'}),
+            ('Photo 1', {'by_author'}),
+        ])
+        self.assertEqual([title for title, _ in self.timeline(reason='liked')], ['Other'])
+        self.assertEqual(self.client.get('/api/timeline/', {'reason': 'nope'}).status_code, 400)
+
+        self.client.post('/api/engagement/unlike/', {'photo_ids': [self.other.id]}, format='json')
+        Comment.objects.filter(user=self.reader).delete()
+        self.assertNotIn('Other', [title for title, _ in self.timeline()])
+
+    def test_new_photo_fans_out_and_rebuild_matches(self):
+        with self.settings(TASKS_ALWAYS_EAGER=True):
+            Like.objects.create(user=self.reader, post=self.photos[1])
+            with self.assertLogs('pictale_app', 'WARNING'):  # f.jpg has no file
+                DailyPhoto.objects.create(title='Fresh', image='f.jpg', story='s', author=self.author,
+                                          date_featured=self.today + datetime.timedelta(days=1))
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader, photo__title='Fresh').count(), 1)
+        self.assertNotIn('Fresh', [title for title, _ in self.timeline()])  # not published yet
+
+        def rows():
+            return set(TimelineEntry.objects.filter(user=self.reader)
+                       .values_list('photo_id', 'liked', 'saved', 'commented', 'by_author'))
+        incremental = rows()
+        call_command('rebuild_timelines', '--user', 'reader', stdout=StringIO())
+        self.assertEqual(rows(), incremental)
+
+    def test_authors_are_followed_once_in_the_background(self):
+        add_engagement(Like, self.reader, self.photos[0].id)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 1)  # only the liked photo so far
+        follows = Job.objects.filter(task='timeline.follow_authors')
+        self.assertEqual([job.kwargs for job in follows], [{'pairs': [[self.reader.id, self.author.id]]}])
+        run_job(follows.get().pk)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader, by_author=True).count(), 3)
+
+        add_engagement(SavedPhoto, self.reader, self.photos[1].id)  # already follows the author
+        self.assertEqual(follows.count(), 1)
+
+    def test_timeline_stays_within_budget(self):
+        with self.settings(TASKS_ALWAYS_EAGER=True):
+            Like.objects.create(user=self.reader, post=self.photos[0])
+        response = self.client.get('/api/timeline/')
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertWithinQueryBudget(response)
+
+
+# ----------------------------
+# Similar photos
+# ----------------------------
+class SimilarPhotosTests(QueryBudgetTestMixin, TestCase):
+    PHOTOS = [
+        ('Harbour', 'navy', 'Fishing boats in the harbour at dawn.'),
+        ('Boats', 'navy', 'Boats leaving the harbour.'),
+        ('Desert', 'orange', 'Sand dunes in the desert.'),
+        ('Dunes', 'orange', 'Desert dunes at sunset.'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = self.settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(media, 'daily_photos'))
+        similar_index.clear()
+
+        self.today = timezone.localdate()
+        self.photos = {}
+        for day, (title, colour, story) in enumerate(self.PHOTOS):
+            name = f'daily_photos/{title.lower()}.jpg'
+            Image.new('RGB', (40, 30), colour).save(os.path.join(media, name))
+            self.photos[title] = DailyPhoto.objects.create(
+                title=title, image=name, story=story, date_featured=self.today - datetime.timedelta(days=day))
+        call_command('build_similar_photos', stdout=StringIO())
+
+    def similar(self, title, **params):
+        response = self.client.get(f'/api/dailyphotos/{self.photos[title].id}/similar/', params)
+        self.assertWithinQueryBudget(response)
+        return [photo['title'] for photo in response.json()]
+
+    def test_neighbours_match_words_and_colours(self):
+        self.assertEqual(self.similar('Harbour')[0], 'Boats')
+        self.assertEqual(self.similar('Dunes', limit=1), ['Desert'])
+        self.assertEqual(self.client.get('/api/dailyphotos/999/similar/').status_code, 404)
+
+        page = self.client.get(f"/photo/{self.photos['Boats'].id}/")
+        self.assertContains(page, 'More like this')
+        self.assertEqual(page.context['similar_photos'][0], self.photos['Harbour'])
+        self.assertWithinQueryBudget(page)
+
+    def test_new_photo_is_added_incrementally(self):
+        tomorrow = self.today + datetime.timedelta(days=1)
+        with self.settings(TASKS_ALWAYS_EAGER=True):
+            lights = DailyPhoto.objects.create(title='Harbour lights', image='daily_photos/harbour.jpg',
+                                               story='Boats in the harbour at night.', date_featured=tomorrow)
+        self.assertIn(lights.id, [pk for pk, _ in PhotoSimilarity.objects.get(pk=self.photos['Boats'].pk).neighbours])
+        self.assertNotIn('Harbour lights', self.similar('Boats'))  # not published yet
+        with as_of(tomorrow):
+            self.assertIn('Harbour lights', self.similar('Boats'))
+
+
+# ----------------------------
+# Duplicate detection
+# ----------------------------
+class FingerprintTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = self.settings(MEDIA_ROOT=media, TASKS_ALWAYS_EAGER=True)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(media, 'recommendations'))
+        fingerprint_index.clear()
+
+        self.media = media
+        self.user = User.objects.create_user(username='resubmitter', password='pw')
+        original = Image.radial_gradient('L').resize((400, 300)).convert('RGB')
+        original.paste((200, 30, 30), (50, 50, 150, 120))
+        self.save_image(original, 'recommendations/original.jpg')
+        # A smaller, heavily recompressed copy, and a different picture
+        self.save_image(original.resize((200, 150)), 'recommendations/copy.jpg', quality=40)
+        self.save_image(Image.linear_gradient('L').rotate(90).resize((400, 300)), 'recommendations/other.jpg')
+        self.photo = DailyPhoto.objects.create(title='Original', image='recommendations/original.jpg', story='s',
+                                               date_featured=datetime.date(2025, 1, 1))
+
+    def save_image(self, image, name, quality=90):
+        image.save(os.path.join(self.media, name), quality=quality)
+
+    def recommend(self, name):
+        return PhotoRecommendation.objects.create(user=self.user, title=name, story='s',
+                                                  image_file=f'recommendations/{name}.jpg')
+
+    def test_resubmissions_are_flagged_in_the_queue(self):
+        self.photo.refresh_from_db()
+        self.assertEqual(len(self.photo.fingerprint['phash']), 16)
+        copy = self.recommend('copy')
+        other = self.recommend('other')
+        again = self.recommend('copy')
+
+        copy.refresh_from_db()
+        self.assertEqual([(d['model'], d['id']) for d in copy.duplicates], [('dailyphoto', self.photo.id)])
+        self.assertLessEqual(copy.duplicates[0]['distance'], 6)
+        other.refresh_from_db()
+        self.assertEqual(other.duplicates, [])
+        again.refresh_from_db()
+        self.assertEqual([d['id'] for d in again.duplicates], sorted([self.photo.id, copy.id]))
+
+        admin = User.objects.create_user(username='moderator', password='pw', is_staff=True)
+        api = APIClient()
+        api.force_authenticate(admin)
+        queue = api.get('/api/recommendations/queue/').json()['results']
+        self.assertEqual([(row['title'], bool(row['duplicates'])) for row in queue],
+                         [('copy', True), ('other', False), ('copy', True)])
+
+        api.force_authenticate(self.user)
+        own = api.get(f'/api/recommendations/{again.id}/').json()
+        for hidden in ('duplicates', 'fingerprint', 'promoted_photo'):
+            self.assertNotIn(hidden, own)
+
+    def test_backfill_command(self):
+        PhotoRecommendation.objects.bulk_create([PhotoRecommendation(
+            user=self.user, title='copy', story='s', image_file='recommendations/copy.jpg')])
+        DailyPhoto.objects.update(fingerprint={})
+        out = StringIO()
+        call_command('fingerprint_images', stdout=out)
+        self.assertIn('DailyPhoto: fingerprinted 1 image(s)', out.getvalue())
+        self.assertIn('PhotoRecommendation: fingerprinted 1 image(s), 1 flagged', out.getvalue())
+
+
+# ----------------------------
+# Engagement analytics
+# ----------------------------
+class AnalyticsTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='analyst', password='pw', is_staff=True)
+        cls.fans = [User.objects.create_user(username=f'fan{i}', password='pw') for i in range(3)]
+        cls.today = timezone.localdate()
+        cls.yesterday = cls.today - datetime.timedelta(days=1)
+        cls.busy = DailyPhoto.objects.create(title='Busy', image='b.jpg', story='s', date_featured=cls.yesterday)
+        cls.quiet = DailyPhoto.objects.create(title='Quiet', image='q.jpg', story='s', date_featured=cls.today)
+        for fan in cls.fans:
+            Like.objects.create(user=fan, post=cls.busy)
+        Comment.objects.create(user=cls.fans[0], post=cls.busy, comment_text='!')
+        SavedPhoto.objects.create(user=cls.fans[0], post=cls.quiet)
+        # Two of the likes came in yesterday
+        noon = timezone.make_aware(datetime.datetime.combine(cls.yesterday, datetime.time(12)))
+        Like.objects.filter(user__in=cls.fans[:2]).update(created_at=noon)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        call_command('rollup_analytics', '--once', stdout=StringIO())
+
+    def get(self, path, **params):
+        response = self.client.get(f'/api/analytics/{path}/', params)
+        self.assertWithinQueryBudget(response)
+        return response.json()
+
+    def test_daily_series_and_top_photos_come_from_the_rollups(self):
+        self.assertEqual(EngagementRollup.objects.count(), 3)
+        series = self.get('daily', start=self.yesterday, end=self.today)
+        self.assertEqual([(row['likes'], row['comments'], row['saves']) for row in series], [(2, 0, 0), (1, 1, 1)])
+        self.assertEqual([row['saves'] for row in self.get('daily', photo=self.quiet.id)][-1], 1)
+        self.assertEqual(self.client.get('/api/analytics/daily/', {'start': 'soon'}).status_code, 400)
+
+        year, week, _ = self.yesterday.isocalendar()
+        top = self.get('top', week=f'{year}-W{week:02d}')['results']
+        self.assertEqual(top[0]['title'], 'Busy')
+        self.assertEqual(self.client.get('/api/analytics/top/', {'week': '2025-14'}).status_code, 400)
+        self.assertEqual(self.get('summary')['totals'], {'likes': 3, 'comments': 1, 'saves': 1})
+
+        self.client.force_authenticate(self.fans[0])
+        self.assertEqual(self.client.get('/api/analytics/summary/').status_code, 403)
+
+    def test_rerunning_a_window_is_idempotent(self):
+        Like.objects.filter(user=self.fans[2]).delete()
+        call_command('rollup_analytics', '--once', stdout=StringIO())
+        call_command('rollup_analytics', '--since', str(self.yesterday), stdout=StringIO())
+        self.assertEqual(EngagementRollup.objects.get(photo=self.busy, day=self.today).likes, 0)
+        self.assertEqual(self.get('summary')['totals']['likes'], 2)
+
+
+# ----------------------------
+# Write-behind likes
+# ----------------------------
+class WriteBehindMixin:
+    def setUp(self):
+        super().setUp()
+        self.journals = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journals)
+        write_behind = self.settings(LIKE_WRITE_BEHIND=True, LIKE_BUFFER_JOURNAL_DIR=self.journals,
+                                     LIKE_BUFFER_MAX=3, LIKE_BUFFER_INTERVAL=3600)
+        write_behind.enable()
+        self.addCleanup(write_behind.disable)
+        like_buffer.clear()
+        self.addCleanup(like_buffer.clear)
+        self.client = APIClient()
+
+
+class LikeBufferTests(WriteBehindMixin, QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'liker{i}', password='pw') for i in range(3)]
+        cls.photo = DailyPhoto.objects.create(title='Viral', image='v.jpg', story='s',
+                                              date_featured=datetime.date(2025, 1, 1))
+
+    def like(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/likes/like_photo/', {'photo_id': self.photo.id})
+        self.assertWithinQueryBudget(response)
+        return response
+
+    def test_likes_are_acknowledged_then_written_in_one_batch(self):
+        self.assertEqual(self.like(self.users[0]).status_code, 202)
+        self.assertEqual(self.like(self.users[0]).status_code, 200)  # already liked, still pending
+        self.assertEqual(Like.objects.count(), 0)
+        status = self.client.get('/api/engagement/status/', {'photo_ids': self.photo.id}).json()
+        self.assertTrue(status['results'][0]['liked_by_me'])  # the liker reads their own write
+
+        self.assertEqual(self.like(self.users[1]).status_code, 202)
+        self.assertIn(f'+ {self.users[1].id} {self.photo.id}', open(like_buffer.journal_path()).read())
+
+        self.like(self.users[2])  # the third like fills the buffer and is flushed after the response
+        self.assertEqual(Like.objects.count(), 3)
+        self.assertEqual(DailyPhoto.objects.get(pk=self.photo.pk).likes_count, 3)
+        self.assertEqual(TimelineEntry.objects.filter(photo=self.photo, liked=True).count(), 3)
+        self.assertEqual(open(like_buffer.journal_path()).read(), '')
+
+    def test_unlike_and_crash_recovery(self):
+        self.like(self.users[0])
+        self.client.post('/api/engagement/unlike/', {'photo_ids': [self.photo.id]}, format='json')
+        like_buffer.flush()
+        self.assertEqual(Like.objects.count(), 0)
+
+        # A stopped process's journal, under our own PID as after a container restart,
+        # and the journal of a process that still runs (it holds the lock)
+        orphan = os.path.join(self.journals, f'likes-{os.getpid()}-0123.journal')
+        with open(orphan, 'w') as fh:
+            fh.write(f'+ {self.users[1].id} {self.photo.id}\n+ {self.users[2].id} {self.photo.id}\n'
+                     f'- {self.users[2].id} {self.photo.id}\n+ {self.users[0].id}')
+        alive = os.path.join(self.journals, 'likes-1-4567.journal')
+        with open(alive, 'w') as fh:
+            fh.write(f'+ {self.users[2].id} {self.photo.id}\n')
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            out = StringIO()
+            call_command('flush_likes', stdout=out)
+        self.assertIn('Replayed 1 buffered like(s).', out.getvalue())
+        self.assertEqual(list(Like.objects.values_list('user_id', flat=True)), [self.users[1].id])
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(alive))
+
+    def test_later_flushes_pick_up_new_orphans(self):
+        self.like(self.users[0])
+        like_buffer.flush()
+        orphan = os.path.join(self.journals, 'likes-2-89ab.journal')  # a worker that stopped after our first flush
+        with open(orphan, 'w') as fh:
+            fh.write(f'+ {self.users[1].id} {self.photo.id}\n')
+        with self.settings(LIKE_BUFFER_ORPHAN_SCAN_INTERVAL=0):
+            like_buffer.flush()
+        self.assertEqual(Like.objects.count(), 2)
+        self.assertFalse(os.path.exists(orphan))
+
+
+class LikeBufferReadTests(WriteBehindMixin, TransactionTestCase):
+    """Cache versions move on commit, so these requests need real transactions."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'liker{i}', password='pw') for i in range(2)]
+        self.photo = DailyPhoto.objects.create(title='Viral', image='v.jpg', story='s',
+                                               date_featured=datetime.date(2025, 1, 1))
+
+    def test_the_liker_reads_their_own_likes(self):
+        self.client.get(f'/api/dailyphotos/{self.photo.id}/')  # cached before the like
+        token = Token.objects.create(user=self.users[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')  # served by the async reads too
+        self.client.post('/api/likes/like_photo/', {'photo_id': self.photo.id})
+        self.assertEqual(Like.objects.count(), 0)
+        self.assertEqual(self.client.get(f'/api/dailyphotos/{self.photo.id}/').json()['likes_count'], 1)
+        self.assertEqual(len(self.client.get('/api/timeline/', {'reason': 'liked'}).json()['results']), 1)
+
+        # Likes from the page are buffered too; the liker's next page writes them first
+        self.client.force_login(self.users[1])
+        self.assertEqual(self.client.post(f'/like/{self.photo.id}/').status_code, 302)
+        self.assertFalse(Like.objects.filter(user=self.users[1]).exists())
+        self.assertContains(self.client.get(f'/photo/{self.photo.id}/'), 'Like (2)')
+
+
+class LikeBufferTimerTests(TransactionTestCase):
+    def test_an_idle_process_still_flushes(self):
+        user = User.objects.create_user(username='idle', password='pw')
+        photo = DailyPhoto.objects.create(title='Quiet', image='q.jpg', story='s', date_featured=datetime.date(2025, 1, 1))
+        journals = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, journals)
+        with self.settings(LIKE_WRITE_BEHIND=True, LIKE_BUFFER_JOURNAL_DIR=journals, LIKE_BUFFER_INTERVAL=0.05):
+            like_buffer.add(user, photo.id)  # no request follows to trigger a flush
+            for _ in range(100):
+                if not like_buffer.pending_for(user.pk, [photo.id]):
+                    break
+                time.sleep(0.05)
+            like_buffer.clear()  # stops the flush thread
+        self.assertTrue(Like.objects.filter(user=user, post=photo).exists())
+
+
+# ----------------------------
+# Streaming exports
+# ----------------------------
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='pw')
+        cls.admin = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        cls.photo = DailyPhoto.objects.create(title='Dunes, at dawn', image='daily_photos/dunes.jpg', story='s',
+                                              date_featured=datetime.date(2025, 1, 1))
+        Comment.objects.create(user=cls.user, post=cls.photo, comment_text='first "quoted", line')
+        Comment.objects.create(user=cls.admin, post=cls.photo, comment_text='not mine')
+        Like.objects.create(user=cls.user, post=cls.photo)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_user_exports_stream_only_their_rows(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/exports/comments/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['comment_text'] for row in rows], ['first "quoted", line'])
+
+        response = self.client.get('/api/exports/likes/', {'type': 'csv'})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['photo_id', 'photo_title', 'created_at'])
+        self.assertEqual(rows[1][:2], [str(self.photo.pk), 'Dunes, at dawn'])
+        self.assertEqual(self.client.get('/api/exports/likes/', {'type': 'xml'}).status_code, 400)
+
+    def test_archive_is_admin_only_and_zips_tables_and_images(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/exports/archive/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            os.makedirs(os.path.join(media, 'daily_photos'))
+            with open(os.path.join(media, 'daily_photos', 'dunes.jpg'), 'wb') as fh:
+                fh.write(b'jpeg' * 50000)
+            response = self.client.get('/api/exports/archive/', {'type': 'zip'})
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()), [
+            'comments.ndjson', 'images/daily_photos/dunes.jpg', 'likes.ndjson', 'photos.ndjson', 'saved_photos.ndjson',
+        ])
+        self.assertEqual(len(archive.read('images/daily_photos/dunes.jpg')), 200000)
+        self.assertEqual(len(archive.read('comments.ndjson').splitlines()), 2)
+
+        response = self.client.get('/api/exports/archive/')
+        types = [json.loads(line)['type'] for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(types, ['photos', 'comments', 'comments', 'likes'])
+
+
+# ----------------------------
+# Bulk import
+# ----------------------------
+class ImportPhotosTests(TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, media)
+        media_root = self.settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        for day in range(1, 4):
+            Image.new('RGB', (40, 30), 'navy').save(os.path.join(self.source, f'2020-01-0{day}_Day_{day}.jpg'))
+
+    def write_manifest(self, rows):
+        path = os.path.join(self.source, 'manifest.csv')
+        with open(path, 'w', newline='') as fh:
+            writer = csv.DictWriter(fh, ['image', 'date_featured', 'title', 'story'])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_directory_import_and_resume(self):
+        out = StringIO()
+        call_command('import_photos', self.source, '--workers', '2', '--batch-size', '2', stdout=out)
+        self.assertIn('Imported 3 photo(s)', out.getvalue())
+        self.assertIn('now run: manage.py fingerprint_images, manage.py build_similar_photos', out.getvalue())
+        photo = DailyPhoto.objects.get(date_featured=datetime.date(2020, 1, 2))
+        self.assertEqual((photo.title, photo.image.name), ('Day 2', 'daily_photos/imported/2020-01-02.jpg'))
+        self.assertEqual(photo.renditions['status'], 'done')
+        self.assertEqual(self.client.get('/api/dailyphotos/', {'search': 'day'}).json()['count'], 3)
+
+        out = StringIO()
+        call_command('import_photos', self.source, stdout=out)
+        self.assertIn('0 to import, 3 already imported', out.getvalue())
+
+    def test_problems_stop_the_import_before_any_write(self):
+        DailyPhoto.objects.create(title='Taken', image='x.jpg', story='s', date_featured=datetime.date(2020, 1, 1))
+        manifest = self.write_manifest([
+            {'image': '2020-01-01_Day_1.jpg', 'date_featured': '2020-01-01', 'title': 'One', 'story': ''},
+            {'image': '2020-01-02_Day_2.jpg', 'date_featured': '2020-01-02', 'title': 'Two', 'story': ''},
+            {'image': '2020-01-03_Day_3.jpg', 'date_featured': '2020-01-02', 'title': 'Dup', 'story': ''},
+            {'image': 'missing.jpg', 'date_featured': 'someday', 'title': 'Bad', 'story': ''},
+        ])
+        err = StringIO()
+        with self.assertRaisesMessage(CommandError, '3 problem(s)'):
+            call_command('import_photos', manifest, '--workers', '0', stderr=err)
+        self.assertIn('line 5: date_featured must be YYYY-MM-DD', err.getvalue())
+        self.assertEqual(DailyPhoto.objects.count(), 1)
+
+    def test_unreadable_manifests_are_command_errors(self):
+        broken = os.path.join(self.source, 'manifest.json')
+        with open(broken, 'w') as fh:
+            fh.write('[{"image": "2020-01-01_Day_1.jpg",')
+        with self.assertRaisesMessage(CommandError, 'manifest.json is not valid JSON'):
+            call_command('import_photos', broken)
+        with open(broken, 'w') as fh:
+            fh.write('{"image": "2020-01-01_Day_1.jpg"}')
+        with self.assertRaisesMessage(CommandError, 'must hold a JSON list'):
+            call_command('import_photos', broken)
+        with self.assertRaisesMessage(CommandError, 'Could not read'):
+            call_command('import_photos', os.path.join(self.source, 'missing.csv'))
+
+    def test_non_text_manifest_fields_are_problems(self):
+        manifest = os.path.join(self.source, 'manifest.json')
+        with open(manifest, 'w') as fh:
+            json.dump([
+                {'image': '2020-01-01_Day_1.jpg', 'date_featured': 20200101, 'title': 'One'},
+                {'image': '2020-01-02_Day_2.jpg', 'date_featured': '2020-01-02', 'title': 5},
+                {'image': '2020-01-03_Day_3.jpg', 'date_featured': '2020-02-30'},
+            ], fh)
+        err = StringIO()
+        with self.assertRaisesMessage(CommandError, '3 problem(s)'):
+            call_command('import_photos', manifest, stderr=err)
+        self.assertIn('entry 0: date_featured must be text', err.getvalue())
+        self.assertIn('entry 1: title must be text', err.getvalue())
+        self.assertIn('entry 2: date_featured must be YYYY-MM-DD', err.getvalue())
+
+
+# ----------------------------
+# SQLite profile
+# ----------------------------
+class SQLiteProfileTests(TestCase):
+    def test_connection_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+    def test_replica_reads_are_scoped_to_the_request(self):
+        router = ReadReplicaRouter()
+        with read_from_replica():
+            self.assertTrue(_use_replica.get())
+            self.assertIsNone(router.db_for_read(DailyPhoto))  # no replica configured
+            self.assertEqual(router.db_for_write(DailyPhoto), 'default')
+        self.assertFalse(_use_replica.get())
+        APIClient().get('/api/dailyphotos/?search=light')  # served by DRF
+        self.assertFalse(_use_replica.get())
+
+    def test_writes_pin_reads_to_the_primary(self):
+        cache.clear()
+        replica = {**connection.settings_dict, 'TEST': {'MIRROR': 'default'}}
+        with mock.patch.dict(settings.DATABASES, {REPLICA: replica}), self.settings(REPLICA_LAG_SECONDS=5):
+            with read_from_replica():
+                self.assertTrue(_use_replica.get())
+            with self.captureOnCommitCallbacks(execute=True):
+                bump('similar', 'fingerprints', 'analytics')  # index rebuilds and rollups
+            with read_from_replica():
+                self.assertTrue(_use_replica.get())
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_photo(1)  # a cached scope changed
+            with read_from_replica():
+                self.assertFalse(_use_replica.get())
+            cache.delete(PIN_KEY)  # the lag window has passed
+            with read_from_replica():
+                self.assertTrue(_use_replica.get())
+
+
+# ----------------------------
+# Benchmark suite
+# ----------------------------
+class BenchmarkTests(TestCase):
+    def test_seeded_data_is_long_tailed_and_consistent(self):
+        created = seed_benchmark_data(users=50, photos=40, seed=7, likes_per_user=5)
+        self.assertEqual((created['users'], created['photos']), (50, 40))
+        likes = list(DailyPhoto.objects.order_by('-likes_count').values_list('likes_count', flat=True))
+        self.assertEqual(sum(likes), Like.objects.count())
+        self.assertGreater(likes[0], 3 * likes[len(likes) // 2])  # a few popular photos, a long tail
+        out = StringIO()
+        call_command('repair_engagement_counts', '--dry-run', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {'view /': {'p95_ms': 10.0, 'queries_per_request': 3, 'bytes_per_response': 100}}}
+        same = {'results': {'view /': {'p95_ms': 11.0, 'queries_per_request': 3, 'bytes_per_response': 100}}}
+        worse = {'results': {'view /': {'p95_ms': 20.0, 'queries_per_request': 5, 'bytes_per_response': 100}}}
+        self.assertEqual(compare_reports(same, baseline), [])
+        self.assertEqual(len(compare_reports(worse, baseline)), 2)
+
+    def test_hot_access_patterns_use_indexes(self):
+        out = StringIO()
+        call_command('explain_queries', '--fail', stdout=out)
+        self.assertNotIn('!', out.getvalue())
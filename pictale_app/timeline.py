@@ -0,0 +1,163 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import DailyPhoto, Comment, Like, SavedPhoto, TimelineEntry
+from .tasks import enqueue, task
+
+# ----------------------------
+# Personal timelines
+# ----------------------------
+# TimelineEntry rows are written as users engage (engagement.py for likes and
+# saves, signals.py for model saves and deletes) and recomputed in batch by
+# `manage.py rebuild_timelines`. The first engagement with an author's photo
+# also adds that author's latest photos, in a background job so the engagement
+# itself stays a single upsert; a new photo is fanned out to everyone who
+# engages with its author. An author stays on a timeline until the next rebuild.
+ENGAGEMENT_MODELS = (Like, SavedPhoto, Comment)
+FLAGS = ('liked', 'saved', 'commented', 'by_author')
+AUTHOR_PHOTOS = 100  # latest photos per author added when a user starts engaging
+FAN_OUT_BATCH = 1000
+
+
+def published_at(date_featured):
+    """When a photo goes out: midnight of its date_featured in the site time zone."""
+    return timezone.make_aware(datetime.datetime.combine(date_featured, datetime.time.min))
+
+
+def _author_photos(author_ids):
+    """
+    {author_id: [(photo_id, date_featured)]}, the latest AUTHOR_PHOTOS each.
+    author_ids can be a subquery.
+    """
+    photos = defaultdict(list)
+    rows = (DailyPhoto.objects.filter(author_id__in=author_ids).order_by('author_id', '-date_featured')
+            .values_list('author_id', 'id', 'date_featured'))
+    for author_id, photo_id, date_featured in rows.iterator():
+        if len(photos[author_id]) < AUTHOR_PHOTOS:
+            photos[author_id].append((photo_id, date_featured))
+    return photos
+
+
+# ----------------------------
+# Incremental updates
+# ----------------------------
+def record(model, user_id, photo_ids, at=None):
+    """The user engaged with these photos: set the model's flag and move them to the top."""
+    at = at or timezone.now()
+    flag = model.timeline_flag
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, photo_id=photo_id, activity_at=at, **{flag: True}) for photo_id in photo_ids],
+        update_conflicts=True, unique_fields=['user', 'photo'], update_fields=[flag, 'activity_at'],
+    )
+    schedule_follow(user_id, photo_ids)
+
+
+def record_many(model, pairs, at=None):
+    """record() for many (user_id, photo_id) pairs in a fixed number of queries (batched writes)."""
+    at = at or timezone.now()
+    flag = model.timeline_flag
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, photo_id=photo_id, activity_at=at, **{flag: True})
+         for user_id, photo_id in pairs],
+        update_conflicts=True, unique_fields=['user', 'photo'], update_fields=[flag, 'activity_at'],
+        batch_size=FAN_OUT_BATCH,
+    )
+    authors = dict(DailyPhoto.objects.filter(id__in={photo_id for _, photo_id in pairs}, author__isnull=False)
+                   .values_list('id', 'author_id'))
+    engaged = {(user_id, authors[photo_id]) for user_id, photo_id in pairs
+               if photo_id in authors and authors[photo_id] != user_id}
+    if not engaged:
+        return
+    followed = set(TimelineEntry.objects.filter(user_id__in={user_id for user_id, _ in engaged}, by_author=True,
+                                                photo__author_id__in={author_id for _, author_id in engaged})
+                   .values_list('user_id', 'photo__author_id').distinct())
+    new = engaged - followed
+    if new:
+        enqueue('timeline.follow_authors', pairs=sorted(new))
+
+
+def schedule_follow(user_id, photo_ids):
+    """Queue follow_authors for the authors of these photos the user doesn't follow yet (one query)."""
+    followed = TimelineEntry.objects.filter(user_id=user_id, by_author=True).values('photo__author_id')
+    new = list(DailyPhoto.objects.filter(id__in=photo_ids, author__isnull=False).exclude(author_id=user_id)
+               .exclude(author_id__in=followed).values_list('author_id', flat=True).distinct())
+    if new:
+        enqueue('timeline.follow_authors', pairs=[[user_id, author_id] for author_id in new])
+
+
+@task('timeline.follow_authors')
+def follow_authors(pairs):
+    """Add the latest photos of each (user_id, author_id) pair's author to that user's timeline."""
+    photos = _author_photos({author_id for _, author_id in pairs})
+    entries = [
+        TimelineEntry(user_id=user_id, photo_id=photo_id, by_author=True, activity_at=published_at(day))
+        for user_id, author_id in pairs for photo_id, day in photos[author_id]
+    ]
+    TimelineEntry.objects.bulk_create(entries, update_conflicts=True, unique_fields=['user', 'photo'],
+                                      update_fields=['by_author'], batch_size=FAN_OUT_BATCH)
+
+
+def forget(model, user_id, photo_ids):
+    """The user no longer has this engagement: clear the flag, drop rows with none left."""
+    rows = TimelineEntry.objects.filter(user_id=user_id, photo_id__in=photo_ids)
+    rows.update(**{model.timeline_flag: False})
+    rows.filter(**{flag: False for flag in FLAGS}).delete()
+
+
+@task('timeline.fan_out')
+def fan_out(photo_id):
+    """Put a new photo on the timeline of everyone who engages with its author."""
+    photo = DailyPhoto.objects.filter(pk=photo_id).only('author_id', 'date_featured').first()
+    if photo is None or photo.author_id is None:
+        return
+    followers = set()
+    for model in ENGAGEMENT_MODELS:
+        followers.update(model.objects.filter(post__author_id=photo.author_id)
+                         .exclude(user_id=photo.author_id).values_list('user_id', flat=True).distinct())
+    at = published_at(photo.date_featured)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, photo_id=photo_id, by_author=True, activity_at=at) for user_id in followers],
+        update_conflicts=True, unique_fields=['user', 'photo'], update_fields=['by_author'],
+        batch_size=FAN_OUT_BATCH,
+    )
+
+
+def schedule_fan_out(photo):
+    enqueue('timeline.fan_out', photo_id=photo.pk)
+
+
+# ----------------------------
+# Batch rebuild
+# ----------------------------
+def rebuild(user_ids):
+    """Recompute the timelines of `user_ids` from scratch. Returns the rows written."""
+    entries = {}
+    authors_of = defaultdict(set)
+    for model in ENGAGEMENT_MODELS:
+        timestamp = next(f.name for f in model._meta.concrete_fields if getattr(f, 'auto_now_add', False))
+        rows = (model.objects.filter(user_id__in=user_ids).values('user_id', 'post_id', 'post__author_id')
+                .annotate(at=Max(timestamp)).order_by())
+        for row in rows.iterator():
+            key = (row['user_id'], row['post_id'])
+            entry = entries.setdefault(key, TimelineEntry(user_id=key[0], photo_id=key[1], activity_at=row['at']))
+            setattr(entry, model.timeline_flag, True)
+            entry.activity_at = max(entry.activity_at, row['at'])
+            if row['post__author_id'] not in (None, row['user_id']):
+                authors_of[row['user_id']].add(row['post__author_id'])
+
+    photos = _author_photos(set().union(*authors_of.values()))
+    for user_id, author_ids in authors_of.items():
+        for author_id in author_ids:
+            for photo_id, day in photos[author_id]:
+                entry = entries.setdefault(
+                    (user_id, photo_id), TimelineEntry(user_id=user_id, photo_id=photo_id, activity_at=published_at(day)))
+                entry.by_author = True
+
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+        TimelineEntry.objects.bulk_create(entries.values(), batch_size=FAN_OUT_BATCH)
+    return len(entries)
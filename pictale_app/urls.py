@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from pictale_app.views import frontend_views
-from .views import api_views
+from .views import api_views, async_api
 from .views.auth import RegisterAPIView, CustomObtainAuthToken, LogoutAPIView, ProfileAPIView
 
 router = DefaultRouter()
@@ -10,9 +10,16 @@ router.register(r'comments', api_views.CommentViewSet, basename='comment')
 router.register(r'likes', api_views.LikeViewSet)
 router.register(r'savedphotos', api_views.SavedPhotoViewSet)
 router.register(r'recommendations', api_views.PhotoRecommendationViewSet)
+router.register(r'engagement', api_views.EngagementViewSet, basename='engagement')
+router.register(r'exports', api_views.ExportViewSet, basename='export')
+router.register(r'timeline', api_views.TimelineViewSet, basename='timeline')
+router.register(r'analytics', api_views.AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
-    # API routes
+    # API routes; the hottest reads are served by async views first (see views.async_api)
+    path('dailyphotos/', async_api.dailyphoto_list),
+    path('dailyphotos/<int:pk>/', async_api.dailyphoto_detail),
+    path('comments/', async_api.comment_list),
     path('', include(router.urls)),
     path('auth/register/', RegisterAPIView.as_view(), name='register'),
     path('auth/login/', CustomObtainAuthToken.as_view(), name='login'),
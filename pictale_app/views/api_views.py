@@ -1,61 +1,200 @@
-from rest_framework import viewsets, permissions, status, filters
+import datetime
+
+from rest_framework import mixins, viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from ..models import DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation
+from rest_framework.exceptions import ValidationError
+from django.http import Http404
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from ..models import DailyPhoto, Comment, Like, SavedPhoto, PhotoRecommendation, TimelineEntry
 from pictale_app.permissions import IsAuthorOrReadOnly
-from rest_framework.pagination import PageNumberPagination
+from pictale_app.pagination import (
+    DailyPhotoPagination, DailyPhotoPageNumberPagination, CommentPagination, LikePagination,
+    RecommendationQueuePagination, TimelinePagination,
+)
+from pictale_app.search import FullTextSearchFilter
+from pictale_app.routers import ReplicaReadsMixin
+from pictale_app.publishing import publishing_date
+from pictale_app.caching import (
+    cache_entry_key, get_entry, set_entry, not_modified, set_validators, relevant_params, timestamp
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
+from pictale_app.engagement import add_engagement, engagement_status, bulk_add, bulk_remove
+from pictale_app import analytics, exports, moderation, similar, timeline
+from pictale_app.similar import similar_index
+from pictale_app.likebuffer import like_buffer, OwnLikesFlushedMixin
 from ..serializers import (
     DailyPhotoSerializer, CommentSerializer, LikeSerializer, 
-    SavedPhotoSerializer, PhotoRecommendationSerializer
+    SavedPhotoSerializer, PhotoRecommendationSerializer, PhotoIdsSerializer, RecommendationReviewSerializer,
+    RecommendationModerationSerializer, TimelineEntrySerializer,
 )
 
 # ----------------------------
 # DailyPhoto API
 # ----------------------------
 
-class DailyPhotoPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 50
+COMMENTS_PREVIEW_MAX = 5
+SIMILAR_DEFAULT = 6
 
-class DailyPhotoViewSet(viewsets.ModelViewSet):
+
+class DailyPhotoViewSet(ReplicaReadsMixin, OwnLikesFlushedMixin, viewsets.ModelViewSet):
     """
     CRUD for DailyPhoto.
     Anyone can read photos. Only authors or admins can update/delete.
     Logged-in users can create photos.
+    List/retrieve return counts only; add ?comments_preview=N (max 5) for the latest comments.
+    Full comment and like lists are paginated under /dailyphotos/{id}/comments/ and /likes/.
+    Add ?pagination=cursor for keyset pagination (opaque next/previous cursors, no count).
+    List and retrieve are cached per query and answer conditional GETs (ETag/Last-Modified).
+    Photos appear on their date_featured (site time zone); admins list upcoming ones under scheduled/.
+    /dailyphotos/{id}/similar/?limit=N lists the photos most like this one from the precomputed index.
     """
     queryset = DailyPhoto.objects.all().order_by('-date_featured')
     serializer_class = DailyPhotoSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     pagination_class = DailyPhotoPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filterset_fields = ['date_featured', 'author__username']  # exact match filters
-    search_fields = ['title', 'story']  # partial match search
+    # ?search= is ranked full-text search over title and story (see pictale_app.search)
+    query_budgets = {'list': 4, 'retrieve': 3, 'comments': 4, 'likes': 4, 'similar': 2, 'scheduled': 3, 'default': 6}
+    replica_actions = ('list', 'retrieve', 'comments', 'likes', 'similar')
+    # Reads that only see photos whose date_featured has come
+    published_actions = ('list', 'retrieve', 'comments', 'likes', 'similar')
+    # Query parameters that change the list/retrieve payload, and so the cache key
+    cache_params = [
+        'page', 'page_size', 'pagination', 'cursor', 'comments_preview',
+        'date_featured', 'author__username', 'search',
+    ]
+
+    def get_comments_preview(self):
+        try:
+            preview = int(self.request.query_params.get('comments_preview', 0))
+        except ValueError:
+            return 0
+        return max(0, min(preview, COMMENTS_PREVIEW_MAX))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.published_actions:
+            queryset = queryset.published()  # authors and admins can still edit scheduled ones
+        preview = self.get_comments_preview()
+        if preview and self.action in ('list', 'retrieve'):
+            # Sliced prefetch: one windowed query for the whole page
+            latest = Comment.objects.select_related('user').order_by('-created_at', '-id')[:preview]
+            queryset = queryset.prefetch_related(Prefetch('comments', queryset=latest, to_attr='latest_comments'))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['comments_preview'] = self.get_comments_preview()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(['feed'], lambda: super(DailyPhotoViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        scopes = [f"photo:{kwargs['pk']}"]
+        return self.cached_response(scopes, lambda: super(DailyPhotoViewSet, self).retrieve(request, *args, **kwargs))
+
+    def cache_key(self, scopes):
+        """(key, ETag) of this action's cached payload; shared with pictale_app.views.async_api."""
+        params = relevant_params(self.request, self.cache_params)
+        params['format'] = self.request.accepted_renderer.format
+        return cache_entry_key(f'dailyphoto-{self.action}', scopes, params, self.request)
+
+    @staticmethod
+    def cache_entry(data):
+        photos = data.get('results', [data])
+        updated = [parse_datetime(photo['updated_at']) for photo in photos if photo.get('updated_at')]
+        return {'data': data, 'last_modified': timestamp(max(updated, default=None))}
+
+    def cached_response(self, scopes, build):
+        """Serve serialized data from the versioned response cache (see pictale_app.caching)."""
+        key, etag = self.cache_key(scopes)
+        entry = get_entry(key)
+        if entry is None:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self.cache_entry(response.data)
+            set_entry(key, entry)
+        else:
+            response = Response(entry['data'])
+        return not_modified(self.request, etag, entry['last_modified']) or set_validators(
+            response, etag, entry['last_modified'])
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def paginated_response(self, queryset, paginator, serializer_class):
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def scheduled(self, request):
+        """Photos waiting for their date_featured, soonest first."""
+        queryset = DailyPhoto.objects.filter(date_featured__gt=publishing_date()).order_by('date_featured')
+        return self.paginated_response(queryset, DailyPhotoPageNumberPagination(), DailyPhotoSerializer)
+
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        photo = self.get_object()
+        queryset = photo.comments.select_related('user').order_by('-created_at', '-id')
+        return self.paginated_response(queryset, CommentPagination(), CommentSerializer)
+
+    @action(detail=True, methods=['get'])
+    def likes(self, request, pk=None):
+        photo = self.get_object()
+        queryset = photo.likes.select_related('user').order_by('-created_at', '-id')
+        return self.paginated_response(queryset, LikePagination(), LikeSerializer)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Up to ?limit= (default 6) photos most like this one, best match first; no pagination."""
+        if not pk.isdigit():
+            raise Http404
+        photo_id = int(pk)
+        try:
+            limit = int(request.query_params.get('limit', SIMILAR_DEFAULT))
+        except ValueError:
+            raise ValidationError({'limit': "Must be an integer."})
+        limit = max(1, min(limit, similar.NEIGHBOURS))
+        ids = similar_index.neighbours(photo_id)
+        # The photo and its neighbours in one query; unpublished neighbours drop out
+        photos = self.get_queryset().in_bulk([photo_id, *ids])
+        if photo_id not in photos:
+            raise Http404
+        results = [photos[i] for i in ids if i in photos][:limit]
+        return Response(self.get_serializer(results, many=True).data)
+
 
 # ----------------------------
 # Comment API
 # ----------------------------
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     CRUD for Comment.
     Anyone can read comments.
     Only authors or admins can update/delete.
     Logged-in users can create comments. Automatically assigns request.user as author.
     Supports filtering by photo via ?post_id=<id>
+    Add ?pagination=cursor for keyset pagination on (-created_at, -id).
+    Only comments on published photos are listed, and only those can be commented on.
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CommentPagination
+    # Moving a comment to another photo updates both photos' counters and timelines
+    query_budgets = {'list': 3, 'retrieve': 2, 'update': 13, 'partial_update': 13, 'default': 8}
+    replica_actions = ('list', 'retrieve')
 
     def get_queryset(self):
-        queryset = Comment.objects.all().order_by('-created_at')
+        queryset = (Comment.objects.filter(post__date_featured__lte=publishing_date())
+                    .select_related('user').order_by('-created_at', '-id'))
         post_id = self.request.query_params.get('post_id')
         if post_id:
             queryset = queryset.filter(post_id=post_id)
@@ -65,34 +204,61 @@ class CommentViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
+# ----------------------------
+# Like / Save helpers
+# ----------------------------
+def get_photo_id(request):
+    """The integer photo_id from the request body, or None if missing or malformed."""
+    try:
+        return int(request.data.get('photo_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def add_engagement_or_404(model, user, photo_id):
+    try:
+        return add_engagement(model, user, photo_id)
+    except DailyPhoto.DoesNotExist:
+        raise Http404("No DailyPhoto matches the given query.")
+
+
 # ----------------------------
 # Like API
 # ----------------------------
-class LikeViewSet(viewsets.ModelViewSet):
+class LikeViewSet(OwnLikesFlushedMixin, viewsets.ModelViewSet):
     """
     CRUD for Like.
     Only authenticated users can create likes.
     Prevents duplicate likes.
+    With LIKE_WRITE_BEHIND, like_photo answers 202 once the like is buffered;
+    the row is written with the next batch, or before the liker's next read of
+    photos, likes or their timeline (see pictale_app.likebuffer).
     """
-    queryset = Like.objects.all()
+    queryset = Like.objects.select_related('user').order_by('-created_at')
     serializer_class = LikeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 3, 'retrieve': 2, 'like_photo': 9, 'default': 5}
 
     @action(detail=False, methods=['post'])
     def like_photo(self, request):
-        user = request.user
-        photo_id = request.data.get('photo_id')
-        if not photo_id:
+        photo_id = get_photo_id(request)
+        if photo_id is None:
             return Response({"error": "photo_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Validate photo exists
-        photo = get_object_or_404(DailyPhoto, id=photo_id)
+        if like_buffer.enabled:
+            try:
+                created = like_buffer.add(request.user, photo_id)
+            except DailyPhoto.DoesNotExist:
+                raise Http404("No DailyPhoto matches the given query.")
+            if not created:
+                return Response({"message": "You have already liked this photo."}, status=status.HTTP_200_OK)
+            return Response({"message": "Like recorded.", "photo_id": photo_id}, status=status.HTTP_202_ACCEPTED)
 
-        # Check if the like already exists
-        if Like.objects.filter(user=user, post=photo).exists():
+        # One idempotent insert; no exists() check to race against
+        like, created = add_engagement_or_404(Like, request.user, photo_id)
+        if not created:
             return Response({"message": "You have already liked this photo."}, status=status.HTTP_200_OK)
 
-        like = Like.objects.create(user=user, post=photo)
         serializer = self.get_serializer(like)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -106,41 +272,286 @@ class SavedPhotoViewSet(viewsets.ModelViewSet):
     Only authenticated users can save photos.
     Prevents duplicate saves.
     """
-    queryset = SavedPhoto.objects.all()
+    queryset = SavedPhoto.objects.select_related('user', 'post__author').order_by('-saved_at')
     serializer_class = SavedPhotoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 3, 'retrieve': 2, 'save_photo': 10, 'default': 5}
 
     @action(detail=False, methods=['post'])
     def save_photo(self, request):
-        user = request.user
-        photo_id = request.data.get('photo_id')
-        if not photo_id:
+        photo_id = get_photo_id(request)
+        if photo_id is None:
             return Response({"error": "photo_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Validate photo exists
-        photo = get_object_or_404(DailyPhoto, id=photo_id)
-
-        # Check if already saved
-        if SavedPhoto.objects.filter(user=user, post=photo).exists():
+        # One idempotent insert; no exists() check to race against
+        saved, created = add_engagement_or_404(SavedPhoto, request.user, photo_id)
+        if not created:
             return Response({"message": "Photo already saved."}, status=status.HTTP_200_OK)
 
-        saved = SavedPhoto.objects.create(user=user, post=photo)
         serializer = self.get_serializer(saved)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+# ----------------------------
+# Batch engagement API
+# ----------------------------
+class EngagementViewSet(viewsets.ViewSet):
+    """
+    Batch likes and saves for a page of photos (up to 50 ids per call).
+    GET  status/?photo_ids=1,2,3  -> liked_by_me / saved_by_me per photo
+    POST like/ unlike/ save/ unsave/ with {"photo_ids": [1, 2, 3]}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # Removals run each row's post_delete (counter, timeline): 3 queries per photo,
+    # so the unlike/unsave budgets cover a page of 5
+    query_budgets = {'status': 3, 'like': 10, 'save': 10, 'unlike': 20, 'unsave': 20, 'default': 10}
+
+    def get_photo_ids(self, data):
+        serializer = PhotoIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['photo_ids']
+
+    @action(detail=False, methods=['get'])
+    def status(self, request):
+        raw = request.query_params.get('photo_ids', '')
+        photo_ids = self.get_photo_ids({'photo_ids': [part for part in raw.split(',') if part]})
+        flags = engagement_status(request.user, photo_ids)
+        return Response({'results': [{'photo_id': photo_id, **flags[photo_id]} for photo_id in photo_ids]})
+
+    def add(self, request, model):
+        created, missing = bulk_add(model, request.user, self.get_photo_ids(request.data))
+        return Response({'changed': created, 'not_found': missing})
+
+    def remove(self, request, model):
+        removed = bulk_remove(model, request.user, self.get_photo_ids(request.data))
+        return Response({'changed': removed})
+
+    @action(detail=False, methods=['post'])
+    def like(self, request):
+        return self.add(request, Like)
+
+    @action(detail=False, methods=['post'])
+    def unlike(self, request):
+        return self.remove(request, Like)
+
+    @action(detail=False, methods=['post'])
+    def save(self, request):
+        return self.add(request, SavedPhoto)
+
+    @action(detail=False, methods=['post'])
+    def unsave(self, request):
+        return self.remove(request, SavedPhoto)
+
+
+# ----------------------------
+# Personal timeline API
+# ----------------------------
+class TimelineViewSet(OwnLikesFlushedMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Your timeline, newest activity first: photos you liked, saved or commented
+    on, and photos by authors you engage with. Cursor-paginated.
+    Narrow it with ?reason=liked|saved|commented|by_author.
+    """
+    serializer_class = TimelineEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimelinePagination
+    query_budgets = {'list': 2}
+
+    def get_queryset(self):
+        queryset = (TimelineEntry.objects.filter(user=self.request.user, photo__date_featured__lte=publishing_date())
+                    .select_related('photo'))
+        reason = self.request.query_params.get('reason')
+        if reason:
+            if reason not in timeline.FLAGS:
+                raise ValidationError({'reason': f"Choose one of: {', '.join(timeline.FLAGS)}."})
+            queryset = queryset.filter(**{reason: True})
+        return queryset
+
+
+# ----------------------------
+# Analytics API
+# ----------------------------
+class AnalyticsViewSet(ReplicaReadsMixin, viewsets.ViewSet):
+    """
+    Admins: engagement read from the daily rollups (see pictale_app.analytics),
+    never from the raw like/comment/save tables.
+    GET daily/?start=&end=&photo=   likes, comments and saves per day (default: the last 30 days)
+    GET top/?week=2025-W14          the busiest photos of an ISO week (default: this week), ?limit= up to 50
+    GET summary/                    dashboard: 30-day series, 7-day moving averages, totals, top photos
+    """
+    permission_classes = [permissions.IsAdminUser]
+    query_budgets = {'daily': 1, 'top': 1, 'summary': 2}
+    replica_actions = ('daily', 'top', 'summary')
+
+    def get_date(self, name, default):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Use YYYY-MM-DD."})
+        return day
+
+    @action(detail=False, methods=['get'])
+    def daily(self, request):
+        today = timezone.localdate()
+        end = self.get_date('end', today)
+        start = self.get_date('start', end - datetime.timedelta(days=analytics.SUMMARY_DAYS - 1))
+        if not 0 <= (end - start).days < analytics.MAX_RANGE_DAYS:
+            raise ValidationError({'start': f"Must be before end, at most {analytics.MAX_RANGE_DAYS} days apart."})
+        photo = request.query_params.get('photo')
+        if photo is not None and not photo.isdigit():
+            raise ValidationError({'photo': "Must be a photo id."})
+        return Response(analytics.daily_series(start, end, int(photo) if photo else None))
+
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        week = request.query_params.get('week')
+        if week is None:
+            today = timezone.localdate()
+            start = today - datetime.timedelta(days=today.weekday())
+        else:
+            try:
+                start = datetime.datetime.strptime(f'{week}-1', '%G-W%V-%u').date()
+            except ValueError:
+                raise ValidationError({'week': "Use an ISO week, e.g. 2025-W14."})
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', analytics.TOP_PHOTOS)), 50))
+        except ValueError:
+            raise ValidationError({'limit': "Must be an integer."})
+        end = start + datetime.timedelta(days=6)
+        return Response({'start': start, 'end': end, 'results': analytics.top_photos(start, end, limit)})
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        return Response(analytics.summary())
+
+
+# ----------------------------
+# Export API
+# ----------------------------
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Streamed downloads; memory use stays flat however large the export.
+    GET saved/ comments/ likes/  your own activity, ?type=ndjson (default) or csv
+    GET archive/                 admins only: every photo, comment, like and save as
+                                 NDJSON, or ?type=zip for one file per table plus the
+                                 images (add &images=0 to leave them out)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # Rows are read while the response streams, after the view has returned
+    query_budgets = {'default': 2}
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8',
+        'zip': 'application/zip',
+    }
+
+    def get_type(self, allowed):
+        export_type = self.request.query_params.get('type', 'ndjson')
+        if export_type not in allowed:
+            raise ValidationError({'type': f"Choose one of: {', '.join(allowed)}."})
+        return export_type
+
+    def user_export(self, request, name):
+        export_type = self.get_type(['ndjson', 'csv'])
+        header, rows = exports.export_rows(exports.USER_EXPORTS[name], user=request.user)
+        lines = exports.csv_lines(header, rows) if export_type == 'csv' else exports.ndjson_lines(header, rows)
+        return exports.streaming_response(
+            request, exports.buffered(lines), self.content_types[export_type],
+            f'pictale-{name}-{request.user.username}.{export_type}')
+
+    @action(detail=False, methods=['get'])
+    def saved(self, request):
+        return self.user_export(request, 'saved')
+
+    @action(detail=False, methods=['get'])
+    def comments(self, request):
+        return self.user_export(request, 'comments')
+
+    @action(detail=False, methods=['get'])
+    def likes(self, request):
+        return self.user_export(request, 'likes')
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def archive(self, request):
+        export_type = self.get_type(['ndjson', 'zip'])
+        if export_type == 'zip':
+            chunks = exports.archive_zip(include_images=request.query_params.get('images') != '0')
+        else:
+            chunks = exports.archive_ndjson()
+        return exports.streaming_response(
+            request, chunks, self.content_types[export_type], f'pictale-archive.{export_type}')
+
+
 # ----------------------------
 # PhotoRecommendation API
 # ----------------------------
 class PhotoRecommendationViewSet(viewsets.ModelViewSet):
     """
     CRUD for PhotoRecommendation.
-    Only authenticated users can create recommendations.
+    Only authenticated users can create recommendations; users see their own,
+    admins see everyone's (filter with ?status=).
     Only admins can update the status (approved/rejected) and set reviewed_at.
+
+    Moderation (admins only):
+    GET  queue/?status=pending    oldest first, keyset-paginated (?cursor=)
+    POST review/                  {"ids": [1, 2], "status": "approved"|"rejected"}
+                                  for pending ones, in one transaction
+    POST {id}/promote/            feature an approved one on the next free date
     """
-    queryset = PhotoRecommendation.objects.all().order_by('-created_at')
+    queryset = PhotoRecommendation.objects.select_related('user').order_by('-created_at')
     serializer_class = PhotoRecommendationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status']
+    query_budgets = {'list': 3, 'retrieve': 2, 'queue': 3, 'review': 4, 'promote': 13, 'default': 5}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def get_serializer_class(self):
+        if self.request.user.is_staff:
+            return RecommendationModerationSerializer
+        return PhotoRecommendationSerializer
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def queue(self, request):
+        queue_status = request.query_params.get('status', 'pending')
+        if queue_status not in dict(PhotoRecommendation.STATUS_CHOICES):
+            raise ValidationError({'status': "Unknown status."})
+        paginator = RecommendationQueuePagination()
+        page = paginator.paginate_queryset(
+            PhotoRecommendation.objects.filter(status=queue_status).select_related('user'), request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def review(self, request):
+        serializer = RecommendationReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reviewed, skipped = moderation.review(serializer.validated_data['ids'], serializer.validated_data['status'])
+        return Response({'reviewed': reviewed, 'skipped': skipped})
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def promote(self, request, pk=None):
+        recommendation = self.get_object()
+        if recommendation.promoted_photo_id:
+            return Response({"detail": "Already promoted.", "photo_id": recommendation.promoted_photo_id},
+                            status=status.HTTP_409_CONFLICT)
+        if recommendation.status != 'approved':
+            return Response({"detail": "Only approved recommendations can be promoted."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not recommendation.image_file:
+            return Response({"detail": "The recommendation has no image."}, status=status.HTTP_400_BAD_REQUEST)
+        photo = moderation.promote(recommendation)
+        if photo is None:
+            return Response({"detail": "The recommendation changed meanwhile; reload it."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(DailyPhotoSerializer(photo, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         # Restrict status updates to admin users
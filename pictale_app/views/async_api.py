@@ -0,0 +1,172 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from pictale_app.authentication import cached_credentials
+from pictale_app.caching import get_entry, set_entry, not_modified, set_validators
+from pictale_app.likebuffer import like_buffer
+from pictale_app.pagination import DailyPhotoPageNumberPagination
+from pictale_app.routers import read_from_replica
+from .api_views import DailyPhotoViewSet, CommentViewSet
+
+# ----------------------------
+# Async read paths
+# ----------------------------
+# Under ASGI a synchronous view holds a thread from the sync bridge for the
+# whole request. These views answer the hottest API reads on the event loop:
+# cache hits never leave it and misses only hop to a thread for the queries
+# themselves (async ORM). Anything they do not cover -- writes, the browsable
+# API, cursor pages, filters, search, tokens not yet in the token cache -- goes
+# to the regular DRF view unchanged, so both paths give the same responses.
+DAILYPHOTO_LIST_PARAMS = {'page', 'page_size', 'comments_preview', 'format'}
+DAILYPHOTO_DETAIL_PARAMS = {'comments_preview', 'format'}
+COMMENT_LIST_PARAMS = {'page', 'post_id', 'format'}
+
+
+def async_reads(drf_view, read):
+    """
+    Wrap a DRF view: GETs go to the async `read(request, **kwargs)`, everything
+    else -- and any GET that `read` declines by returning None -- to `drf_view`.
+    """
+    fallback = sync_to_async(drf_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            response = await read(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await fallback(request, *args, **kwargs)
+
+    # What CsrfViewMiddleware and the query budgets read off the DRF view
+    for attr in ('csrf_exempt', 'cls', 'actions', 'initkwargs'):
+        if hasattr(drf_view, attr):
+            setattr(view, attr, getattr(drf_view, attr))
+    return view
+
+
+def make_viewset(viewset_class, request, action, allowed_params, **kwargs):
+    """
+    A viewset instance set up as DRF would for `action`, or None when the request
+    needs something only the DRF view handles.
+    """
+    if not set(request.GET) <= allowed_params or request.GET.get('format', 'json') != 'json':
+        return None
+    if 'format' not in request.GET and 'text/html' in request.headers.get('Accept', ''):
+        return None  # browsable API
+    credentials = None
+    if 'Authorization' in request.headers:
+        credentials = cached_credentials(request)
+        if credentials is None:
+            return None  # let DRF authenticate (and fill the token cache)
+        if like_buffer.has_pending(credentials[0].pk):
+            return None  # DRF flushes their buffered likes first
+    elif settings.SESSION_COOKIE_NAME in request.COOKIES and like_buffer.has_pending():
+        return None  # maybe a logged-in liker; only DRF can tell without blocking
+
+    drf_request = Request(request)
+    drf_request.accepted_renderer = JSONRenderer()
+    drf_request.accepted_media_type = JSONRenderer.media_type
+    if credentials is not None:
+        drf_request.user, drf_request.auth = credentials
+    return viewset_class(request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+
+
+async def apaginate(pagination, queryset, request):
+    """
+    PageNumberPagination.paginate_queryset with the COUNT and the page fetched
+    through the async ORM. Returns the page's objects, or None for an invalid page.
+    """
+    paginator = pagination.django_paginator_class(queryset, pagination.get_page_size(request))
+    paginator.count = await queryset.acount()
+    number = request.query_params.get(pagination.page_query_param) or 1
+    if number in pagination.last_page_strings:
+        number = paginator.num_pages
+    try:
+        page = paginator.page(number)
+    except InvalidPage:
+        return None
+    page.object_list = [obj async for obj in page.object_list]
+    pagination.page = page
+    pagination.request = request
+    return page.object_list
+
+
+def json_response(data):
+    response = HttpResponse(JSONRenderer().render(data), content_type=JSONRenderer.media_type)
+    response['Vary'] = 'Accept'
+    return response
+
+
+async def cached_json(viewset, scopes, build):
+    """Async DailyPhotoViewSet.cached_response; the two share cache entries."""
+    key, etag = viewset.cache_key(scopes)
+    entry = get_entry(key)
+    if entry is None:
+        data = await build()
+        if data is None:
+            return None
+        entry = viewset.cache_entry(data)
+        set_entry(key, entry)
+    return not_modified(viewset.request, etag, entry['last_modified']) or set_validators(
+        json_response(entry['data']), etag, entry['last_modified'])
+
+
+# ----------------------------
+# DailyPhoto
+# ----------------------------
+async def read_photo_list(request):
+    viewset = make_viewset(DailyPhotoViewSet, request, 'list', DAILYPHOTO_LIST_PARAMS)
+    if viewset is None:
+        return None
+
+    async def build():
+        pagination = DailyPhotoPageNumberPagination()
+        with read_from_replica():
+            photos = await apaginate(pagination, viewset.get_queryset(), viewset.request)
+        if photos is None:
+            return None
+        return pagination.get_paginated_response(viewset.get_serializer(photos, many=True).data).data
+
+    return await cached_json(viewset, ['feed'], build)
+
+
+async def read_photo_detail(request, pk):
+    viewset = make_viewset(DailyPhotoViewSet, request, 'retrieve', DAILYPHOTO_DETAIL_PARAMS, pk=pk)
+    if viewset is None:
+        return None
+
+    async def build():
+        with read_from_replica():
+            photo = await viewset.get_queryset().filter(pk=pk).afirst()
+        return None if photo is None else viewset.get_serializer(photo).data
+
+    return await cached_json(viewset, [f'photo:{pk}'], build)
+
+
+dailyphoto_list = async_reads(
+    DailyPhotoViewSet.as_view({'get': 'list', 'post': 'create'}), read_photo_list)
+dailyphoto_detail = async_reads(
+    DailyPhotoViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+    }), read_photo_detail)
+
+
+# ----------------------------
+# Comments
+# ----------------------------
+async def read_comment_list(request):
+    viewset = make_viewset(CommentViewSet, request, 'list', COMMENT_LIST_PARAMS)
+    if viewset is None:
+        return None
+    pagination = viewset.pagination_class().page_number_class()
+    with read_from_replica():
+        comments = await apaginate(pagination, viewset.get_queryset(), viewset.request)
+    if comments is None:
+        return None
+    return json_response(pagination.get_paginated_response(viewset.get_serializer(comments, many=True).data).data)
+
+
+comment_list = async_reads(CommentViewSet.as_view({'get': 'list', 'post': 'create'}), read_comment_list)
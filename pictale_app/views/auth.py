@@ -41,13 +41,14 @@ class RegisterAPIView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
     def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        user = User.objects.get(id=response.data['id'])
-        token, created = Token.objects.get_or_create(user=user)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        token = Token.objects.create(user=user)
 
         return Response({
             "message": "🎉 Account created successfully! Welcome to Pictale.",
-            "user": response.data,
+            "user": serializer.data,
             "token": token.key
         }, status=status.HTTP_201_CREATED)
 
@@ -56,9 +57,11 @@ class RegisterAPIView(generics.CreateAPIView):
 # Login API (returns token)
 class CustomObtainAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        token = Token.objects.get(key=response.data['token'])
-        return Response({'token': token.key, 'user_id': token.user_id, 'username': token.user.username})
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+        return Response({'token': token.key, 'user_id': user.pk, 'username': user.username})
 
 
 # Logout API
@@ -66,7 +69,10 @@ class LogoutAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        request.user.auth_token.delete()  # deletes the token
+        # request.auth is the token that authenticated this call; deleting it
+        # also drops it from the token cache (see pictale_app.signals)
+        token = request.auth if isinstance(request.auth, Token) else request.user.auth_token
+        token.delete()
         return Response({"message": "Successfully logged out."}, status=status.HTTP_200_OK)
 
 ''' Protected API view : For testing 
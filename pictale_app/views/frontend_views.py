@@ -1,4 +1,5 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from pictale_app.models import DailyPhoto, Comment, Like, SavedPhoto, User, PhotoRecommendation
 from django.contrib.auth.forms import PasswordChangeForm, UserCreationForm, AuthenticationForm
@@ -6,71 +7,106 @@ from django.contrib.auth import update_session_auth_hash, authenticate, login, l
 from django.contrib import messages
 from django.utils import timezone
 from django import forms
+from pictale_app.querycount import query_budget
+from pictale_app.caching import cache_anonymous_page
+from pictale_app.engagement import add_engagement
+from pictale_app.likebuffer import like_buffer
+from pictale_app.similar import similar_index
+from django.http import Http404
+from django.utils.http import http_date
 
 
 # ----------------------------
 # Home Page
 # ----------------------------
-def home(request, photo_id=None):
-    # Get all photos, ordered by latest featured
-    all_photos = DailyPhoto.objects.order_by('-date_featured')
-    
-    if not all_photos:
-        # If there are no photos at all, render the page with no photo
-        return render(request, "pictale_app/home.html", {"daily_photo": None})
+SIMILAR_PHOTOS_SHOWN = 4
+
+
+def _photo_page_scopes(photo_id=None):
+    # The default home page follows the whole feed; a specific photo only itself and its neighbours.
+    # "More like this" changes whenever the similar-photos index does.
+    return ['archive', f'photo:{photo_id}', 'similar'] if photo_id else ['feed', 'similar']
 
-    # Find the current photo
+
+async def _similar_photos(published, photo):
+    """Published photos most like `photo`, from the in-memory index (see pictale_app.similar)."""
+    ids = await similar_index.aneighbours(photo.id)
+    if not ids:
+        return []
+    found = {p.id: p async for p in published.filter(id__in=ids)}
+    return [found[i] for i in ids if i in found][:SIMILAR_PHOTOS_SHOWN]
+
+
+@query_budget(9)
+@cache_anonymous_page(_photo_page_scopes)
+async def home(request, photo_id=None):
+    # Async so ASGI builds the page on the event loop; cache_anonymous_page has
+    # resolved request.user and every queryset is evaluated before render().
+    # Find the current photo; default to the most recently featured one
+    # Only published photos: a scheduled one stays hidden until its date_featured
+    published = DailyPhoto.objects.published()
+    if request.user.is_authenticated and like_buffer.has_pending(request.user.pk):
+        # The liker's own write-behind likes go in before their counts are read
+        await sync_to_async(like_buffer.flush_for)(request.user.pk)
     if photo_id:
-        daily_photo = get_object_or_404(DailyPhoto, id=photo_id)
+        daily_photo = await aget_object_or_404(published, id=photo_id)
     else:
-        # Default to the most recent photo
-        daily_photo = all_photos.first()
+        daily_photo = await published.order_by('-date_featured').afirst()
+
+    if daily_photo is None:
+        # If there are no photos at all, render the page with no photo
+        return render(request, "pictale_app/home.html", {"daily_photo": None})
+
+    # Neighbours are keyset lookups on the unique date_featured index,
+    # so the cost does not grow with the size of the archive.
+    previous_photo_id = await (
+        published.filter(date_featured__lt=daily_photo.date_featured)
+        .order_by('-date_featured').values_list('id', flat=True).afirst()
+    )
+    next_photo_id = await (
+        published.filter(date_featured__gt=daily_photo.date_featured)
+        .order_by('date_featured').values_list('id', flat=True).afirst()
+    )
 
-    # Get a list of all photo IDs in the sorted order
-    all_photo_ids = list(all_photos.values_list('id', flat=True))
-    
-    # Find the index of the current photo
-    try:
-        current_index = all_photo_ids.index(daily_photo.id)
-    except ValueError:
-        # This case should not happen if the photo is found, but as a safeguard
-        current_index = 0
-
-    # Determine previous and next photo IDs
-    previous_photo_id = None
-    if current_index < len(all_photo_ids) - 1:
-        previous_photo_id = all_photo_ids[current_index + 1]
-
-    next_photo_id = None
-    if current_index > 0:
-        next_photo_id = all_photo_ids[current_index - 1]
-    
     context = {
         "daily_photo": daily_photo,
+        # Evaluated here: the template must not run queries on the event loop
+        "comments": [comment async for comment in daily_photo.comments.select_related('user')],
         "previous_photo_id": previous_photo_id,
         "next_photo_id": next_photo_id,
+        "similar_photos": await _similar_photos(published, daily_photo),
     }
     
-    return render(request, "pictale_app/home.html", context)
+    response = render(request, "pictale_app/home.html", context)
+    response['Last-Modified'] = http_date(daily_photo.updated_at.timestamp())
+    return response
 
 
 # ----------------------------
 # Like a Photo
 # ----------------------------
+@query_budget(9)
 @login_required
 def like_photo(request, photo_id):
-    photo = get_object_or_404(DailyPhoto, id=photo_id)
-    like, created = Like.objects.get_or_create(user=request.user, post=photo)
-    # If already liked, ignore (no duplicates because of unique_together)
+    # With LIKE_WRITE_BEHIND the like is buffered; home writes it before the redirect renders
+    try:
+        if like_buffer.enabled:
+            like_buffer.add(request.user, photo_id)
+        else:
+            add_engagement(Like, request.user, photo_id)
+    except DailyPhoto.DoesNotExist:
+        raise Http404("No DailyPhoto matches the given query.")
+    # If already liked, ignore (the insert is a no-op because of unique_together)
     return redirect("home")
 
 # ----------------------------
 # Add Comment
 # ----------------------------
+@query_budget(10)
 @login_required
 def add_comment(request, photo_id):
     if request.method == "POST":
-        photo = get_object_or_404(DailyPhoto, id=photo_id)
+        photo = get_object_or_404(DailyPhoto.objects.published(), id=photo_id)
         comment_text = request.POST.get('comment_text')
         if comment_text:
             Comment.objects.create(post=photo, user=request.user, comment_text=comment_text)
@@ -79,10 +115,11 @@ def add_comment(request, photo_id):
 # ----------------------------
 # Save a Photo
 # ----------------------------
+@query_budget(10)
 @login_required
 def save_photo(request, photo_id):
-    photo = get_object_or_404(DailyPhoto, id=photo_id)
-    saved_photo, created = SavedPhoto.objects.get_or_create(user=request.user, post=photo)
+    photo = get_object_or_404(DailyPhoto.objects.published().only('id', 'title'), id=photo_id)  # title for the message
+    saved_photo, created = add_engagement(SavedPhoto, request.user, photo.id)
     if created:
         messages.success(request, f"'{photo.title}' has been saved to your profile.")
     else:
@@ -92,11 +129,13 @@ def save_photo(request, photo_id):
 # ----------------------------
 # User Profile
 # ----------------------------
+@query_budget(4)
 @login_required
 def profile(request):
-    saved_photos = SavedPhoto.objects.filter(user=request.user)
+    saved_photos = SavedPhoto.objects.filter(user=request.user).select_related('post').order_by('-saved_at')
     return render(request, "pictale_app/profile.html", {"saved_photos": saved_photos})
 
+@query_budget(4)
 @login_required
 def edit_profile(request):
     if request.method == "POST":
@@ -110,6 +149,7 @@ def edit_profile(request):
     
     return render(request, 'pictale_app/edit_profile.html', {})
 
+@query_budget(4)
 @login_required
 def change_password(request):
     if request.method == 'POST':
@@ -128,6 +168,7 @@ def change_password(request):
 # ----------------------------
 # Photo Recommendations
 # ----------------------------
+@query_budget(4)
 @login_required
 def recommendations(request):
     if request.method == "POST":
@@ -151,6 +192,7 @@ def recommendations(request):
 # ----------------------------
 # Login / Logout / Register
 # ----------------------------
+@query_budget(4)
 def login_view(request):
     if request.method == "POST":
         form = AuthenticationForm(data=request.POST)
@@ -165,12 +207,14 @@ def login_view(request):
     return render(request, "pictale_app/login.html", {"form": form})
 
 
+@query_budget(4)
 @login_required
 def logout_view(request):
     logout(request)
     return redirect("login")
 
 
+@query_budget(4)
 def register(request):
     if request.method == "POST":
         form = UserCreationForm(request.POST)
@@ -185,9 +229,16 @@ def register(request):
 # ----------------------------
 # Display a single photo
 # ----------------------------
-def photo_detail(request, photo_id):
-    photo = get_object_or_404(DailyPhoto, id=photo_id)
-    return render(request, "pictale_app/photo_detail.html", {"photo": photo})
+@query_budget(7)
+@cache_anonymous_page(_photo_page_scopes)
+async def photo_detail(request, photo_id):
+    published = DailyPhoto.objects.published()
+    photo = await aget_object_or_404(published, id=photo_id)
+    comments = [comment async for comment in photo.comments.select_related('user')]
+    response = render(request, "pictale_app/photo_detail.html",
+                      {"photo": photo, "comments": comments, "similar_photos": await _similar_photos(published, photo)})
+    response['Last-Modified'] = http_date(photo.updated_at.timestamp())
+    return response
 
 
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'pictale_app.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,13 +82,60 @@ WSGI_APPLICATION = 'pictale_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite production profile:
+#   journal_mode=WAL       readers no longer block the writer, or the writer readers
+#   synchronous=NORMAL     fsync at checkpoints only; safe with WAL (a power cut
+#                          can lose the last commits, never corrupt the file)
+#   mmap_size / cache_size 256 MB memory-mapped reads, 64 MB page cache per connection
+#   IMMEDIATE transactions take the write lock at BEGIN, so concurrent writers
+#                          queue on the busy timeout instead of failing with
+#                          "database is locked" when a read lock cannot be upgraded
+# Connections are kept for CONN_MAX_AGE seconds instead of reopened per request.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+]
+SQLITE_TIMEOUT = 20  # seconds a writer waits for the lock (busy_timeout)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_TIMEOUT,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional read replica (a file kept in sync by e.g. Litestream or LiteFS).
+# Public read-only API actions read from it (see pictale_app.routers); set
+# DATABASE_REPLICA_PATH to the primary's own file to give reads their own
+# read-only connections.
+DATABASE_REPLICA_PATH = os.environ.get('DATABASE_REPLICA_PATH')
+if DATABASE_REPLICA_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{DATABASE_REPLICA_PATH}?mode=ro',
+        'OPTIONS': {
+            'init_command': ';'.join(['PRAGMA query_only=ON'] + SQLITE_PRAGMAS[2:4]),
+            'timeout': SQLITE_TIMEOUT,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['pictale_app.routers.ReadReplicaRouter']
+# Seconds replica reads go to the primary after a cached scope changes; keep it
+# above the replication lag so stale rows are never cached under a fresh version.
+REPLICA_LAG_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -149,9 +198,67 @@ CORS_ALLOWED_ORIGINS = [
 
 AUTH_USER_MODEL = 'pictale_app.User'
 
+# Per-request SQL instrumentation (see pictale_app.middleware.QueryCountMiddleware).
+# Views declare budgets with @query_budget / query_budgets; over-budget requests
+# and query shapes repeated QUERY_REPEAT_THRESHOLD times are logged.
+QUERY_COUNT_ENABLED = DEBUG
+QUERY_REPEAT_THRESHOLD = 3
+
+# Background jobs (see pictale_app.tasks). Run `python manage.py run_worker`
+# alongside the web server; with TASKS_ALWAYS_EAGER jobs run inline instead.
+TASKS_ALWAYS_EAGER = False
+TASKS_RETRY_BACKOFF = 10  # seconds; doubles on each retry
+
+# Response cache for the public photo feed and pages (see pictale_app.caching).
+# Entries are invalidated by version bumps, so the timeout only bounds memory.
+# Local memory is per process; point 'default' at a shared backend in production.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pictale',
+    }
+}
+RESPONSE_CACHE_TIMEOUT = 3600
+# Cached payloads carry absolute URLs and are keyed on scheme and host, so the
+# publish scheduler pre-renders for the origin visitors actually use. Required by
+# `manage.py publish_scheduler`; the host must be in ALLOWED_HOSTS.
+PUBLIC_HOST = os.environ.get('PUBLIC_HOST')
+PUBLIC_SCHEME = os.environ.get('PUBLIC_SCHEME', 'https')
+
+# API token lookups (pictale_app.authentication): a per-process LRU of recently
+# seen tokens. With API_TOKEN_CACHE_SHARED each hit is checked against the
+# Django cache, so a logout in one process is seen by all (needs a shared CACHES
+# backend when running several processes). Turning it off saves that lookup but
+# lets other processes accept a revoked token for up to API_TOKEN_CACHE_TTL seconds.
+API_TOKEN_CACHE_SIZE = 1024
+API_TOKEN_CACHE_TTL = 300
+API_TOKEN_CACHE_SHARED = True
+API_TOKEN_USAGE_FLUSH_INTERVAL = 60  # seconds between batched last-used writes
+
+# In-process indexes of similar photos (pictale_app.similar) and image
+# fingerprints (pictale_app.fingerprints). Each reloads when its version in the
+# cache moves, which reaches every process only with a shared CACHES backend;
+# otherwise after these many seconds.
+SIMILAR_INDEX_TTL = 300
+FINGERPRINT_INDEX_TTL = 300
+
+# Write-behind likes (pictale_app.likebuffer). When enabled, likes from the API and
+# the pages are acknowledged from an in-process buffer, journalled to
+# LIKE_BUFFER_JOURNAL_DIR, and inserted in batches once LIKE_BUFFER_MAX likes or
+# LIKE_BUFFER_INTERVAL seconds have accumulated. Flushes also replay the
+# journals of stopped processes, at most every LIKE_BUFFER_ORPHAN_SCAN_INTERVAL
+# seconds. Set LIKE_BUFFER_SHARED with a shared CACHES backend so a liker sees
+# their pending like from every process.
+LIKE_WRITE_BEHIND = False
+LIKE_BUFFER_MAX = 500
+LIKE_BUFFER_INTERVAL = 1.0
+LIKE_BUFFER_JOURNAL_DIR = BASE_DIR / 'like_journal'
+LIKE_BUFFER_ORPHAN_SCAN_INTERVAL = 30
+LIKE_BUFFER_SHARED = False
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'pictale_app.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',